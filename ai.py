@@ -1,29 +1,156 @@
 # ai.py
+"""
+Disease model. Importing this module is cheap: no model file is touched
+and no ML runtime (TensorFlow / tflite / onnxruntime) is imported until
+load_ai() runs — on the first prediction, or at startup with AI_WARMUP.
+"""
+
 import json
 import os
+import time
 import numpy as np
+from io import BytesIO
 from threading import Lock
-from tensorflow.keras.models import load_model
-from tensorflow.keras.utils import load_img, img_to_array
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+
+# ----------------------
+# Backend selection
+# ----------------------
+# "keras"  → .h5 through full TensorFlow (default, original behaviour)
+# "tflite" → .tflite via tflite_runtime or tf.lite (see export_model.py)
+# "onnx"   → .onnx via onnxruntime              (see export_model.py)
+AI_BACKEND = os.getenv("AI_BACKEND", "keras")
+
+# Load the model + run a dummy batch during startup instead of on the first request
+AI_WARMUP = os.getenv("AI_WARMUP", "false").lower() == "true"
 
 # ----------------------
 # Paths
 # ----------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-MODEL_PATH = os.path.join(BASE_DIR, "ai_models", "plant_disease_detection.h5")
+MODEL_PATHS = {
+    "keras": os.path.join(BASE_DIR, "ai_models", "plant_disease_detection.h5"),
+    "tflite": os.path.join(BASE_DIR, "ai_models", "plant_disease_detection.tflite"),
+    "onnx": os.path.join(BASE_DIR, "ai_models", "plant_disease_detection.onnx")
+}
+
+if AI_BACKEND not in MODEL_PATHS:
+    raise ValueError(f"Unknown AI_BACKEND: {AI_BACKEND}")
+
+MODEL_PATH = os.getenv("AI_MODEL_PATH", MODEL_PATHS[AI_BACKEND])
 CATEGORIES_PATH = os.path.join(BASE_DIR, "ai_models", "categories.json")
 
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError("Disease model file not found")
 
-if not os.path.exists(CATEGORIES_PATH):
-    raise FileNotFoundError("Categories file not found")
+def model_available() -> bool:
+    return os.path.exists(MODEL_PATH) and os.path.exists(CATEGORIES_PATH)
+
+
+_model_version = os.getenv("AI_MODEL_VERSION")
+
+
+def model_version() -> str:
+    """
+    Part of every cached prediction key (see prediction_cache.py).
+    Changes whenever the artifact (or backend) is swapped — cheap, no hashing.
+    """
+    global _model_version
+
+    if _model_version is None:
+        stat = os.stat(MODEL_PATH)
+        _model_version = f"{AI_BACKEND}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+    return _model_version
+
+
+# ----------------------
+# Backends — each turns an (N, 224, 224, 3) float32 batch
+# into (N, classes) probabilities. Heavy imports happen on load.
+# ----------------------
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, path: str):
+        from tensorflow.keras.models import load_model
+
+        self._model = load_model(path)
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        # predict_on_batch skips predict()'s per-call dataset/callback setup
+        return np.asarray(self._model.predict_on_batch(images))
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, path: str):
+        try:
+            from tflite_runtime.interpreter import Interpreter  # small runtime-only wheel
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self._interpreter = Interpreter(model_path=path, num_threads=os.cpu_count())
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch = self._input["shape"][0]
+        # An interpreter holds its tensors → one batch at a time
+        self._lock = Lock()
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if images.shape[0] != self._batch:
+                self._interpreter.resize_tensor_input(self._input["index"], images.shape)
+                self._interpreter.allocate_tensors()
+                self._input = self._interpreter.get_input_details()[0]
+                self._output = self._interpreter.get_output_details()[0]
+                self._batch = images.shape[0]
+
+            self._interpreter.set_tensor(self._input["index"], _quantize(images, self._input))
+            self._interpreter.invoke()
+            return _dequantize(self._interpreter.get_tensor(self._output["index"]), self._output)
+
+
+def _quantize(values: np.ndarray, details: dict) -> np.ndarray:
+    # Full-integer models take int8/uint8 input
+    scale, zero_point = details["quantization"]
+    if details["dtype"] == np.float32 or not scale:
+        return values.astype(details["dtype"], copy=False)
+    return np.round(values / scale + zero_point).astype(details["dtype"])
+
+
+def _dequantize(values: np.ndarray, details: dict) -> np.ndarray:
+    scale, zero_point = details["quantization"]
+    if details["dtype"] == np.float32 or not scale:
+        return values.astype(np.float32, copy=False)
+    return (values.astype(np.float32) - zero_point) * scale
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path: str):
+        import onnxruntime
+
+        self._session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self._input_name = self._session.get_inputs()[0].name
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        return self._session.run(None, {self._input_name: images.astype(np.float32, copy=False)})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend
+}
 
 # ----------------------
 # Global objects (lazy-loaded)
 # ----------------------
-_model = None
+_backend = None
 _class_names = None
 _load_lock = Lock()
 
@@ -31,37 +158,156 @@ _load_lock = Lock()
 # Load AI model safely
 # ----------------------
 def load_ai():
-    global _model, _class_names
+    global _backend, _class_names
 
-    if _model is not None and _class_names is not None:
+    if _backend is not None and _class_names is not None:
         return
 
     with _load_lock:
-        if _model is None:
-            _model = load_model(MODEL_PATH)
-            print("✅ Disease model loaded")
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError("Disease model file not found")
+
+        if not os.path.exists(CATEGORIES_PATH):
+            raise FileNotFoundError("Categories file not found")
+
+        if _backend is None:
+            start = time.perf_counter()
+            _backend = BACKENDS[AI_BACKEND](MODEL_PATH)
+            print(f"✅ Disease model loaded ({AI_BACKEND}, {time.perf_counter() - start:.1f}s)")
 
         if _class_names is None:
             with open(CATEGORIES_PATH, "r") as f:
                 _class_names = json.load(f)
             print("✅ Disease categories loaded")
 
+
+def warm_up(batch_size: int = 1):
+    """
+    Loads the model and runs throwaway batches so the first real request
+    does not pay for loading or graph tracing (opt-in: AI_WARMUP=true).
+    """
+    load_ai()
+    for size in sorted({1, batch_size}):
+        _backend.predict(np.zeros((size, *IMAGE_SIZE, 3), dtype=np.float32))
+
 # ----------------------
-# Predict disease from image
+# Preprocessing
 # ----------------------
-def predict_disease(image_path: str) -> dict:
-    if _model is None or _class_names is None:
-        load_ai()
+def decode_image(data: bytes) -> np.ndarray:
+    """
+    Encoded image bytes → (224, 224, 3) float32 array scaled to [0, 1]
+
+    Decodes straight from memory (no temp file). Matches keras load_img
+    defaults (RGB, nearest-neighbour resize) so predictions are unchanged.
+    """
+    with Image.open(BytesIO(data)) as img:
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != IMAGE_SIZE[::-1]:
+            img = img.resize(IMAGE_SIZE[::-1], Image.NEAREST)
+
+        array = np.asarray(img, dtype=np.float32)   # the only copy
+
+    array /= 255.0   # in place
+    return array
+
 
-    img = load_img(image_path, target_size=(224, 224))
-    img = img_to_array(img) / 255.0
-    img = np.expand_dims(img, axis=0)
+def load_image(image_path: str) -> np.ndarray:
+    with open(image_path, "rb") as f:
+        return decode_image(f.read())
 
-    predictions = _model.predict(img, verbose=0)
-    class_index = int(np.argmax(predictions))
-    confidence = float(np.max(predictions))
 
-    return {
+# ----------------------
+# Test-time augmentation
+# ----------------------
+TTA_VIEWS = ("original", "flip_h", "flip_v", "center_crop")
+TTA_CROP = 0.875   # center crop keeps 87.5% of each side, scaled back up
+
+
+def augment(image: np.ndarray) -> np.ndarray:
+    """
+    (224, 224, 3) image → (len(TTA_VIEWS), 224, 224, 3) views of the same leaf
+    """
+    side = IMAGE_SIZE[0]
+    crop = int(side * TTA_CROP)
+    offset = (side - crop) // 2
+    index = offset + np.arange(side) * crop // side   # nearest-neighbour zoom
+
+    return np.stack([
+        image,
+        image[:, ::-1],
+        image[::-1, :],
+        image[index][:, index]
+    ])
+
+
+def _result(probabilities: np.ndarray, top_k: int = 1) -> dict:
+    class_index = int(np.argmax(probabilities))
+    confidence = float(np.max(probabilities))
+
+    result = {
         "disease": _class_names.get(str(class_index), "Unknown"),
         "confidence": round(confidence, 4)
     }
+
+    if top_k > 1:
+        ranked = np.argsort(probabilities)[::-1][:top_k]
+        result["top_k"] = [
+            {
+                "disease": _class_names.get(str(int(i)), "Unknown"),
+                "confidence": round(float(probabilities[i]), 4)
+            }
+            for i in ranked
+        ]
+
+    return result
+
+
+# ----------------------
+# Predict a batch (one forward pass)
+# ----------------------
+def predict_probabilities(images: np.ndarray) -> np.ndarray:
+    """
+    images: (N, 224, 224, 3) preprocessed batch → (N, classes) probabilities
+    """
+    if _backend is None or _class_names is None:
+        load_ai()
+
+    return _backend.predict(images)
+
+
+def predict_batch(images: np.ndarray, options: list | None = None) -> list:
+    """
+    images: (N, 224, 224, 3) preprocessed batch → one result dict per image
+
+    options: optional per-image {"top_k": int, "tta": bool}. TTA views of
+    every image are stacked into the same forward pass and their
+    probabilities averaged.
+    """
+    if not options or not any(options):
+        return [_result(p) for p in predict_probabilities(images)]
+
+    options = [opt or {} for opt in options]
+    views = [augment(image) if opt.get("tta") else image[None, ...] for image, opt in zip(images, options)]
+    probabilities = predict_probabilities(np.concatenate(views))
+
+    results, start = [], 0
+    for view, opt in zip(views, options):
+        mean = probabilities[start:start + len(view)].mean(axis=0)
+        start += len(view)
+
+        result = _result(mean, opt.get("top_k", 1))
+        if "tta" in opt:
+            result["tta"] = bool(opt["tta"])
+        results.append(result)
+
+    return results
+
+
+# ----------------------
+# Predict disease from image
+# ----------------------
+def predict_disease(image_path: str, top_k: int = 1, tta: bool = False) -> dict:
+    img = np.expand_dims(load_image(image_path), axis=0)
+    options = [{"top_k": top_k, "tta": True}] if tta else [{"top_k": top_k}]
+    return predict_batch(img, options)[0]
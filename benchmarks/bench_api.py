@@ -0,0 +1,123 @@
+# benchmarks/bench_api.py
+"""
+HTTP throughput benchmark for the sensor and insights endpoints.
+
+Runs N concurrent clients against a running API for a fixed duration
+and prints requests/sec plus p50/p99 latency per endpoint.
+
+Before / after comparison against a local mongod:
+
+    # terminal 1 (sync baseline)
+    git checkout <baseline-commit>
+    MONGO_URL=mongodb://localhost:27017 JWT_SECRET=dev uvicorn main:app --port 8000
+
+    # terminal 2
+    python benchmarks/bench_api.py --token <jwt> --concurrency 64 --duration 20
+
+    # then repeat on the async tree (optionally tune MONGO_MAX_POOL_SIZE)
+
+Run the server without --reload and with a single worker so both runs
+are comparable. /api/plant-insights/latest needs a JWT from /auth/login.
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+
+import requests
+
+
+def _sensor_payload():
+    return {
+        "temperature": round(random.uniform(18, 36), 1),
+        "humidity": round(random.uniform(30, 90), 1),
+        "soilMoisture": round(random.uniform(20, 90), 1),
+        "light": round(random.uniform(100, 3000), 1),
+        "device_id": f"bench-{random.randint(1, 50):02d}"
+    }
+
+
+def _worker(base_url, endpoint, token, deadline, latencies, errors, lock):
+    session = requests.Session()
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    url = base_url + endpoint
+
+    local_latencies, local_errors = [], 0
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if endpoint == "/api/sensor-data":
+                r = session.post(url, json=_sensor_payload(), headers=headers, timeout=30)
+            else:
+                r = session.get(url, headers=headers, timeout=30)
+            ok = r.status_code < 400
+        except requests.RequestException:
+            ok = False
+
+        if ok:
+            local_latencies.append(time.perf_counter() - start)
+        else:
+            local_errors += 1
+
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def run(base_url, endpoint, token, concurrency, duration):
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(base_url, endpoint, token, deadline, latencies, errors, lock)
+        )
+        for _ in range(concurrency)
+    ]
+
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    count = len(latencies)
+
+    return {
+        "endpoint": endpoint,
+        "requests": count,
+        "errors": sum(errors),
+        "rps": round(count / duration, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if count else None,
+        "p99_ms": round(latencies[int(count * 0.99) - 1] * 1000, 2) if count else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default=None, help="JWT for authenticated endpoints")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per endpoint")
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=["/api/sensor-data", "/api/plant-insights/latest"]
+    )
+    args = parser.parse_args()
+
+    for endpoint in args.endpoints:
+        result = run(args.base_url, endpoint, args.token, args.concurrency, args.duration)
+        print(
+            f"{result['endpoint']:<32} {result['rps']:>9} req/s  "
+            f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+            f"({result['requests']} ok, {result['errors']} errors)"
+        )
+
+
+if __name__ == "__main__":
+    main()
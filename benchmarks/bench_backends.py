@@ -0,0 +1,131 @@
+# benchmarks/bench_backends.py
+"""
+Compares disease model backends (keras / tflite / onnx) on:
+
+- load time     import of ai + model load, in a fresh process
+- memory        peak RSS of that process
+- latency       median / p99 per single-image forward pass
+- accuracy      top-1 agreement with Keras and max probability drift
+                on the sample images in images/
+
+    python export_model.py tflite --quantize float16
+    python benchmarks/bench_backends.py --repeats 50
+
+Each backend runs in its own subprocess (AI_BACKEND=<name>) so load time
+and memory are not polluted by the others. Backends whose artifact or
+runtime is missing are skipped. Exits 1 if a backend's top-1 agreement
+with Keras is below --min-agreement (regression check for quantization).
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKENDS = ("keras", "tflite", "onnx")
+
+
+# ----------------------
+# Child: measure one backend
+# ----------------------
+def measure(repeats: int) -> dict:
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import ai
+    import numpy as np
+
+    ai.load_ai()
+    load_s = time.perf_counter() - start
+
+    names = sorted(os.listdir(os.path.join(ROOT, "images")))
+    images = [ai.load_image(os.path.join(ROOT, "images", name)) for name in names]
+
+    ai.predict_probabilities(images[0][None, ...])   # first call traces / allocates
+
+    latencies = []
+    for i in range(repeats):
+        t = time.perf_counter()
+        ai.predict_probabilities(images[i % len(images)][None, ...])
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+
+    probabilities = ai.predict_probabilities(np.stack(images))
+
+    return {
+        "load_s": load_s,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KB on Linux
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000,
+        "images": names,
+        "probabilities": np.asarray(probabilities, dtype=float).tolist()
+    }
+
+
+def run_backend(name: str, repeats: int) -> dict | None:
+    env = {**os.environ, "AI_BACKEND": name}
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", "--repeats", str(repeats)],
+        env=env, capture_output=True, text=True
+    )
+
+    if proc.returncode != 0:
+        reason = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+        print(f"⏭  {name:<7} skipped: {reason}")
+        return None
+
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ----------------------
+# Parent: compare
+# ----------------------
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--min-agreement", type=float, default=1.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.repeats)))
+        return
+
+    results = {name: run_backend(name, args.repeats) for name in BACKENDS}
+    reference = results.get("keras")
+
+    print(f"\n{'backend':<8} {'load s':>8} {'RSS MB':>8} {'p50 ms':>8} {'p99 ms':>8} {'top-1':>7} {'max Δp':>8}")
+
+    failed = False
+    for name, r in results.items():
+        if r is None:
+            continue
+
+        agreement, drift = "-", "-"
+        if reference is not None:
+            pairs = list(zip(reference["probabilities"], r["probabilities"]))
+            same = sum(
+                max(range(len(a)), key=a.__getitem__) == max(range(len(b)), key=b.__getitem__)
+                for a, b in pairs
+            )
+            share = same / len(pairs)
+            agreement = f"{share:.0%}"
+            drift = f"{max(abs(x - y) for a, b in pairs for x, y in zip(a, b)):.4f}"
+            failed |= share < args.min_agreement
+
+        print(
+            f"{name:<8} {r['load_s']:>8.2f} {r['rss_mb']:>8.0f} {r['p50_ms']:>8.1f} "
+            f"{r['p99_ms']:>8.1f} {agreement:>7} {drift:>8}"
+        )
+
+    if failed:
+        print(f"\n❌ Top-1 agreement with Keras below {args.min_agreement:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_inference.py
+"""
+Disease inference throughput: one predict per request vs micro-batching.
+
+Runs in-process against the real model (no HTTP, no Mongo). The
+sample images in images/ are decoded once up front, so only the
+forward pass and queueing are measured.
+
+    python benchmarks/bench_inference.py --concurrency 32 --requests 512
+
+- single   → current path: each request runs its own 1-image predict,
+             one after another (the old handler blocked the event loop)
+- batched  → N concurrent requests through inference.MicroBatcher
+
+Prints images/sec and p50/p99 latency for each mode.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai  # noqa: E402
+from inference import MicroBatcher  # noqa: E402
+
+IMAGES_DIR = os.path.join(ai.BASE_DIR, "images")
+
+
+def _sample_images():
+    names = sorted(os.listdir(IMAGES_DIR))
+    return [ai.load_image(os.path.join(IMAGES_DIR, name)) for name in names]
+
+
+def _report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+    print(
+        f"{label:<28} {len(latencies) / elapsed:8.1f} img/s"
+        f"   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms"
+    )
+
+
+def run_single(images, total, concurrency):
+    """
+    Concurrent clients, but each prediction blocks until done —
+    what the original async handler did.
+    """
+    latencies = []
+    queue_start = time.perf_counter()
+
+    # All `concurrency` requests arrive together and are served one by one
+    for i in range(total):
+        if i % concurrency == 0:
+            queue_start = time.perf_counter()
+        ai.predict_batch(np.expand_dims(images[i % len(images)], axis=0))
+        latencies.append(time.perf_counter() - queue_start)
+
+    return latencies
+
+
+async def run_batched(images, total, concurrency, max_batch_size, max_wait_ms):
+    batcher = MicroBatcher(ai.predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await batcher.submit(images[i % len(images)])
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    snapshot = batcher.snapshot()
+    await batcher.stop()
+
+    return latencies, snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    images = _sample_images()
+
+    # Load + warm up once so neither mode pays graph tracing
+    ai.load_ai()
+    ai.predict_batch(np.stack(images[:1]))
+    ai.predict_batch(np.stack([images[0]] * args.max_batch_size))
+
+    start = time.perf_counter()
+    latencies = run_single(images, args.requests, args.concurrency)
+    _report("single (1 image / predict)", latencies, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    latencies, snapshot = asyncio.run(run_batched(
+        images, args.requests, args.concurrency, args.max_batch_size, args.max_wait_ms
+    ))
+    _report(f"batched (<= {args.max_batch_size}, {args.max_wait_ms:g} ms)", latencies, time.perf_counter() - start)
+
+    print(f"avg batch {snapshot['avg_batch']}  max batch {snapshot['max_batch']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # db.py
 import os
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import CollectionInvalid, OperationFailure
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,14 +10,113 @@ MONGO_URL = os.getenv("MONGO_URL")
 if not MONGO_URL:
     raise RuntimeError("MONGO_URL not set in environment")
 
-# Mongo client with sane timeouts
-client = MongoClient(
+# Connection pool sizing (shared by every request on this worker)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+# Sensor storage mode
+#   "standard"   → plain collection `sensor_data` (default)
+#   "timeseries" → Mongo time-series collection `sensor_readings`
+#                  (device_id as metaField; see migrate_timeseries.py)
+SENSOR_STORAGE = os.getenv("SENSOR_STORAGE", "standard").lower()
+if SENSOR_STORAGE not in ("standard", "timeseries"):
+    raise RuntimeError("SENSOR_STORAGE must be 'standard' or 'timeseries'")
+
+STANDARD_COLLECTION = "sensor_data"
+TIMESERIES_COLLECTION = "sensor_readings"
+TIMESERIES_GRANULARITY = os.getenv("SENSOR_TS_GRANULARITY", "minutes")
+TIMESERIES_RETENTION_S = os.getenv("SENSOR_TS_RETENTION_S")  # optional TTL
+
+# Async Mongo client with sane timeouts
+# (Motor picks up the running event loop lazily on first use)
+client = AsyncIOMotorClient(
     MONGO_URL,
     serverSelectionTimeoutMS=5000,
-    connectTimeoutMS=5000
+    connectTimeoutMS=5000,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE
 )
 
 db = client["plant_db"]
-sensor_collection = db["sensor_data"]
+sensor_collection = db[
+    TIMESERIES_COLLECTION if SENSOR_STORAGE == "timeseries" else STANDARD_COLLECTION
+]
+users_collection = db["users"]
+
+# Per-plant threshold profiles (see logic/profiles.py)
+profiles_collection = db["plant_profiles"]
+
+# Last prefetched weather per grid cell (see logic/weather/prefetch.py)
+weather_collection = db["weather_snapshots"]
+
+# Disease predictions by image hash (see prediction_cache.py)
+predictions_collection = db["prediction_cache"]
+
+# Queued disease predictions for inference_worker.py (see inference_jobs.py)
+inference_jobs_collection = db["inference_jobs"]
+
+# Pre-aggregated trend rollups (see logic/rollups.py)
+rollup_collections = {
+    "hour": db["sensor_rollups_hourly"],
+    "day": db["sensor_rollups_daily"]
+}
+
+
+# ----------------------
+# Indexes (run once from the app lifespan)
+# ----------------------
+NAMESPACE_EXISTS = 48   # Mongo error code
+
+
+async def ensure_timeseries_collection():
+    """
+    Creates the time-series collection if it does not exist yet.
+    Safe to call from several workers at once.
+    """
+    if TIMESERIES_COLLECTION in await db.list_collection_names():
+        return
+
+    options = {
+        "timeseries": {
+            "timeField": "timestamp",
+            "metaField": "device_id",
+            "granularity": TIMESERIES_GRANULARITY
+        }
+    }
+    if TIMESERIES_RETENTION_S:
+        options["expireAfterSeconds"] = int(TIMESERIES_RETENTION_S)
+
+    try:
+        await db.create_collection(TIMESERIES_COLLECTION, **options)
+    except CollectionInvalid:
+        pass  # another worker created it first
+    except OperationFailure as e:
+        # Lost the race after the check above: the server answers NamespaceExists
+        if e.code != NAMESPACE_EXISTS:
+            raise
+
+
+async def ensure_indexes():
+    if SENSOR_STORAGE == "timeseries":
+        await ensure_timeseries_collection()
+
+    await sensor_collection.create_index([("timestamp", -1)])
+
+    # Per-device latest / history / trend range scans
+    await sensor_collection.create_index([("device_id", 1), ("timestamp", -1)])
+
+    for rollups in rollup_collections.values():
+        await rollups.create_index([("device_id", 1), ("bucket", 1)], unique=True)
+        await rollups.create_index([("bucket", 1)])
+
+    await profiles_collection.create_index("profile_id", unique=True)
+
+    # Each cached prediction carries its own expiry
+    await predictions_collection.create_index("expires_at", expireAfterSeconds=0)
+
+    # Workers claim the oldest queued job; finished jobs expire
+    await inference_jobs_collection.create_index([("status", 1), ("created_at", 1)])
+    await inference_jobs_collection.create_index("expires_at", expireAfterSeconds=0)
 
-sensor_collection.create_index([("timestamp", -1)])
+    # Ensure unique email
+    await users_collection.create_index("email", unique=True)
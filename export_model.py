@@ -0,0 +1,90 @@
+# export_model.py
+"""
+Exports the Keras disease model to a lighter serving format.
+
+Usage:
+    python export_model.py tflite [--quantize none|dynamic|float16|int8]
+    python export_model.py onnx [--opset 13]
+
+Then start the API with AI_BACKEND=tflite (or onnx). Use AI_MODEL_PATH if
+the artifact was written somewhere other than the default path.
+
+- dynamic  → int8 weights, float activations (about 4x smaller, CPU friendly)
+- float16  → half-precision weights (about 2x smaller, near-lossless)
+- int8     → full integer, calibrated on the sample images in images/
+
+ONNX export needs `pip install tf2onnx`; serving it needs `onnxruntime`.
+Check accuracy afterwards with benchmarks/bench_backends.py.
+"""
+
+import argparse
+import os
+
+# Export always starts from the Keras model, whatever the API is configured to serve
+os.environ["AI_BACKEND"] = "keras"
+
+import ai  # noqa: E402
+
+SAMPLE_DIR = os.path.join(ai.BASE_DIR, "images")
+
+
+def _representative_images():
+    for name in sorted(os.listdir(SAMPLE_DIR)):
+        image = ai.load_image(os.path.join(SAMPLE_DIR, name))
+        yield [image[None, ...]]
+
+
+def export_tflite(model, output: str, quantize: str):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantize != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        converter.representative_dataset = _representative_images
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    with open(output, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, output: str, opset: int):
+    import tensorflow as tf
+    import tf2onnx
+
+    # Dynamic batch dimension so the micro-batcher can send any batch size
+    signature = [tf.TensorSpec((None, *ai.IMAGE_SIZE, 3), tf.float32, name="image")]
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset, output_path=output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("format", choices=["tflite", "onnx"])
+    parser.add_argument("--quantize", choices=["none", "dynamic", "float16", "int8"], default="none")
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    output = args.output or ai.MODEL_PATHS[args.format]
+
+    from tensorflow.keras.models import load_model
+
+    model = load_model(ai.MODEL_PATHS["keras"])
+
+    if args.format == "tflite":
+        export_tflite(model, output, args.quantize)
+    else:
+        export_onnx(model, output, args.opset)
+
+    source_mb = os.path.getsize(ai.MODEL_PATHS["keras"]) / 1e6
+    print(f"✅ Wrote {output} ({os.path.getsize(output) / 1e6:.1f} MB, Keras .h5 {source_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
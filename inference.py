@@ -0,0 +1,328 @@
+# inference.py
+"""
+Micro-batching queue for disease inference.
+
+Concurrent /api/predict-disease requests are collected into one batch:
+the first image opens a window of INFERENCE_MAX_WAIT_MS, and the batch
+closes early once INFERENCE_MAX_BATCH_SIZE images are waiting. Each
+batch is a single forward pass (ai.predict_batch) on a dedicated
+inference thread. Results go back to the awaiting requests in order.
+
+A lone request pays at most INFERENCE_MAX_WAIT_MS extra. Under load the
+model sees full batches instead of N separate predict() calls.
+
+A request may carry options (top-k, test-time augmentation). A TTA
+request counts as one image per view towards the batch size, and all of
+its views go through the same forward pass as the rest of the batch. A
+request that would push the batch past INFERENCE_MAX_BATCH_SIZE starts
+the next batch instead; one bigger than the limit on its own (TTA with a
+tiny batch size) runs alone.
+
+Batches run in a dedicated pool, never on the event loop:
+
+- INFERENCE_EXECUTOR=thread  → INFERENCE_WORKERS threads sharing one model
+- INFERENCE_EXECUTOR=process → INFERENCE_WORKERS processes, each loading
+  the model once (sidesteps the GIL for pre/post-processing)
+
+Admission control keeps image traffic from starving the rest of the API:
+more than INFERENCE_MAX_QUEUE waiting images → InferenceOverloaded (503),
+and a request not answered within INFERENCE_TIMEOUT_S → InferenceTimeout (504).
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+import ai
+
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "true").lower() == "true"
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")  # "thread" | "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+INFERENCE_TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "30"))
+
+# TTA is dropped (single pass) when the inference queue would blow this budget
+PREDICT_TTA_BUDGET_MS = float(os.getenv("PREDICT_TTA_BUDGET_MS", "1000"))
+
+
+class InferenceOverloaded(Exception):
+    """Raised when too many images are already waiting (caller should 503)."""
+
+
+class InferenceTimeout(Exception):
+    """Raised when a prediction did not finish in time (caller should 504)."""
+
+
+def make_executor(kind: str = INFERENCE_EXECUTOR, workers: int = INFERENCE_WORKERS) -> Executor:
+    if kind == "process":
+        # Model is loaded once per worker process, before the first batch
+        return ProcessPoolExecutor(max_workers=workers, initializer=ai.load_ai)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+    raise ValueError(f"Unknown INFERENCE_EXECUTOR: {kind}")
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        predict_batch: Callable[..., List[dict]],
+        warm_up: Callable[[int], None] | None = None,
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS,
+        executor: str = INFERENCE_EXECUTOR,
+        workers: int = INFERENCE_WORKERS,
+        max_queue: int = INFERENCE_MAX_QUEUE,
+        timeout: float = INFERENCE_TIMEOUT_S
+    ):
+        self.predict_batch = predict_batch
+        self.warm_up_fn = warm_up
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor_kind = executor
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._queue: asyncio.Queue | None = None
+        self._carry: tuple | None = None   # didn't fit the last batch, opens the next
+        self._task: asyncio.Task | None = None
+        self._executor: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None   # one batch per worker at a time
+        self._running: set = set()
+        self._queued_images = 0
+        self._image_s: float | None = None   # EWMA forward-pass time per image
+
+        self.stats = {
+            "batches": 0,
+            "images": 0,
+            "max_batch": 0,
+            "rejected_overload": 0,
+            "timeouts": 0
+        }
+
+    # ----------------------
+    # Lifecycle
+    # ----------------------
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._carry = None
+            self._queued_images = 0
+            self._slots = asyncio.Semaphore(self.workers)
+            self._executor = self._executor or make_executor(self.executor_kind, self.workers)
+            self._task = asyncio.create_task(self._run())
+
+    async def warm_up(self):
+        """
+        Loads the model in every worker (thread pool: once, shared).
+        """
+        self.start()
+        if self.warm_up_fn is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        calls = self.workers if self.executor_kind == "process" else 1
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self.warm_up_fn, self.max_batch_size)
+            for _ in range(calls)
+        ))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ----------------------
+    # Requests
+    # ----------------------
+    @property
+    def overloaded(self) -> bool:
+        return self._queue is not None and self._queued_images >= self.max_queue
+
+    def _admits(self, images: int) -> bool:
+        # A request bigger than the whole queue is still served when it is empty
+        return self._queued_images + images <= max(self.max_queue, images)
+
+    def estimate_latency(self, images: int = 1) -> float | None:
+        """
+        Rough seconds until `images` more images would be predicted:
+        what is already queued plus them, at the recent per-image speed.
+        None until the first batch has run.
+        """
+        if self._image_s is None:
+            return None
+        return (self._queued_images / self.workers + images) * self._image_s
+
+    async def submit(self, image: np.ndarray, options: dict | None = None, images: int = 1) -> dict:
+        """
+        image: one preprocessed (224, 224, 3) array → prediction dict
+
+        options are passed through to predict_batch for this image;
+        images is how many rows it adds to the forward pass (TTA views).
+        """
+        self.start()
+
+        if not self._admits(images):
+            self.stats["rejected_overload"] += 1
+            raise InferenceOverloaded()
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image, options, images, future))
+        self._queued_images += images
+
+        try:
+            # wait_for cancels the future on timeout → the batch loop skips it
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise InferenceTimeout()
+
+    # ----------------------
+    # Batching loop
+    # ----------------------
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+
+        if self._carry is not None:
+            batch, self._carry = [self._carry], None
+        else:
+            batch = [await self._queue.get()]
+        size = batch[0][2]
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+            if size + item[2] > self.max_batch_size:
+                self._carry = item   # still counted as queued
+                break
+
+            batch.append(item)
+            size += item[2]
+
+        self._queued_images -= size
+
+        # Requests whose client already gave up are not worth a forward pass
+        return [item for item in batch if not item[3].done()]
+
+    async def _run(self):
+        while True:
+            # Don't close a batch until a worker is free to run it, so
+            # waiting requests keep joining while all workers are busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        images = np.stack([item[0] for item in batch])
+        options = [item[1] for item in batch]
+        size = sum(item[2] for item in batch)
+
+        # Plain requests keep the one-argument call
+        args = (images, options) if any(options) else (images,)
+
+        start = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self._executor, self.predict_batch, *args)
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        per_image = (time.perf_counter() - start) / size
+        self._image_s = per_image if self._image_s is None else 0.8 * self._image_s + 0.2 * per_image
+
+        for (*_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+        self.stats["batches"] += 1
+        self.stats["images"] += size
+        self.stats["max_batch"] = max(self.stats["max_batch"], size)
+
+    def snapshot(self) -> dict:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "avg_batch": round(self.stats["images"] / batches, 2) if batches else 0.0,
+            "queued": self._queue.qsize() + (self._carry is not None) if self._queue is not None else 0,
+            "running_batches": len(self._running),
+            "ms_per_image": round(self._image_s * 1000, 2) if self._image_s is not None else None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "executor": self.executor_kind,
+            "workers": self.workers
+        }
+
+
+def request_options(
+    batcher: MicroBatcher,
+    top_k: int = 1,
+    tta: bool = False,
+    budget_ms: float | None = None
+) -> Tuple[dict | None, int]:
+    """
+    Per-request predict options → (options for submit(), forward-pass rows).
+
+    None for a plain top-1 request. TTA is kept only if the batcher
+    expects to finish all views within the latency budget.
+    """
+    if top_k == 1 and not tta:
+        return None, 1
+
+    if not tta:
+        return {"top_k": top_k}, 1
+
+    budget = (budget_ms or PREDICT_TTA_BUDGET_MS) / 1000
+    estimate = batcher.estimate_latency(len(ai.TTA_VIEWS))
+    tta = estimate is None or estimate <= budget
+
+    return {"top_k": top_k, "tta": tta}, len(ai.TTA_VIEWS) if tta else 1
+
+
+# INFERENCE_BATCHING=false → one image per forward pass, same pool and limits
+disease_batcher = MicroBatcher(
+    ai.predict_batch,
+    warm_up=ai.warm_up,
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE if INFERENCE_BATCHING else 1,
+    max_wait_ms=INFERENCE_MAX_WAIT_MS if INFERENCE_BATCHING else 0
+)
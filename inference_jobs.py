@@ -0,0 +1,205 @@
+# inference_jobs.py
+"""
+Mongo-backed queue of disease predictions (INFERENCE_MODE=queue).
+
+With INFERENCE_MODE=queue the API never loads the model:
+/api/predict-disease stores the upload as a job and answers 202, and one
+or more inference_worker.py processes claim jobs, run them through their
+own MicroBatcher and write the result back. Clients poll
+/api/predict-disease/jobs/{job_id}. API replicas and inference workers
+then scale independently.
+
+Job lifecycle: queued → running → done | failed
+
+- A worker claims a job atomically (find_one_and_update) and holds a
+  lease of INFERENCE_JOB_LEASE_S, renewed while the job is in progress.
+  A job whose worker died is claimed again after the lease, at most
+  INFERENCE_JOB_MAX_ATTEMPTS times, then it is marked failed.
+- A job that hit a transient error (inference timeout / overload) goes
+  back to queued, within the same attempt limit.
+- More than INFERENCE_JOB_MAX_PENDING queued jobs → InferenceOverloaded (503).
+- Jobs (and their image bytes) expire INFERENCE_JOB_TTL_S after creation
+  or completion via a TTL index.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict
+
+from bson import Binary, ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from db import inference_jobs_collection
+from inference import InferenceOverloaded
+
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local").lower()   # "local" | "queue"
+if INFERENCE_MODE not in ("local", "queue"):
+    raise RuntimeError("INFERENCE_MODE must be 'local' or 'queue'")
+
+INFERENCE_JOB_LEASE_S = float(os.getenv("INFERENCE_JOB_LEASE_S", "60"))
+INFERENCE_JOB_MAX_ATTEMPTS = int(os.getenv("INFERENCE_JOB_MAX_ATTEMPTS", "3"))
+INFERENCE_JOB_MAX_PENDING = int(os.getenv("INFERENCE_JOB_MAX_PENDING", "256"))
+INFERENCE_JOB_TTL_S = float(os.getenv("INFERENCE_JOB_TTL_S", str(24 * 3600)))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+# ----------------------
+# API side
+# ----------------------
+async def enqueue_job(data: bytes, options: Dict | None = None) -> str:
+    """
+    Stores the raw upload (decoded by the worker) → job id
+    """
+    pending = await inference_jobs_collection.count_documents(
+        {"status": QUEUED}, limit=INFERENCE_JOB_MAX_PENDING
+    )
+    if pending >= INFERENCE_JOB_MAX_PENDING:
+        raise InferenceOverloaded()
+
+    now = datetime.utcnow()
+    result = await inference_jobs_collection.insert_one({
+        "status": QUEUED,
+        "image": Binary(data),
+        "options": options,
+        "attempts": 0,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=INFERENCE_JOB_TTL_S)
+    })
+    return str(result.inserted_id)
+
+
+async def get_job(job_id: str) -> Dict | None:
+    try:
+        _id = ObjectId(job_id)
+    except InvalidId:
+        return None
+
+    doc = await inference_jobs_collection.find_one(
+        {"_id": _id},
+        {"image": 0, "options": 0, "lease_until": 0, "expires_at": 0}
+    )
+    if doc is None:
+        return None
+
+    doc["job_id"] = str(doc.pop("_id"))
+    return doc
+
+
+# ----------------------
+# Worker side
+# ----------------------
+async def claim_job(worker_id: str) -> Dict | None:
+    """
+    Oldest queued job (or one whose worker's lease ran out) → running
+    """
+    now = datetime.utcnow()
+
+    return await inference_jobs_collection.find_one_and_update(
+        {
+            "$or": [
+                {"status": QUEUED},
+                {
+                    "status": RUNNING,
+                    "lease_until": {"$lt": now},
+                    "attempts": {"$lt": INFERENCE_JOB_MAX_ATTEMPTS}
+                }
+            ]
+        },
+        {
+            "$set": {
+                "status": RUNNING,
+                "worker": worker_id,
+                "started_at": now,
+                "lease_until": now + timedelta(seconds=INFERENCE_JOB_LEASE_S)
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _claim_filter(job: Dict) -> Dict:
+    # Still this worker's claim: same owner, same attempt, not finished
+    return {
+        "_id": job["_id"],
+        "status": RUNNING,
+        "worker": job["worker"],
+        "attempts": job["attempts"]
+    }
+
+
+async def finish_job(job: Dict, result: Dict | None = None, error: str | None = None) -> bool:
+    """
+    Records the outcome of a claimed job. Ignored (False) once the claim is
+    gone — lease expired and re-claimed, or failed as abandoned — so a slow
+    worker never overwrites the current owner's outcome.
+    """
+    now = datetime.utcnow()
+
+    update = await inference_jobs_collection.update_one(
+        _claim_filter(job),
+        {
+            "$set": {
+                "status": FAILED if error else DONE,
+                "result": result,
+                "error": error,
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=INFERENCE_JOB_TTL_S)
+            },
+            "$unset": {"image": "", "lease_until": ""}
+        }
+    )
+    return update.modified_count == 1
+
+
+async def renew_lease(job: Dict) -> bool:
+    """
+    Extends a claimed job's lease. False once the claim is gone.
+    """
+    update = await inference_jobs_collection.update_one(
+        _claim_filter(job),
+        {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=INFERENCE_JOB_LEASE_S)}}
+    )
+    return update.modified_count == 1
+
+
+async def requeue_job(job: Dict) -> bool:
+    """
+    Hands a claimed job back to the queue after a transient error.
+    """
+    update = await inference_jobs_collection.update_one(
+        _claim_filter(job),
+        {
+            "$set": {"status": QUEUED},
+            "$unset": {"worker": "", "started_at": "", "lease_until": ""}
+        }
+    )
+    return update.modified_count == 1
+
+
+async def fail_abandoned_jobs() -> int:
+    """
+    Jobs whose lease expired on their last attempt → failed
+    """
+    now = datetime.utcnow()
+
+    result = await inference_jobs_collection.update_many(
+        {
+            "status": RUNNING,
+            "lease_until": {"$lt": now},
+            "attempts": {"$gte": INFERENCE_JOB_MAX_ATTEMPTS}
+        },
+        {
+            "$set": {
+                "status": FAILED,
+                "error": "Inference worker did not finish the job",
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=INFERENCE_JOB_TTL_S)
+            },
+            "$unset": {"image": "", "lease_until": ""}
+        }
+    )
+    return result.modified_count
@@ -0,0 +1,176 @@
+# inference_worker.py
+"""
+Standalone disease inference worker for INFERENCE_MODE=queue.
+
+    python inference_worker.py
+
+Claims jobs from the inference_jobs collection (see inference_jobs.py),
+decodes the stored upload, predicts through the usual MicroBatcher
+(INFERENCE_* settings apply) and writes the result back. Run as many
+workers as there are CPU nodes for the model; API replicas no longer
+need it. Concurrently claimed jobs are batched into shared forward passes.
+
+The lease of a job in progress is renewed every INFERENCE_JOB_LEASE_S / 3,
+so a slow batch is never mistaken for a dead worker. A worker that dies
+mid-job leaves it running; another worker picks it up once its lease
+expires. A job that times out or finds the batcher overloaded goes back
+to the queue (until its last attempt, which fails it).
+"""
+
+import asyncio
+import os
+import socket
+from typing import Dict, Tuple
+
+from PIL import UnidentifiedImageError
+
+import ai
+from db import ensure_indexes
+from inference import InferenceOverloaded, InferenceTimeout, disease_batcher, request_options
+from inference_jobs import (
+    INFERENCE_JOB_LEASE_S,
+    INFERENCE_JOB_MAX_ATTEMPTS,
+    claim_job,
+    fail_abandoned_jobs,
+    finish_job,
+    renew_lease,
+    requeue_job
+)
+from prediction_cache import PREDICTION_CACHE_PHASH, content_key, perceptual_key, prediction_cache
+
+INFERENCE_WORKER_POLL_S = float(os.getenv("INFERENCE_WORKER_POLL_S", "0.2"))   # idle back-off
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Worth another try on the next claim, unless attempts ran out
+TRANSIENT_ERRORS = {
+    InferenceTimeout: "Disease inference timed out",
+    InferenceOverloaded: "Disease inference is busy"
+}
+
+
+async def _predict_job(job: dict) -> Tuple[Dict | None, str | None]:
+    """
+    → (result, None) or (None, error message)
+    """
+    loop = asyncio.get_running_loop()
+    data = bytes(job["image"])
+    params = job.get("options")   # None → plain top-1, cacheable
+
+    keys = []
+    if params is None:
+        keys.append(await loop.run_in_executor(None, content_key, data))
+        cached = await prediction_cache.get(keys[0])
+        if cached is not None:
+            return cached, None
+
+    try:
+        image = await loop.run_in_executor(None, ai.decode_image, data)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None, "Could not decode image"
+
+    # Near-duplicate hit — not copied to the exact key (see main.py)
+    if params is None and PREDICTION_CACHE_PHASH and prediction_cache.enabled:
+        keys.append(perceptual_key(image))
+        cached = await prediction_cache.get(keys[1])
+        if cached is not None:
+            return cached, None
+
+    options, views = request_options(disease_batcher, **(params or {}))
+    result = await disease_batcher.submit(image, options, views)
+
+    if params is None:
+        await prediction_cache.put(keys, result)
+    return result, None
+
+
+async def _keep_lease(job: dict):
+    while True:
+        await asyncio.sleep(INFERENCE_JOB_LEASE_S / 3)
+        try:
+            if not await renew_lease(job):
+                return   # taken over — finish_job will drop our result
+        except Exception as e:
+            print(f"⚠️ Renewing lease of inference job {job['_id']} failed:", repr(e))
+
+
+async def process_job(job: dict):
+    lease = asyncio.create_task(_keep_lease(job))
+    requeue = False
+
+    # Any failure ends the job now instead of leaving it running until its lease expires
+    try:
+        result, error = await _predict_job(job)
+    except tuple(TRANSIENT_ERRORS) as e:
+        result, error = None, TRANSIENT_ERRORS[type(e)]
+        requeue = job["attempts"] < INFERENCE_JOB_MAX_ATTEMPTS
+        print(f"⚠️ Inference job {job['_id']}: {error}" + (", requeued" if requeue else ""))
+    except Exception as e:
+        print(f"❌ Inference job {job['_id']} failed:", repr(e))
+        result, error = None, "Disease inference failed"
+    finally:
+        lease.cancel()
+
+    try:
+        if requeue:
+            recorded = await requeue_job(job)
+        else:
+            recorded = await finish_job(job, result=result, error=error)
+
+        if not recorded:
+            print(f"⚠️ Inference job {job['_id']} was taken over, result dropped")
+    except Exception as e:
+        # The lease expires and the job is claimed again
+        print(f"❌ Recording inference job {job['_id']} failed:", repr(e))
+
+
+async def run_worker():
+    if INFERENCE_JOB_LEASE_S <= 0:
+        raise RuntimeError("INFERENCE_JOB_LEASE_S must be > 0")
+
+    await ensure_indexes()
+    await disease_batcher.warm_up()
+    print(f"🌿 Inference worker {WORKER_ID} ready ({ai.AI_BACKEND})")
+
+    # Enough jobs in flight to fill every batch, never more than the batcher
+    # admits even if every job asks for TTA (one queued image per view)
+    slots = asyncio.Semaphore(max(1, min(
+        disease_batcher.max_batch_size * disease_batcher.workers,
+        disease_batcher.max_queue // len(ai.TTA_VIEWS)
+    )))
+    running = set()
+    loop = asyncio.get_running_loop()
+    next_sweep = loop.time()
+
+    try:
+        while True:
+            if loop.time() >= next_sweep:
+                if failed := await fail_abandoned_jobs():
+                    print(f"⚠️ {failed} abandoned inference job(s) failed")
+                next_sweep = loop.time() + INFERENCE_JOB_LEASE_S
+
+            await slots.acquire()
+            job = await claim_job(WORKER_ID)
+
+            if job is None:
+                slots.release()
+                await asyncio.sleep(INFERENCE_WORKER_POLL_S)
+                continue
+
+            task = asyncio.create_task(process_job(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+    finally:
+        # Claimed jobs either finish here or are re-claimed after their lease
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        await disease_batcher.stop()
+        print(f"🛑 Inference worker {WORKER_ID} stopped")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,393 @@
+# logic/batch.py
+"""
+Columnar (NumPy) insights engine for many devices at once.
+
+Same decisions as generate_plant_insights(), computed for N devices
+with array operations instead of a Python loop:
+
+- threshold bands are bucketed with np.searchsorted over the same
+  compiled edge tuples the scalar path bisects (logic/profiles.py)
+- trends use masked half-window sums over an (N x W) history matrix;
+  rows whose slope lands next to a decision or rounding edge are
+  recomputed with detect_trend itself, so verdicts never disagree.
+  Callers that already hold analyze_trends() output (the incremental
+  per-device state) pass it as trend columns and skip this step
+- results are integer codes; insights_for() renders one device back
+  into exactly the dict the scalar path returns
+
+Missing values (light, history padding, weather) are NaN.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from .environment import HUMIDITY_LEVELS, LIGHT_LEVELS, TEMPERATURE_LEVELS
+from .hydration import HYDRATION_LEVELS
+from .insights import DRY_AIR_NOTE, HEAT_STRESS_NOTE, RAIN_DELAY_NOTE, STATUS_LEVELS
+from .profiles import DEFAULT_PROFILE, CompiledProfile
+from .trend_engine import MIN_POINTS, NOISE_TOLERANCE, build_message, detect_trend
+from .water_prediction import WATERING_DECISIONS
+
+TREND_METRICS = ("soilMoisture", "temperature", "humidity", "light")
+
+DIRECTIONS = ("insufficient_data", "stable", "improving", "declining")
+SEVERITIES = ("low", "moderate", "high")
+
+NO_CODE = -1
+
+# Row sums differ from statistics.mean only in the last bits; slopes this
+# close to an edge are settled by the scalar path
+EDGE_EPS = 1e-7
+
+
+# ----------------------
+# Band bucketing
+# ----------------------
+def _hydration_codes(soil: np.ndarray, profile: CompiledProfile) -> np.ndarray:
+    edges = profile.hydration_edges
+    # number of edges <= value → 0 (dry) .. 4 (well hydrated); levels are wettest-first
+    return len(edges) - np.searchsorted(edges, soil, side="right")
+
+
+def _banded_codes(values: np.ndarray, below: tuple, above: tuple) -> np.ndarray:
+    """
+    0 = inside [optimal_min, optimal_max], 1 = inside [warning_low, warning_high],
+    2 = outside — the same inclusive bounds as CompiledProfile._band_level.
+    """
+    below = 2 - np.searchsorted(below, values, side="right")
+    above = np.searchsorted(above, values, side="left")
+    return np.maximum(below, above)
+
+
+def _light_codes(light: np.ndarray, profile: CompiledProfile) -> np.ndarray:
+    below = np.searchsorted(profile.light_below, light, side="right")
+    above = np.searchsorted(profile.light_above, light, side="left")
+
+    codes = np.select(
+        [(below == 0) | (above == 2), below == 1, above == 1],
+        [3, 1, 2],
+        default=0
+    )
+    return np.where(np.isnan(light), NO_CODE, codes)
+
+
+def _status_codes(scores: np.ndarray) -> np.ndarray:
+    thresholds = [level[0] for level in STATUS_LEVELS if level[0] is not None][::-1]
+    # count of thresholds <= score → 0 (critical) .. 4 (thriving); levels are best-first
+    return len(thresholds) - np.searchsorted(thresholds, scores, side="right")
+
+
+# ----------------------
+# Trends
+# ----------------------
+def _trend_columns(history: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    history: (N x W), oldest → newest, NaN for missing values.
+    Vectorized detect_trend + classify_severity.
+    """
+    valid = ~np.isnan(history)
+    n = valid.sum(axis=1)
+    half = n // 2
+
+    rank = np.cumsum(valid, axis=1) - 1
+    first = valid & (rank < half[:, None])
+    second = valid & ~first
+
+    values = np.where(valid, history, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (values * second).sum(axis=1) / (n - half) - (values * first).sum(axis=1) / half
+
+    enough = n >= MIN_POINTS
+    direction = np.select(
+        [~enough, np.abs(slope) < NOISE_TOLERANCE, slope > 0],
+        [0, 1, 2],
+        default=3
+    )
+
+    # Next to the tolerance edge, or next to a rounding tie at 2 decimals
+    cents = np.abs(slope) * 100
+    ambiguous = enough & (
+        (np.abs(np.abs(slope) - NOISE_TOLERANCE) < EDGE_EPS)
+        | (np.abs(cents - np.floor(cents) - 0.5) < EDGE_EPS * 100)
+    )
+
+    slope = np.where(enough, np.round(slope, 2), 0.0)
+
+    for i in np.flatnonzero(ambiguous):
+        trend = detect_trend(history[i][valid[i]].tolist())
+        direction[i] = DIRECTIONS.index(trend["direction"])
+        slope[i] = trend["slope"]
+
+    severity = np.select(
+        [(direction == 1) | (direction == 2), np.abs(slope) > 10],
+        [0, 2],
+        default=1
+    )
+
+    return {"direction": direction, "severity": severity, "slope": slope}
+
+
+# ----------------------
+# Public API
+# ----------------------
+def generate_fleet_insights(
+    soil_moisture: Sequence[float],
+    temperature: Sequence[float],
+    humidity: Sequence[float],
+    light: Sequence[float] | None = None,
+    history: Dict[str, np.ndarray] | None = None,
+    history_len: Sequence[int] | None = None,
+    weather: Dict[str, Sequence[float]] | None = None,
+    profile: CompiledProfile | None = None,
+    trends: Dict[str, Dict[str, np.ndarray]] | None = None
+) -> Dict[str, np.ndarray]:
+    """
+    Inputs are 1-D columns of length N (one row per device), plus:
+
+        history      {metric: (N x W) matrix}, rows left-aligned, NaN-padded
+        history_len  readings per row (required with history)
+        trends       {metric: {"direction" | "severity" | "slope": column}},
+                     precomputed — replaces trend detection over history
+        weather      {"rain_probability" | "temperature" | "humidity": column}
+        profile      one compiled profile for every row (group devices by profile)
+
+    Returns a dict of result columns (codes index the *_LEVELS tables).
+    """
+
+    soil = np.asarray(soil_moisture, dtype=float)
+    temp = np.asarray(temperature, dtype=float)
+    hum = np.asarray(humidity, dtype=float)
+    lux = np.full(soil.shape, np.nan) if light is None else np.asarray(light, dtype=float)
+    count = len(soil)
+    profile = profile or DEFAULT_PROFILE
+
+    score = np.full(count, 100, dtype=np.int64)
+
+    # --- Hydration ---
+    hydration = _hydration_codes(soil, profile)
+    score += np.array([d for _, d in HYDRATION_LEVELS])[hydration]
+
+    # --- Environment ---
+    temperature_code = _banded_codes(temp, profile.temperature_below, profile.temperature_above)
+    humidity_code = _banded_codes(hum, profile.humidity_below, profile.humidity_above)
+    light_code = _light_codes(lux, profile)
+
+    score += np.array([d for _, d in TEMPERATURE_LEVELS])[temperature_code]
+    score += np.array([d for _, d in HUMIDITY_LEVELS])[humidity_code]
+    light_deltas = np.array([d for _, d in LIGHT_LEVELS] + [0])  # NO_CODE → last slot
+    score += light_deltas[light_code]
+
+    # --- Trends ---
+    hist_len = np.zeros(count, dtype=np.int64) if history_len is None else np.asarray(history_len)
+    has_trends = hist_len >= 5
+    trend_columns = {}
+
+    if history is not None:
+        for metric in TREND_METRICS:
+            if trends is not None:
+                cols = trends[metric]
+            else:
+                cols = _trend_columns(np.asarray(history[metric], dtype=float))
+            trend_columns[metric] = cols
+
+            declining = has_trends & (cols["direction"] == 3)
+            score -= np.where(declining & (cols["severity"] == 2), 10, 0)
+            score -= np.where(declining & (cols["severity"] == 1), 5, 0)
+
+    # --- Water prediction ---
+    has_watering = hist_len >= 2
+    watering = np.full(count, NO_CODE)
+
+    if history is not None:
+        soil_hist = np.nan_to_num(np.asarray(history["soilMoisture"], dtype=float), nan=0.0)
+        rows = np.arange(count)
+        last = np.clip(hist_len - 1, 0, None)
+        drop = np.maximum(soil_hist[:, 0] - soil_hist[rows, last], 0.0) if soil_hist.shape[1] else np.zeros(count)
+
+        bands = profile.watering_soil
+        limits = profile.watering_risk
+        risk = (
+            (temp > limits["temp_high"]).astype(int)
+            + (hum < limits["humidity_low"])
+            + (lux > limits["light_high"])
+        )
+
+        decision = np.select(
+            [
+                soil < bands["pre_dry"],
+                (soil < bands["watch"]) & ((drop >= limits["fast_dry_drop"]) | (risk >= 2)),
+                soil < bands["healthy"],
+                (drop <= limits["slow_dry_drop"]) & (risk == 0)
+            ],
+            [0, 1, 2, 3],
+            default=4
+        )
+        watering = np.where(has_watering, decision, NO_CODE)
+
+        score -= np.where(watering == 0, 15, 0)
+        score -= np.where(watering == 1, 8, 0)
+
+    # --- Weather ---
+    rain_delay = np.zeros(count, dtype=bool)
+    softened = np.zeros(count, dtype=bool)
+    heat_stress = np.zeros(count, dtype=bool)
+    dry_air = np.zeros(count, dtype=bool)
+
+    if weather is not None:
+        nan = np.full(count, np.nan)
+        rain = np.nan_to_num(np.asarray(weather.get("rain_probability", nan), dtype=float), nan=0.0)
+        w_temp = np.asarray(weather.get("temperature", nan), dtype=float)
+        w_hum = np.asarray(weather.get("humidity", nan), dtype=float)
+
+        rain_delay = rain >= 60
+        softened = rain_delay & (watering == 0)
+        heat_stress = w_temp > 35
+        dry_air = w_hum < 40
+
+        score += np.where(softened, 5, 0)
+        score -= np.where(heat_stress, 5, 0)
+        score -= np.where(dry_air, 3, 0)
+
+    score = np.clip(score, 0, 100)
+
+    return {
+        "health_score": score,
+        "status_code": _status_codes(score),
+        "hydration_code": hydration,
+        "temperature_code": temperature_code,
+        "humidity_code": humidity_code,
+        "light_code": light_code,
+        "has_trends": has_trends & (history is not None),
+        "trends": trend_columns,
+        "watering_code": watering,
+        "watering_softened": softened,
+        "rain_delay": rain_delay,
+        "heat_stress": heat_stress,
+        "dry_air": dry_air
+    }
+
+
+# ----------------------
+# Dict readings → columns
+# ----------------------
+def columns_from_readings(
+    latest: List[Dict],
+    histories: List[List[Dict]] | None = None,
+    weathers: List[Dict | None] | None = None,
+    trends: List[Dict] | None = None
+) -> Dict:
+    """
+    Builds generate_fleet_insights() keyword arguments from the same
+    dicts the scalar path takes. trends: analyze_trends() output per
+    device, for its history (used instead of recomputing it).
+    """
+
+    def column(docs, key):
+        return np.array(
+            [np.nan if d.get(key) is None else d[key] for d in docs],
+            dtype=float
+        )
+
+    kwargs = {
+        "soil_moisture": column(latest, "soilMoisture"),
+        "temperature": column(latest, "temperature"),
+        "humidity": column(latest, "humidity"),
+        "light": column(latest, "light")
+    }
+
+    if histories is not None:
+        width = max((len(h) for h in histories), default=0)
+        kwargs["history_len"] = np.array([len(h) for h in histories])
+        kwargs["history"] = {}
+
+        for metric in TREND_METRICS:
+            matrix = np.full((len(histories), width), np.nan)
+            for i, h in enumerate(histories):
+                matrix[i, : len(h)] = [np.nan if d.get(metric) is None else d[metric] for d in h]
+            kwargs["history"][metric] = matrix
+
+    if trends is not None:
+        kwargs["trends"] = {
+            metric: {
+                "direction": np.array([DIRECTIONS.index(t[metric]["direction"]) for t in trends]),
+                "severity": np.array([SEVERITIES.index(t[metric]["severity"]) for t in trends]),
+                "slope": np.array([t[metric]["slope"] for t in trends], dtype=float)
+            }
+            for metric in TREND_METRICS
+        }
+
+    if weathers is not None:
+        kwargs["weather"] = {
+            key: column([w or {} for w in weathers], key)
+            for key in ("rain_probability", "temperature", "humidity")
+        }
+
+    return kwargs
+
+
+# ----------------------
+# Codes → scalar-shaped response
+# ----------------------
+def insights_for(result: Dict, i: int) -> Dict:
+    """
+    Renders device i exactly like generate_plant_insights() would.
+    """
+
+    insights = [
+        HYDRATION_LEVELS[result["hydration_code"][i]][0],
+        TEMPERATURE_LEVELS[result["temperature_code"][i]][0],
+        HUMIDITY_LEVELS[result["humidity_code"][i]][0]
+    ]
+    if result["light_code"][i] != NO_CODE:
+        insights.append(LIGHT_LEVELS[result["light_code"][i]][0])
+
+    trends = None
+    if result["has_trends"][i]:
+        trends = {}
+        for metric, cols in result["trends"].items():
+            direction = DIRECTIONS[cols["direction"][i]]
+            severity = SEVERITIES[cols["severity"][i]]
+            message = build_message(metric, direction, severity)
+
+            trends[metric] = {
+                "direction": direction,
+                "severity": severity,
+                "slope": float(cols["slope"][i]),
+                "message": message
+            }
+            if direction == "declining":
+                insights.append(message)
+
+    watering = None
+    if result["watering_code"][i] != NO_CODE:
+        watering = dict(WATERING_DECISIONS[result["watering_code"][i]])
+        insights.append(watering["message"])
+        if result["watering_softened"][i]:
+            watering["urgency"] = "medium"
+
+    weather_notes = []
+    if result["rain_delay"][i]:
+        weather_notes.append(RAIN_DELAY_NOTE)
+    if result["heat_stress"][i]:
+        weather_notes.append(HEAT_STRESS_NOTE)
+    if result["dry_air"][i]:
+        weather_notes.append(DRY_AIR_NOTE)
+
+    _, status, summary = STATUS_LEVELS[result["status_code"][i]]
+
+    response = {
+        "health_score": int(result["health_score"][i]),
+        "status": status,
+        "summary": summary,
+        "insights": insights
+    }
+
+    if trends:
+        response["trends"] = trends
+    if watering:
+        response["watering"] = watering
+    if weather_notes:
+        response["weather_notes"] = weather_notes
+
+    return response
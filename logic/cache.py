@@ -0,0 +1,174 @@
+# logic/cache.py
+"""
+In-process TTL + LRU response cache.
+
+Entries are keyed by (endpoint, device_id, *params). Ingest invalidates
+every entry for the device that just reported. It also invalidates the
+fleet-wide entries (device_id=None), because those include the device.
+A value whose device was invalidated while it was being computed is
+returned but not stored.
+
+The cache is per worker. With several replicas, another worker's entry
+can stay stale until its TTL expires, so keep the TTL short.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable
+
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Least-recently-used cache whose entries also expire after ttl seconds.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, set] = {}   # tag → keys (for invalidation)
+        self._generations: Dict[Hashable, int] = {}   # tag → invalidation count
+        self._clears = 0
+        self._lock = Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+
+            if entry is _MISSING:
+                self.stats["misses"] += 1
+                return default
+
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, tag: Hashable = None):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl, value, tag)
+            self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+
+    def invalidate_tags(self, tags: Iterable[Hashable]) -> int:
+        """Drops every entry stored under one of the tags."""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self.stats["invalidations"] += removed
+        return removed
+
+    def generation(self, tag: Hashable) -> tuple:
+        """Changes whenever the tag is invalidated or the cache cleared."""
+        with self._lock:
+            return self._clears, self._generations.get(tag, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._clears += 1
+
+    def _remove(self, key: Hashable):
+        # caller holds the lock
+        _, _, tag = self._entries.pop(key)
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else None
+            }
+
+
+class ResponseCache(TTLCache):
+    """
+    TTLCache keyed by (endpoint, device_id, *params) with per-device
+    invalidation.
+    """
+
+    async def get_or_compute(
+        self,
+        endpoint: str,
+        device_id: str | None,
+        compute: Callable[[], Awaitable[Any]],
+        *params: Hashable
+    ) -> Any:
+        if not self.enabled:
+            return await compute()
+
+        key = (endpoint, device_id, *params)
+
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        # An ingest while computing invalidates the device before the value
+        # exists — serve it, but don't cache what may already be stale
+        generation = self.generation(device_id)
+        value = await compute()
+        if self.generation(device_id) == generation:
+            self.set(key, value, tag=device_id)
+        return value
+
+    def invalidate_devices(self, device_ids: Iterable[str | None]) -> int:
+        # Fleet-wide entries (device_id None) always contain the device
+        return self.invalidate_tags(set(device_ids) | {None})
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=RESPONSE_CACHE_TTL_S
+)
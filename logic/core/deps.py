@@ -1,5 +1,5 @@
 # core/deps.py
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 
@@ -7,12 +7,12 @@ from logic.core.jwt import SECRET_KEY, ALGORITHM
 
 security = HTTPBearer()
 
+# Browsers can't set headers on a WebSocket: the token comes as ?token=
+# or as the subprotocol pair ["bearer", "<token>"]
+WS_TOKEN_SUBPROTOCOL = "bearer"
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-):
-    token = credentials.credentials
 
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str | None = payload.get("sub")
@@ -30,3 +30,30 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expired or invalid"
         )
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    return decode_access_token(credentials.credentials)
+
+
+def get_websocket_user(websocket: WebSocket) -> dict | None:
+    """
+    JWT payload for a WebSocket handshake, or None — check it before
+    accept() and close with 1008 when it is missing or invalid.
+    """
+    token = websocket.query_params.get("token")
+
+    subprotocols = websocket.scope.get("subprotocols", [])
+    if token is None and WS_TOKEN_SUBPROTOCOL in subprotocols:
+        i = subprotocols.index(WS_TOKEN_SUBPROTOCOL)
+        token = subprotocols[i + 1] if i + 1 < len(subprotocols) else None
+
+    if not token:
+        return None
+
+    try:
+        return decode_access_token(token)
+    except HTTPException:
+        return None
@@ -1,18 +1,14 @@
 from datetime import datetime
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 
-from db import db
+from db import users_collection
 from logic.model.user import UserCreate, UserInDB
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-users_collection = db["users"]
-
-# Ensure unique email
-users_collection.create_index("email", unique=True)
-
 
 # ---------------------------
 # Password helpers
@@ -28,18 +24,18 @@ def verify_password(password: str, hashed: str) -> bool:
 # ---------------------------
 # Create user
 # ---------------------------
-def create_user(user: UserCreate) -> UserInDB:
+async def create_user(user: UserCreate) -> UserInDB:
     now = datetime.utcnow()
 
     user_dict = {
         "email": user.email,
         "name": user.name,
-        "hashed_password": hash_password(user.password),
+        "hashed_password": await run_in_threadpool(hash_password, user.password),
         "created_at": now
     }
 
     try:
-        result = users_collection.insert_one(user_dict)
+        result = await users_collection.insert_one(user_dict)
     except DuplicateKeyError:
         raise ValueError("User with this email already exists")
 
@@ -55,8 +51,8 @@ def create_user(user: UserCreate) -> UserInDB:
 # ---------------------------
 # Get user by email
 # ---------------------------
-def get_user_by_email(email: str) -> UserInDB | None:
-    doc = users_collection.find_one({"email": email})
+async def get_user_by_email(email: str) -> UserInDB | None:
+    doc = await users_collection.find_one({"email": email})
 
     if not doc:
         return None
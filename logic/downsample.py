@@ -0,0 +1,53 @@
+# logic/downsample.py
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling.
+
+Keeps the visual shape of a line chart (peaks, dips) while reducing it
+to a fixed number of points. Used for raw-resolution trend ranges.
+"""
+
+from typing import List, Sequence
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Returns the indices of the points to keep (always includes first/last).
+
+    xs must be sorted ascending. If threshold >= len(xs) every index is
+    returned unchanged.
+    """
+
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average point of the *next* bucket
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+
+        # Pick the point in this bucket with the largest triangle
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+
+        best, best_area = range_start, -1.0
+        for j in range(range_start, range_end):
+            area = abs(
+                (xs[a] - avg_x) * (ys[j] - ys[a])
+                - (xs[a] - xs[j]) * (avg_y - ys[a])
+            )
+            if area > best_area:
+                best, best_area = j, area
+
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
@@ -1,46 +1,52 @@
 # logic/environment.py
-from .thresholds import TEMPERATURE_C, HUMIDITY_PERCENT, LIGHT_LUX
+from .profiles import DEFAULT_PROFILE, CompiledProfile
 
-def analyze_environment(temperature: float, humidity: float, light: float | None):
+# (message, score_delta) per level — index 0 is optimal
+TEMPERATURE_LEVELS = (
+    ("Temperature is within optimal range", 5),
+    ("Temperature is slightly outside optimal range", -5),
+    ("Temperature may stress the plant", -15),
+)
+
+HUMIDITY_LEVELS = (
+    ("Humidity level is healthy", 5),
+    ("Humidity is slightly unbalanced", -5),
+    ("Humidity may negatively affect plant health", -15),
+)
+
+LIGHT_LEVELS = (
+    ("Light exposure is optimal", 5),
+    ("Light is slightly low, plant growth may slow", -5),
+    ("Light is strong, monitor leaf stress", -5),
+    ("Light conditions may harm the plant", -15),
+)
+
+
+def analyze_environment(
+    temperature: float,
+    humidity: float,
+    light: float | None,
+    profile: CompiledProfile | None = None
+):
+    profile = profile or DEFAULT_PROFILE
     messages = []
     score_delta = 0
 
     # -------- Temperature --------
-    if TEMPERATURE_C["optimal_min"] <= temperature <= TEMPERATURE_C["optimal_max"]:
-        messages.append("Temperature is within optimal range")
-        score_delta += 5
-    elif TEMPERATURE_C["warning_low"] <= temperature <= TEMPERATURE_C["warning_high"]:
-        messages.append("Temperature is slightly outside optimal range")
-        score_delta -= 5
-    else:
-        messages.append("Temperature may stress the plant")
-        score_delta -= 15
+    message, delta = TEMPERATURE_LEVELS[profile.temperature_level(temperature)]
+    messages.append(message)
+    score_delta += delta
 
     # -------- Humidity --------
-    if HUMIDITY_PERCENT["optimal_min"] <= humidity <= HUMIDITY_PERCENT["optimal_max"]:
-        messages.append("Humidity level is healthy")
-        score_delta += 5
-    elif HUMIDITY_PERCENT["warning_low"] <= humidity <= HUMIDITY_PERCENT["warning_high"]:
-        messages.append("Humidity is slightly unbalanced")
-        score_delta -= 5
-    else:
-        messages.append("Humidity may negatively affect plant health")
-        score_delta -= 15
+    message, delta = HUMIDITY_LEVELS[profile.humidity_level(humidity)]
+    messages.append(message)
+    score_delta += delta
 
     # -------- Light --------
     if light is not None:
-        if LIGHT_LUX["optimal_min"] <= light <= LIGHT_LUX["optimal_max"]:
-            messages.append("Light exposure is optimal")
-            score_delta += 5
-        elif LIGHT_LUX["low"] <= light < LIGHT_LUX["optimal_min"]:
-            messages.append("Light is slightly low, plant growth may slow")
-            score_delta -= 5
-        elif light > LIGHT_LUX["optimal_max"] and light <= LIGHT_LUX["high"]:
-            messages.append("Light is strong, monitor leaf stress")
-            score_delta -= 5
-        else:
-            messages.append("Light conditions may harm the plant")
-            score_delta -= 15
+        message, delta = LIGHT_LEVELS[profile.light_level(light)]
+        messages.append(message)
+        score_delta += delta
 
     return {
         "score_delta": score_delta,
@@ -0,0 +1,98 @@
+# logic/etag.py
+"""
+Strong ETags + If-None-Match handling for polled read endpoints.
+
+An ETag is derived from the newest reading's timestamp for the device
+(or the whole fleet), plus the endpoint and its parameters. Checking it
+costs one covered index lookup, so a 304 is returned before any insights
+or aggregation work. The lookup is not cached: the response cache is per
+worker, and another worker's ingest would never clear it.
+
+Responses that also depend on the clock (sliding trend windows,
+weather) add a time slot to the tag so they still refresh when no new
+reading has arrived.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Hashable
+
+from fastapi import Request, Response
+
+from db import sensor_collection
+from logic.readings import device_filter
+
+
+# ----------------------
+# Data version marker
+# ----------------------
+async def data_marker(device_id: str | None) -> str | None:
+    """
+    Newest reading timestamp (ISO) for the device, or None without data.
+    """
+    doc = await sensor_collection.find_one(
+        device_filter(device_id),
+        sort=[("timestamp", -1)],
+        projection={"_id": 0, "timestamp": 1}   # covered by the index
+    )
+    return doc["timestamp"].isoformat() if doc else None
+
+
+def time_slot(minutes: int) -> str:
+    now = datetime.utcnow()
+    return now.replace(minute=now.minute - now.minute % minutes, second=0, microsecond=0).isoformat()
+
+
+# ----------------------
+# ETag helpers
+# ----------------------
+def build_etag(*parts: Hashable) -> str:
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    endpoint: str,
+    device_id: str | None,
+    *params: Hashable
+) -> Response | None:
+    """
+    Sets the ETag header on `response` and returns a ready 304 response
+    if the client already has this version, otherwise None.
+
+    The marker is kept on request.state.data_marker: handlers add it to
+    their response cache key, so a body cached by this worker before
+    another worker's ingest is never served under the newer ETag.
+    """
+
+    marker = await data_marker(device_id)
+    request.state.data_marker = marker
+    if marker is None:
+        return None  # no data → let the handler produce its 404
+
+    etag = build_etag(endpoint, device_id, marker, *params)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,92 @@
+# logic/history.py
+"""
+History windows for trend analysis and watering prediction.
+
+A window is either count-based ("last N readings") or time-based
+("everything in the last 24h", capped at max_points), or both.
+
+Readings are always fetched newest-first so Mongo walks the timestamp
+index from the recent end and stops after `limit` documents. They are
+then reversed in memory, because the analysis layer expects
+oldest → newest.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+HISTORY_PROJECTION = {
+    "_id": 0,
+    "temperature": 1,
+    "humidity": 1,
+    "soilMoisture": 1,
+    "light": 1,
+    "timestamp": 1
+}
+
+# Hard cap so a time-based window can never load unbounded data
+MAX_WINDOW_POINTS = 1000
+
+
+class HistoryWindow:
+    def __init__(
+        self,
+        points: int | None = None,
+        duration: timedelta | None = None,
+        max_points: int = MAX_WINDOW_POINTS
+    ):
+        if points is None and duration is None:
+            raise ValueError("HistoryWindow needs points and/or duration")
+        if points is not None and points <= 0:
+            raise ValueError("points must be positive")
+
+        self.points = points
+        self.duration = duration
+        self.limit = min(points, max_points) if points else max_points
+
+    def __repr__(self):
+        return f"HistoryWindow(points={self.points}, duration={self.duration})"
+
+    # ----------------------
+    # Query parts
+    # ----------------------
+    def mongo_filter(self, device_id: str | None = None, now: datetime | None = None) -> Dict:
+        query: Dict = {}
+
+        if device_id:
+            query["device_id"] = device_id
+
+        if self.duration is not None:
+            now = now or datetime.utcnow()
+            query["timestamp"] = {"$gte": now - self.duration}
+
+        return query
+
+    async def fetch(
+        self,
+        collection,
+        device_id: str | None = None,
+        now: datetime | None = None
+    ) -> List[Dict]:
+        """
+        Returns the window's readings sorted oldest → newest.
+        """
+
+        cursor = collection.find(
+            self.mongo_filter(device_id, now),
+            projection=HISTORY_PROJECTION
+        ).sort("timestamp", -1).limit(self.limit)
+
+        docs = await cursor.to_list(length=self.limit)
+        docs.reverse()
+
+        return docs
+
+
+# ----------------------
+# Shared windows
+# ----------------------
+LAST_24_READINGS = HistoryWindow(points=24)
+LAST_24_HOURS = HistoryWindow(duration=timedelta(hours=24))
+
+# Used by the insights endpoints
+DEFAULT_HISTORY_WINDOW = LAST_24_READINGS
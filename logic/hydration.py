@@ -1,32 +1,21 @@
 # logic/hydration.py
-from .thresholds import SOIL_MOISTURE_PERCENT
+from .profiles import DEFAULT_PROFILE, CompiledProfile
 
-def analyze_hydration(soil_moisture: float):
-    messages = []
-    score_delta = 0
+# (message, score_delta) per level, wettest → driest
+HYDRATION_LEVELS = (
+    ("Soil moisture is in the optimal range", 5),                       # well_hydrated (75+)
+    ("Soil moisture is healthy", 0),                                    # healthy (60+)
+    ("Soil moisture is slightly low, keep monitoring", -5),             # watch
+    ("Soil moisture is low, watering may be needed soon", -15),         # pre_dry
+    ("Soil moisture is critically low, watering recommended", -30),     # dry zone
+)
 
-    # well_hydrated (75+) or healthy (60+)
-    if soil_moisture >= SOIL_MOISTURE_PERCENT["well_hydrated"]:
-        messages.append("Soil moisture is in the optimal range")
-        score_delta += 5
 
-    elif soil_moisture >= SOIL_MOISTURE_PERCENT["healthy"]:
-        messages.append("Soil moisture is healthy")
-        score_delta += 0
-
-    elif soil_moisture >= SOIL_MOISTURE_PERCENT["watch"]:
-        messages.append("Soil moisture is slightly low, keep monitoring")
-        score_delta -= 5
-
-    elif soil_moisture >= SOIL_MOISTURE_PERCENT["pre_dry"]:
-        messages.append("Soil moisture is low, watering may be needed soon")
-        score_delta -= 15
-
-    else:  # below pre_dry (dry zone)
-        messages.append("Soil moisture is critically low, watering recommended")
-        score_delta -= 30
+def analyze_hydration(soil_moisture: float, profile: CompiledProfile | None = None):
+    profile = profile or DEFAULT_PROFILE
+    message, score_delta = HYDRATION_LEVELS[profile.hydration_level(soil_moisture)]
 
     return {
         "score_delta": score_delta,
-        "messages": messages
+        "messages": [message]
     }
@@ -0,0 +1,221 @@
+# logic/ingest.py
+"""
+Sensor ingestion helpers.
+
+Shared by the single-reading endpoint and the batch endpoint so both
+store documents in exactly the same shape.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from db import sensor_collection
+from logic.cache import response_cache
+from logic.rollups import update_rollups
+from logic.stream import stream_hub
+from logic.trend_engine import trend_registry
+
+# ----------------------
+# Write-behind buffer config
+# ----------------------
+INGEST_BUFFER_ENABLED = os.getenv("INGEST_BUFFER_ENABLED", "false").lower() in ("1", "true", "yes")
+INGEST_BUFFER_MAX = int(os.getenv("INGEST_BUFFER_MAX", "10000"))          # readings held in memory
+INGEST_FLUSH_SIZE = int(os.getenv("INGEST_FLUSH_SIZE", "500"))            # group commit size
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL_S", "1.0"))  # max seconds between commits
+
+
+# ----------------------
+# Payload -> Mongo document
+# ----------------------
+def build_reading_document(payload: Dict) -> Dict:
+    """
+    Converts a validated payload dict into the stored document
+    (Unix epoch timestamp -> UTC datetime, server time if missing).
+    """
+
+    doc = dict(payload)
+
+    ts = (
+        datetime.utcfromtimestamp(doc["timestamp"])
+        if doc.get("timestamp")
+        else datetime.utcnow()
+    )
+
+    # Mongo keeps milliseconds — store exactly what will be read back,
+    # so in-memory state can be compared with stored readings
+    doc["timestamp"] = ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+    return doc
+
+
+# ----------------------
+# Post-write hooks (every storage path goes through here)
+# ----------------------
+async def after_insert(docs: List[Dict]):
+    await update_rollups(docs)
+
+    # Rollups are current again — drop cached insights/trends for these devices
+    response_cache.invalidate_devices({doc.get("device_id") for doc in docs})
+
+    # O(1) trend updates for devices whose state is in memory
+    trend_registry.update(docs)
+
+    # Live viewers get the readings without another database read
+    stream_hub.publish(docs)
+
+
+# ----------------------
+# Single insert
+# ----------------------
+async def insert_reading(doc: Dict) -> str:
+    result = await sensor_collection.insert_one(doc)
+    await after_insert([doc])
+    return str(result.inserted_id)
+
+
+# ----------------------
+# Bulk insert with per-record status
+# ----------------------
+async def insert_readings(docs: List[Dict]) -> Tuple[Dict[int, str], Dict[int, str]]:
+    """
+    Writes readings with one unordered insert_many.
+
+    Unordered means one bad document does not stop the rest.
+
+    Returns:
+        (inserted, failed)
+        inserted → {index: inserted_id}
+        failed   → {index: error message}
+    """
+
+    if not docs:
+        return {}, {}
+
+    failed: Dict[int, str] = {}
+
+    try:
+        await sensor_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed[err["index"]] = err.get("errmsg", "Write failed")
+
+    # insert_many sets _id on every document before sending
+    inserted = {
+        i: str(doc["_id"])
+        for i, doc in enumerate(docs)
+        if i not in failed and "_id" in doc
+    }
+
+    await after_insert([docs[i] for i in inserted])
+
+    return inserted, failed
+
+
+# ----------------------
+# Write-behind buffer (group commit)
+# ----------------------
+class BufferFull(Exception):
+    """Raised when the in-memory buffer is at capacity (caller should 429)."""
+
+
+class IngestBuffer:
+    """
+    In-process queue in front of sensor_collection.
+
+    - submit() is O(1) and never touches Mongo
+    - a single background task flushes when the buffer reaches
+      flush_size or every flush_interval seconds, whichever comes first
+    - each group commit is sorted by timestamp before insert_many
+    - memory is bounded by max_size; beyond that submit() raises BufferFull
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(self, max_size: int, flush_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._pending: List[Dict] = []
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        self.stats = {
+            "queued": 0,
+            "flushed": 0,
+            "failed": 0,
+            "rejected_full": 0,
+            "commits": 0
+        }
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, doc: Dict):
+        if len(self._pending) >= self.max_size:
+            self.stats["rejected_full"] += 1
+            raise BufferFull()
+
+        self._pending.append(doc)
+        self.stats["queued"] += 1
+
+        if len(self._pending) >= self.flush_size:
+            self._wake.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the background task and flushes everything left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[: self.flush_size]
+                del self._pending[: self.flush_size]
+
+                batch.sort(key=lambda d: d["timestamp"])
+
+                try:
+                    inserted, failed = await insert_readings(batch)
+                except PyMongoError as e:
+                    # Put the batch back in front (order preserved) and retry next tick
+                    self._pending[:0] = batch
+                    print("❌ Ingest flush failed, will retry:", e)
+                    return
+
+                self.stats["commits"] += 1
+                self.stats["flushed"] += len(inserted)
+                self.stats["failed"] += len(failed)
+
+
+ingest_buffer = IngestBuffer(
+    max_size=INGEST_BUFFER_MAX,
+    flush_size=INGEST_FLUSH_SIZE,
+    flush_interval=INGEST_FLUSH_INTERVAL
+)
@@ -3,35 +3,51 @@ FINAL DECISION + NARRATION LAYER
 """
 
 from .hydration import analyze_hydration
+from .profiles import CompiledProfile
 from .environment import analyze_environment
 from .trend_engine import analyze_trends
 from .water_prediction import predict_watering_need
 
 
+# (min_score, status, summary), best first
+STATUS_LEVELS = (
+    (90, "thriving", "Your plant is performing at its best 🌱"),
+    (80, "healthy", "Your plant is healthy and stable"),
+    (70, "stable", "Your plant is doing okay, just keep an eye on it"),
+    (60, "needs_attention", "Your plant may need some care soon"),
+    (None, "critical", "Immediate attention recommended"),
+)
+
+
+RAIN_DELAY_NOTE = "Rain is likely soon. You may want to delay watering."
+HEAT_STRESS_NOTE = "High temperatures expected. Soil may dry faster than usual."
+DRY_AIR_NOTE = "Low outdoor humidity may increase plant stress."
+
+
 def determine_status_and_message(score: int):
-    if score >= 90:
-        return "thriving", "Your plant is performing at its best 🌱"
-    elif score >= 80:
-        return "healthy", "Your plant is healthy and stable"
-    elif score >= 70:
-        return "stable", "Your plant is doing okay, just keep an eye on it"
-    elif score >= 60:
-        return "needs_attention", "Your plant may need some care soon"
-    else:
-        return "critical", "Immediate attention recommended"
+    for min_score, status, summary in STATUS_LEVELS:
+        if min_score is None or score >= min_score:
+            return status, summary
 
 
 def generate_plant_insights(
     sensor_data: dict,
     history: list | None = None,
-    weather: dict | None = None
+    weather: dict | None = None,
+    trends: dict | None = None,
+    profile: CompiledProfile | None = None
 ):
+    """
+    trends:  precomputed analyze_trends() output for `history`
+             (e.g. from the incremental trend state) — skips the rescan.
+    profile: compiled plant profile (logic/profiles.py); thresholds.py if None.
+    """
 
     insights: list[str] = []
     health_score: int = 100
 
     # --- Hydration ---
-    hydration = analyze_hydration(sensor_data["soilMoisture"])
+    hydration = analyze_hydration(sensor_data["soilMoisture"], profile)
     health_score += hydration["score_delta"]
     insights.extend(hydration["messages"])
 
@@ -39,7 +55,8 @@ def generate_plant_insights(
     environment = analyze_environment(
         temperature=sensor_data["temperature"],
         humidity=sensor_data["humidity"],
-        light=sensor_data.get("light")
+        light=sensor_data.get("light"),
+        profile=profile
     )
     health_score += environment["score_delta"]
     insights.extend(environment["messages"])
@@ -47,7 +64,7 @@ def generate_plant_insights(
     # --- Trends ---
     trend_insights = None
     if history and len(history) >= 5:
-        trend_insights = analyze_trends(history)
+        trend_insights = trends or analyze_trends(history)
         for t in trend_insights.values():
             if t["direction"] == "declining":
                 insights.append(t["message"])
@@ -59,7 +76,7 @@ def generate_plant_insights(
     # --- Water prediction ---
     watering = None
     if history and len(history) >= 2:
-        watering = predict_watering_need(sensor_data, history)
+        watering = predict_watering_need(sensor_data, history, profile)
         insights.append(watering["message"])
         if watering["urgency"] == "high":
             health_score -= 15
@@ -70,15 +87,13 @@ def generate_plant_insights(
     weather_notes = []
 
     if weather:
-        rain_prob = weather.get("rain_probability", 0)
+        rain_prob = weather.get("rain_probability") or 0  # None = no forecast
         forecast_temp = weather.get("temperature")
         humidity_forecast = weather.get("humidity")
 
         # Rain logic
         if rain_prob >= 60:
-            weather_notes.append(
-                "Rain is likely soon. You may want to delay watering."
-            )
+            weather_notes.append(RAIN_DELAY_NOTE)
 
             if watering and watering["urgency"] == "high":
                 watering["urgency"] = "medium"
@@ -86,16 +101,12 @@ def generate_plant_insights(
 
         # Heat stress
         if forecast_temp is not None and forecast_temp > 35:
-            weather_notes.append(
-                "High temperatures expected. Soil may dry faster than usual."
-            )
+            weather_notes.append(HEAT_STRESS_NOTE)
             health_score -= 5
 
         # Dry air stress
         if humidity_forecast is not None and humidity_forecast < 40:
-            weather_notes.append(
-                "Low outdoor humidity may increase plant stress."
-            )
+            weather_notes.append(DRY_AIR_NOTE)
             health_score -= 3
 
 
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+
+
+# -------------------------
+# Single sensor reading (ESP32 payload)
+# -------------------------
+class SensorPayload(BaseModel):
+    temperature: float = Field(..., example=24.1)
+    humidity: float = Field(..., example=60.2)
+    soilMoisture: float = Field(..., example=72.0)
+    light: float | None = Field(None, example=800.0)
+    device_id: str | None = Field(None, example="esp32-01")
+    lat: float | None = Field(None, ge=-90, le=90, example=52.52)      # device location (weather)
+    lon: float | None = Field(None, ge=-180, le=180, example=13.405)
+    timestamp: float | None = None  # Unix epoch (optional)
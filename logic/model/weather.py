@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+
+
+# -------------------------
+# Plant-relevant weather (input to generate_plant_insights)
+# -------------------------
+class WeatherContext(BaseModel):
+    # Keys read by generate_plant_insights / the batch engine —
+    # worst case over "now + the next forecast_hours"
+    temperature: float | None = Field(None, example=33.5)        # max °C
+    humidity: float | None = Field(None, example=38.0)           # min %
+    rain_probability: float | None = Field(None, example=80.0)   # max %, None = no forecast
+
+    # Informational
+    current_temperature: float | None = Field(None, example=27.1)
+    current_humidity: float | None = Field(None, example=52.0)
+    description: str | None = Field(None, example="light rain")
+    wind_speed: float | None = Field(None, example=3.4)
+    forecast_hours: int = Field(0, example=12)                   # 0 = current conditions only
@@ -0,0 +1,311 @@
+# logic/profiles.py
+"""
+Per-plant threshold profiles.
+
+A profile is plain data (JSON file or Mongo document):
+
+    {
+        "profile_id": "tomato",
+        "version": 3,
+        "device_ids": ["esp32-07", "esp32-08"],     # optional assignment
+        "temperature": {"optimal_min": 20, "optimal_max": 29},
+        "soil_moisture": {"pre_dry": 40},
+        ...
+    }
+
+Any section or key that is left out falls back to thresholds.py.
+
+A profile with profile_id "default" replaces thresholds.py for every
+unassigned device.
+
+Profiles are compiled once per (profile_id, version) into sorted edge
+tuples — bump "version" when editing a profile. A reading is then evaluated with a couple of bisect calls
+instead of if/elif chains and dict lookups.
+"""
+
+import asyncio
+import json
+import os
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable
+
+from .cache import response_cache
+from .thresholds import (
+    HUMIDITY_PERCENT,
+    LIGHT_LUX,
+    SOIL_MOISTURE_PERCENT,
+    TEMPERATURE_C,
+    WATERING_RISK,
+    WATERING_SOIL_PERCENT
+)
+
+PROFILES_DIR = os.getenv(
+    "PROFILES_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")
+)
+
+PROFILE_REFRESH_S = int(os.getenv("PROFILE_REFRESH_S", "300"))  # 0 = load once at startup
+
+DEFAULT_PROFILE_ID = "default"
+
+# Section → default bands
+DEFAULT_SECTIONS = {
+    "temperature": TEMPERATURE_C,
+    "humidity": HUMIDITY_PERCENT,
+    "light": LIGHT_LUX,
+    "soil_moisture": SOIL_MOISTURE_PERCENT,
+    "watering_soil": WATERING_SOIL_PERCENT,
+    "watering_risk": WATERING_RISK
+}
+
+
+# ----------------------
+# Compiled form
+# ----------------------
+class CompiledProfile:
+    """
+    Lookup tables for one profile version. Level numbers index the
+    *_LEVELS message tables in hydration.py / environment.py.
+    """
+
+    __slots__ = (
+        "profile_id", "version",
+        "hydration_edges",
+        "temperature_below", "temperature_above",
+        "humidity_below", "humidity_above",
+        "light_below", "light_above",
+        "watering_soil", "watering_risk"
+    )
+
+    def __init__(self, profile_id: str, version: int, sections: Dict[str, Dict]):
+        self.profile_id = profile_id
+        self.version = version
+
+        soil = sections["soil_moisture"]
+        temp = sections["temperature"]
+        hum = sections["humidity"]
+        light = sections["light"]
+
+        # ascending: driest edge first
+        self.hydration_edges = (soil["pre_dry"], soil["watch"], soil["healthy"], soil["well_hydrated"])
+
+        self.temperature_below = (temp["warning_low"], temp["optimal_min"])
+        self.temperature_above = (temp["optimal_max"], temp["warning_high"])
+        self.humidity_below = (hum["warning_low"], hum["optimal_min"])
+        self.humidity_above = (hum["optimal_max"], hum["warning_high"])
+        self.light_below = (light["low"], light["optimal_min"])
+        self.light_above = (light["optimal_max"], light["high"])
+
+        self.watering_soil = dict(sections["watering_soil"])
+        self.watering_risk = dict(sections["watering_risk"])
+
+    def __repr__(self):
+        return f"CompiledProfile({self.profile_id!r}, v{self.version})"
+
+    @property
+    def tag(self) -> str:
+        """
+        Identifies the bands in ETags — a new version changes the response.
+        """
+        return f"{self.profile_id}:{self.version}"
+
+    # 0 = well hydrated … 4 = dry
+    def hydration_level(self, soil_moisture: float) -> int:
+        return len(self.hydration_edges) - bisect_right(self.hydration_edges, soil_moisture)
+
+    # 0 = optimal, 1 = warning band, 2 = outside (bounds inclusive)
+    @staticmethod
+    def _band_level(value: float, below: tuple, above: tuple) -> int:
+        return max(2 - bisect_right(below, value), bisect_left(above, value))
+
+    def temperature_level(self, temperature: float) -> int:
+        return self._band_level(temperature, self.temperature_below, self.temperature_above)
+
+    def humidity_level(self, humidity: float) -> int:
+        return self._band_level(humidity, self.humidity_below, self.humidity_above)
+
+    # 0 = optimal, 1 = slightly low, 2 = strong, 3 = harmful
+    def light_level(self, light: float) -> int:
+        below = bisect_right(self.light_below, light)
+        above = bisect_left(self.light_above, light)
+
+        if below == 0 or above == 2:
+            return 3
+        if below == 1:
+            return 1
+        if above == 1:
+            return 2
+        return 0
+
+
+def _check_order(section: str, bands: Dict, keys: Iterable[str]):
+    values = [bands[k] for k in keys]
+    if values != sorted(values):
+        raise ValueError(f"Profile section '{section}' must satisfy {' <= '.join(keys)}")
+
+
+def compile_profile(raw: Dict) -> CompiledProfile:
+    """
+    Validates a raw profile (merged over the defaults) and compiles it.
+    Raises ValueError on unknown sections or inconsistent bands.
+    """
+
+    unknown = set(raw) - set(DEFAULT_SECTIONS) - {"_id", "profile_id", "version", "device_ids", "species", "name"}
+    if unknown:
+        raise ValueError(f"Unknown profile sections: {', '.join(sorted(unknown))}")
+
+    sections = {}
+    for name, defaults in DEFAULT_SECTIONS.items():
+        override = raw.get(name) or {}
+        extra = set(override) - set(defaults)
+        if extra:
+            raise ValueError(f"Unknown keys in '{name}': {', '.join(sorted(extra))}")
+        sections[name] = {**defaults, **override}
+
+    _check_order("temperature", sections["temperature"], ("warning_low", "optimal_min", "optimal_max", "warning_high"))
+    _check_order("humidity", sections["humidity"], ("warning_low", "optimal_min", "optimal_max", "warning_high"))
+    _check_order("light", sections["light"], ("low", "optimal_min", "optimal_max", "high"))
+    _check_order("soil_moisture", sections["soil_moisture"], ("dry", "pre_dry", "watch", "healthy", "well_hydrated"))
+    _check_order("watering_soil", sections["watering_soil"], ("pre_dry", "watch", "healthy"))
+
+    return CompiledProfile(
+        raw.get("profile_id", DEFAULT_PROFILE_ID),
+        int(raw.get("version", 0)),
+        sections
+    )
+
+
+DEFAULT_PROFILE = compile_profile({"profile_id": DEFAULT_PROFILE_ID})
+
+
+# ----------------------
+# Store (compiled cache + device assignment)
+# ----------------------
+class ProfileStore:
+    def __init__(self):
+        self._compiled: Dict[tuple, CompiledProfile] = {}   # (profile_id, version) → compiled
+        self._current: Dict[str, CompiledProfile] = {DEFAULT_PROFILE_ID: DEFAULT_PROFILE}
+        self._assignments: Dict[str, str] = {}               # device_id → profile_id
+
+    def register(self, raw: Dict) -> CompiledProfile:
+        """
+        Compiles a raw profile unless this exact version is already cached.
+        """
+        key = (raw["profile_id"], int(raw.get("version", 0)))
+
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = compile_profile(raw)
+            self._compiled[key] = compiled
+
+        self._current[compiled.profile_id] = compiled
+        for device_id in raw.get("device_ids", []):
+            self._assignments[device_id] = compiled.profile_id
+
+        return compiled
+
+    def load(self, raw_profiles: Iterable[Dict]) -> bool:
+        """
+        Replaces the active profile set. Returns True if anything changed.
+        """
+        before = {pid: (p.version, id(p)) for pid, p in self._current.items()}
+        before_assignments = dict(self._assignments)
+
+        self._current = {DEFAULT_PROFILE_ID: DEFAULT_PROFILE}
+        self._assignments = {}
+
+        for raw in raw_profiles:
+            try:
+                self.register(raw)
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                print(f"❌ Skipping profile {raw.get('profile_id')!r}:", e)
+
+        # Drop compiled versions that are no longer active
+        active = {(p.profile_id, p.version) for p in self._current.values()}
+        self._compiled = {k: v for k, v in self._compiled.items() if k in active}
+
+        after = {pid: (p.version, id(p)) for pid, p in self._current.items()}
+        return after != before or self._assignments != before_assignments
+
+    def get(self, profile_id: str) -> CompiledProfile:
+        return self._current.get(profile_id) or self._current[DEFAULT_PROFILE_ID]
+
+    def for_device(self, device_id: str | None) -> CompiledProfile:
+        return self.get(self._assignments.get(device_id, DEFAULT_PROFILE_ID))
+
+
+_last_good_files: Dict[str, Dict] = {}   # path → last version that parsed
+
+
+def read_profile_files(directory: str = PROFILES_DIR) -> list:
+    """
+    A file that can't be read or parsed is logged and its last good
+    version (if any) is kept — one bad edit must not drop the profile.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError as e:
+        print(f"❌ Reading {directory} failed:", e)
+        return [raw for path, raw in _last_good_files.items() if os.path.dirname(path) == directory]
+
+    profiles = []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+
+        path = os.path.join(directory, name)
+        try:
+            with open(path, "r") as f:
+                raw = json.load(f)
+            if not isinstance(raw, dict):
+                raise ValueError("expected a JSON object")
+            raw.setdefault("profile_id", name[: -len(".json")])
+            _last_good_files[path] = raw
+        except (OSError, ValueError) as e:
+            print(f"❌ Skipping profile file {name}:", e)
+            raw = _last_good_files.get(path)
+            if raw is None:
+                continue
+
+        profiles.append(raw)
+
+    return profiles
+
+
+profile_store = ProfileStore()
+
+
+async def refresh_profiles(collection):
+    """
+    Reloads profiles from PROFILES_DIR and `collection` (plant_profiles;
+    Mongo wins on duplicate profile_id). Only new versions are compiled.
+    """
+
+    raw_profiles = {p["profile_id"]: p for p in read_profile_files(PROFILES_DIR)}
+
+    try:
+        async for doc in collection.find({}, {"_id": 0}):
+            if "profile_id" in doc:
+                raw_profiles[doc["profile_id"]] = doc
+    except Exception as e:
+        # Keep the last good profile set — profiles must never take insights down
+        print("❌ Loading plant profiles failed:", e)
+        return
+
+    if profile_store.load(raw_profiles.values()):
+        # Cached insights were scored with the old bands
+        response_cache.clear()
+        print(f"🪴 Plant profiles loaded: {len(raw_profiles)}")
+
+
+async def run_profile_refresher(collection):
+    """
+    Started from the app lifespan when PROFILE_REFRESH_S > 0.
+    """
+
+    while True:
+        await asyncio.sleep(PROFILE_REFRESH_S)
+        await refresh_profiles(collection)
@@ -0,0 +1,104 @@
+# logic/readings.py
+"""
+Sensor reading queries shared by the API routers.
+
+Every query takes an optional device_id. When it is given, the query is
+a range scan on the (device_id, timestamp) index. Without it, the query
+falls back to the fleet-wide timestamp index (old behaviour).
+"""
+
+import asyncio
+from typing import Dict, List, Tuple
+
+from db import sensor_collection
+from logic.history import DEFAULT_HISTORY_WINDOW, HistoryWindow
+from logic.trend_engine import trend_registry
+
+# Per-request cap for fleet queries
+MAX_FLEET_DEVICES = 500
+FLEET_QUERY_CONCURRENCY = 20
+
+
+def device_filter(device_id: str | None) -> Dict:
+    return {"device_id": device_id} if device_id else {}
+
+
+# ----------------------
+# Latest reading
+# ----------------------
+async def get_latest_reading(device_id: str | None = None) -> Dict | None:
+    return await sensor_collection.find_one(
+        device_filter(device_id),
+        sort=[("timestamp", -1)],
+        projection={"_id": 0}
+    )
+
+
+# ----------------------
+# History window
+# ----------------------
+async def get_history(
+    device_id: str | None = None,
+    window: HistoryWindow = DEFAULT_HISTORY_WINDOW
+) -> List[Dict]:
+    """
+    Most recent readings in the window, sorted oldest → newest.
+    """
+    return await window.fetch(sensor_collection, device_id)
+
+
+# ----------------------
+# History + trends (incremental when possible)
+# ----------------------
+async def get_history_and_trends(
+    device_id: str | None,
+    latest: Dict
+) -> Tuple[List[Dict], Dict]:
+    """
+    Returns (history, analyze_trends(history)) for the default window.
+
+    The in-memory trend state is used as long as it has seen the latest
+    stored reading. Otherwise (cold start, reading stored by another
+    worker) the window is fetched once and the state is re-seeded.
+    """
+
+    state = trend_registry.get(device_id)
+
+    if state is None or state.latest_timestamp != latest.get("timestamp"):
+        state = trend_registry.seed(device_id, await get_history(device_id))
+
+    return state.history(), state.analyze()
+
+
+# ----------------------
+# Fleet
+# ----------------------
+async def list_device_ids(limit: int = MAX_FLEET_DEVICES) -> List[str]:
+    ids = await sensor_collection.distinct("device_id")
+    return sorted(i for i in ids if i)[:limit]
+
+
+async def get_fleet_readings(device_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Latest reading, history and trends for each device.
+
+    Each device is its own small index range scan (cost per device,
+    not per fleet), run concurrently with a bounded fan-out.
+
+    Returns:
+        {device_id: {"latest": {...} | None, "history": [...], "trends": {...} | None}}
+    """
+
+    semaphore = asyncio.Semaphore(FLEET_QUERY_CONCURRENCY)
+
+    async def load(device_id: str):
+        async with semaphore:
+            latest = await get_latest_reading(device_id)
+            if not latest:
+                return device_id, {"latest": None, "history": [], "trends": None}
+
+            history, trends = await get_history_and_trends(device_id, latest)
+            return device_id, {"latest": latest, "history": history, "trends": trends}
+
+    results = await asyncio.gather(*(load(d) for d in device_ids))
+    return dict(results)
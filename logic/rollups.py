@@ -0,0 +1,288 @@
+# logic/rollups.py
+"""
+Hourly / daily rollups of sensor readings.
+
+One document per (device_id, bucket):
+
+    {
+        "device_id": "esp32-01",
+        "bucket": datetime(2026, 1, 10, 14),   # bucket start (UTC)
+        "count": 12,
+        "temperature": {"count": 12, "sum": 290.4, "min": 23.1, "max": 25.0},
+        "humidity": {...},
+        "soilMoisture": {...},
+        "light": {...}          # per-metric count: light is optional
+    }
+
+Rollups are updated incrementally at ingest time ($inc / $min / $max
+upserts). A background compactor can rebuild recent buckets from raw
+readings to repair anything a failed ingest hook missed. It only rebuilds
+closed buckets: replacing one that ingest is still updating would lose or
+double-count the readings that land around the rebuild.
+"""
+
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from db import rollup_collections, sensor_collection
+
+METRICS = ("temperature", "humidity", "soilMoisture", "light")
+RESOLUTIONS = ("hour", "day")
+
+# Rollup key for readings sent without a device_id
+# ($merge cannot match on a null field)
+UNASSIGNED_DEVICE = "_unassigned"
+
+# Background compactor (0 disables it)
+ROLLUP_COMPACT_INTERVAL_S = float(os.getenv("ROLLUP_COMPACT_INTERVAL_S", "0"))
+ROLLUP_COMPACT_LOOKBACK_H = int(os.getenv("ROLLUP_COMPACT_LOOKBACK_H", "2"))
+
+
+# ----------------------
+# Buckets
+# ----------------------
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+# ----------------------
+# Incremental update (ingest time)
+# ----------------------
+def _empty_stats() -> Dict:
+    return {"count": 0, "metrics": {}}
+
+
+def _accumulate(stats: Dict, doc: Dict):
+    stats["count"] += 1
+
+    for metric in METRICS:
+        value = doc.get(metric)
+        if value is None:
+            continue
+
+        m = stats["metrics"].get(metric)
+        if m is None:
+            stats["metrics"][metric] = {"count": 1, "sum": value, "min": value, "max": value}
+        else:
+            m["count"] += 1
+            m["sum"] += value
+            m["min"] = min(m["min"], value)
+            m["max"] = max(m["max"], value)
+
+
+def build_rollup_updates(docs: Iterable[Dict], resolution: str) -> List[UpdateOne]:
+    """
+    Folds readings into one upsert per (device_id, bucket), so a batch
+    of 500 readings from one device costs a single write per bucket.
+    """
+
+    grouped: Dict[tuple, Dict] = defaultdict(_empty_stats)
+
+    for doc in docs:
+        key = (
+            doc.get("device_id") or UNASSIGNED_DEVICE,
+            bucket_start(doc["timestamp"], resolution)
+        )
+        _accumulate(grouped[key], doc)
+
+    updates = []
+    for (device_id, bucket), stats in grouped.items():
+        inc = {"count": stats["count"]}
+        mins, maxs = {}, {}
+
+        for metric, m in stats["metrics"].items():
+            inc[f"{metric}.count"] = m["count"]
+            inc[f"{metric}.sum"] = m["sum"]
+            mins[f"{metric}.min"] = m["min"]
+            maxs[f"{metric}.max"] = m["max"]
+
+        update = {"$inc": inc}
+        if mins:
+            update["$min"] = mins
+            update["$max"] = maxs
+
+        updates.append(
+            UpdateOne({"device_id": device_id, "bucket": bucket}, update, upsert=True)
+        )
+
+    return updates
+
+
+async def update_rollups(docs: List[Dict]):
+    """
+    Applies freshly stored readings to every rollup resolution.
+    Failures are logged, never raised — ingest must not fail because
+    of a rollup, and the compactor repairs missed buckets.
+    """
+
+    if not docs:
+        return
+
+    for resolution in RESOLUTIONS:
+        updates = build_rollup_updates(docs, resolution)
+        try:
+            await rollup_collections[resolution].bulk_write(updates, ordered=False)
+        except PyMongoError as e:
+            print(f"❌ Rollup update failed ({resolution}):", e)
+
+
+# ----------------------
+# Rebuild from raw readings (compactor / backfill)
+# ----------------------
+def _rebuild_pipeline(since: datetime, until: datetime, resolution: str) -> List[Dict]:
+    group = {
+        "_id": {
+            "device_id": {"$ifNull": ["$device_id", UNASSIGNED_DEVICE]},
+            "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": resolution}}
+        },
+        "count": {"$sum": 1}
+    }
+    project = {
+        "_id": 0,
+        "device_id": "$_id.device_id",
+        "bucket": "$_id.bucket",
+        "count": 1
+    }
+
+    for metric in METRICS:
+        field = f"${metric}"
+        group[f"{metric}_count"] = {"$sum": {"$cond": [{"$isNumber": field}, 1, 0]}}
+        group[f"{metric}_sum"] = {"$sum": field}
+        group[f"{metric}_min"] = {"$min": field}
+        group[f"{metric}_max"] = {"$max": field}
+        # A metric no reading had is left out, like at ingest time — a null
+        # min would stick forever ($min keeps null, it sorts below numbers)
+        project[metric] = {
+            "$cond": [
+                {"$gt": [f"${metric}_count", 0]},
+                {
+                    "count": f"${metric}_count",
+                    "sum": f"${metric}_sum",
+                    "min": f"${metric}_min",
+                    "max": f"${metric}_max"
+                },
+                "$$REMOVE"
+            ]
+        }
+
+    return [
+        {"$match": {"timestamp": {"$gte": since, "$lt": until}}},
+        {"$group": group},
+        {"$project": project},
+        {
+            "$merge": {
+                "into": rollup_collections[resolution].name,
+                "on": ["device_id", "bucket"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }
+        }
+    ]
+
+
+async def rebuild_rollups(since: datetime, until: datetime | None = None):
+    """
+    Recomputes every closed bucket that overlaps [since, until) from raw
+    data. The range is widened to whole days so daily buckets stay
+    complete, and cut at the current hour / day: open buckets are left
+    to the ingest-time updates.
+    """
+
+    now = datetime.utcnow()
+    start = bucket_start(since, "day")
+
+    for resolution in RESOLUTIONS:
+        end = bucket_start(now, resolution)
+        if until is not None:
+            end = min(end, bucket_start(until, resolution))   # whole buckets only
+        if start >= end:
+            continue
+
+        pipeline = _rebuild_pipeline(start, end, resolution)
+        await sensor_collection.aggregate(pipeline).to_list(length=None)
+
+
+async def run_compactor():
+    """
+    Periodically rebuilds the most recent buckets.
+    Started from the app lifespan when ROLLUP_COMPACT_INTERVAL_S > 0.
+    """
+
+    while True:
+        await asyncio.sleep(ROLLUP_COMPACT_INTERVAL_S)
+        since = datetime.utcnow() - timedelta(hours=ROLLUP_COMPACT_LOOKBACK_H)
+        try:
+            await rebuild_rollups(since)
+        except PyMongoError as e:
+            print("❌ Rollup compaction failed:", e)
+
+
+# ----------------------
+# Read side (trend charts)
+# ----------------------
+async def read_rollups(
+    resolution: str,
+    since: datetime,
+    until: datetime | None = None,
+    device_id: str | None = None,
+    unit: str | None = None,
+    bin_size: int = 1
+) -> List[Dict]:
+    """
+    Returns one row per bucket, oldest first:
+        {"bucket": datetime, "count": int,
+         "temperature": avg | None, ..., "min": {...}, "max": {...}}
+
+    Without device_id the buckets of all devices are merged.
+    unit / bin_size regroup rollup buckets into coarser ones
+    (e.g. hourly rollups → 6h buckets) with $dateTrunc.
+    """
+
+    match: Dict = {"bucket": {"$gte": bucket_start(since, resolution)}}
+    if until is not None:
+        match["bucket"]["$lt"] = until
+    if device_id:
+        match["device_id"] = device_id
+
+    bucket_key = (
+        {"$dateTrunc": {"date": "$bucket", "unit": unit, "binSize": bin_size}}
+        if unit
+        else "$bucket"
+    )
+
+    group: Dict = {"_id": bucket_key, "count": {"$sum": "$count"}}
+    for metric in METRICS:
+        group[f"{metric}_count"] = {"$sum": f"${metric}.count"}
+        group[f"{metric}_sum"] = {"$sum": f"${metric}.sum"}
+        group[f"{metric}_min"] = {"$min": f"${metric}.min"}
+        group[f"{metric}_max"] = {"$max": f"${metric}.max"}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": group},
+        {"$sort": {"_id": 1}}
+    ]
+
+    rows = await rollup_collections[resolution].aggregate(pipeline).to_list(length=None)
+
+    results = []
+    for row in rows:
+        item = {"bucket": row["_id"], "count": row["count"], "min": {}, "max": {}}
+        for metric in METRICS:
+            count = row[f"{metric}_count"]
+            item[metric] = row[f"{metric}_sum"] / count if count else None
+            item["min"][metric] = row[f"{metric}_min"]
+            item["max"][metric] = row[f"{metric}_max"]
+        results.append(item)
+
+    return results
@@ -0,0 +1,142 @@
+# logic/stream.py
+"""
+In-process pub/sub hub for live readings and insights.
+
+- after_insert() publishes every stored batch once
+- insights are recomputed from the incremental trend state
+  (logic/trend_engine.py), so there is no database read per event
+- each event is serialized once and shared by every subscriber
+- every subscriber has a bounded queue; a client that falls behind
+  is dropped instead of slowing everyone else down
+
+All methods run on the event loop thread.
+"""
+
+import asyncio
+import json
+import os
+from typing import Dict, List, Set
+
+from logic.insights import generate_plant_insights
+from logic.profiles import profile_store
+from logic.trend_engine import trend_registry
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+
+ALL_DEVICES = None  # subscription key for the whole fleet
+
+# Sent as the last message to a subscriber that was dropped
+DROPPED_EVENT = json.dumps({"type": "dropped", "reason": "slow consumer"})
+
+
+class Subscription:
+    def __init__(self, device_id: str | None, queue_size: int):
+        self.device_id = device_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    async def next_event(self) -> str:
+        return await self.queue.get()
+
+
+def _reading_for_json(doc: Dict) -> Dict:
+    reading = {k: v for k, v in doc.items() if k != "_id"}
+    if reading.get("timestamp") is not None:
+        reading["timestamp"] = reading["timestamp"].isoformat()
+    return reading
+
+
+class StreamHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+
+        self._subscribers: Dict[str | None, Set[Subscription]] = {}
+
+        self.stats = {"published": 0, "delivered": 0, "dropped_clients": 0}
+
+    # ----------------------
+    # Subscribers
+    # ----------------------
+    def subscribe(self, device_id: str | None) -> Subscription:
+        sub = Subscription(device_id, self.queue_size)
+        self._subscribers.setdefault(device_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subscribers.get(sub.device_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.device_id]
+
+    # ----------------------
+    # Publish
+    # ----------------------
+    def publish(self, docs: List[Dict]):
+        """
+        Call after trend_registry.update(docs) so insights include them.
+        """
+        by_device: Dict[str | None, List[Dict]] = {}
+        for doc in sorted(docs, key=lambda d: d["timestamp"]):
+            by_device.setdefault(doc.get("device_id"), []).append(doc)
+
+        for device_id, readings in by_device.items():
+            targets = self._subscribers.get(device_id, set()) | self._subscribers.get(ALL_DEVICES, set())
+            if not targets:
+                continue  # nobody watching → no work
+
+            state = trend_registry.get(device_id)
+            latest = readings[-1]
+            profile = profile_store.for_device(device_id)
+
+            if state is not None:
+                insights = generate_plant_insights(
+                    sensor_data=latest,
+                    history=state.history(),
+                    trends=state.analyze(),
+                    profile=profile
+                )
+                trend_stats = state.statistics()
+            else:
+                insights = generate_plant_insights(sensor_data=latest, history=readings, profile=profile)
+                trend_stats = None
+
+            event = json.dumps({
+                "type": "readings",
+                "device_id": device_id,
+                "readings": [_reading_for_json(r) for r in readings],
+                "insights": insights,
+                "trend_stats": trend_stats
+            })
+
+            self.stats["published"] += 1
+            for sub in targets:
+                self._deliver(sub, event)
+
+    def _deliver(self, sub: Subscription, event: str):
+        if sub.dropped:
+            return
+
+        try:
+            sub.queue.put_nowait(event)
+            self.stats["delivered"] += 1
+        except asyncio.QueueFull:
+            # Slow consumer: discard its backlog, tell it why, stop sending
+            sub.dropped = True
+            self.unsubscribe(sub)
+            self.stats["dropped_clients"] += 1
+
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(DROPPED_EVENT)
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "devices_watched": len(self._subscribers),
+            "queue_size": self.queue_size
+        }
+
+
+stream_hub = StreamHub(queue_size=STREAM_QUEUE_SIZE)
@@ -33,3 +33,23 @@ LIGHT_LUX = {
     "optimal_max": 2000,
     "high": 3000
 }
+
+# Watering triggers (soil moisture %)
+# NOTE: deliberately lower than SOIL_MOISTURE_PERCENT — hydration scoring
+# starts warning early, the watering decision only fires when soil is
+# actually drying. Both live here so per-plant profiles override them
+# together (see logic/profiles.py).
+WATERING_SOIL_PERCENT = {
+    "healthy": 45,
+    "watch": 35,
+    "pre_dry": 25
+}
+
+# Drying speed (% drop per 24h) + environmental stress for watering
+WATERING_RISK = {
+    "fast_dry_drop": 8,     # aggressive drying
+    "slow_dry_drop": 3,     # stable soil
+    "temp_high": 32,        # °C
+    "humidity_low": 40,     # %
+    "light_high": 800       # lux
+}
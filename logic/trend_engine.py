@@ -11,6 +11,7 @@ This file does NOT decide final health score.
 It only observes movement over time.
 """
 
+from collections import OrderedDict, deque
 from statistics import mean
 from typing import List, Dict
 
@@ -138,3 +139,230 @@ def analyze_trends(history: List[dict]) -> Dict:
         }
 
     return results
+
+
+# ============================================================
+# Incremental (streaming) trend state
+# ------------------------------------------------------------
+# Same output as analyze_trends(), without re-reading history.
+#
+# Each metric keeps the non-missing values of the last WINDOW_SIZE
+# readings split into two halves (exactly the halves detect_trend uses),
+# plus an EWMA and running sums for a least-squares slope. Half-means are
+# taken with statistics.mean at read time, like detect_trend: running
+# float sums would drift and flip verdicts at the NOISE_TOLERANCE edge.
+# ============================================================
+WINDOW_SIZE = 24            # readings per device (matches the history window)
+EWMA_ALPHA = 0.3
+RESYNC_EVERY = 1024         # recompute regression sums from scratch to cancel float drift
+MAX_TRACKED_DEVICES = 10000
+
+TREND_METRICS = ("soilMoisture", "temperature", "humidity", "light")
+
+
+class MetricAccumulator:
+    def __init__(self):
+        self.first = deque()        # older half  (len = n // 2)
+        self.second = deque()       # newer half
+        self.sum_first = 0.0
+        self.sum_second = 0.0
+        self.sum_xy = 0.0           # Σ x·y with x = 0..n-1 (oldest = 0)
+        self.ewma = None
+        self._updates = 0
+
+    def __len__(self):
+        return len(self.first) + len(self.second)
+
+    # ----- halves -----
+    def _rebalance(self):
+        target = len(self) // 2
+
+        while len(self.first) < target:
+            v = self.second.popleft()
+            self.sum_second -= v
+            self.first.append(v)
+            self.sum_first += v
+
+        while len(self.first) > target:
+            v = self.first.pop()
+            self.sum_first -= v
+            self.second.appendleft(v)
+            self.sum_second += v
+
+    def _maybe_resync(self):
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            values = list(self.first) + list(self.second)
+            self.sum_first = sum(self.first)
+            self.sum_second = sum(self.second)
+            self.sum_xy = sum(x * y for x, y in enumerate(values))
+
+    # ----- updates -----
+    def push(self, value: float):
+        self.sum_xy += len(self) * value
+        self.second.append(value)
+        self.sum_second += value
+        self._rebalance()
+
+        self.ewma = value if self.ewma is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * self.ewma
+        self._maybe_resync()
+
+    def pop_oldest(self):
+        if self.first:
+            v = self.first.popleft()
+            self.sum_first -= v
+        else:
+            v = self.second.popleft()
+            self.sum_second -= v
+
+        # every remaining x shifts down by one
+        self.sum_xy -= self.sum_first + self.sum_second
+        self._rebalance()
+        self._maybe_resync()
+
+    # ----- outputs -----
+    def trend(self) -> Dict:
+        """Same result as detect_trend() over the window's values."""
+        n = len(self)
+
+        if n < MIN_POINTS:
+            return {"direction": "insufficient_data", "slope": 0.0}
+
+        # O(window), bit-identical to detect_trend()
+        slope = mean(self.second) - mean(self.first)
+
+        if abs(slope) < NOISE_TOLERANCE:
+            direction = "stable"
+        elif slope > 0:
+            direction = "improving"
+        else:
+            direction = "declining"
+
+        return {"direction": direction, "slope": round(slope, 2)}
+
+    def regression_slope(self) -> float | None:
+        """Least-squares slope per reading."""
+        n = len(self)
+        if n < 2:
+            return None
+
+        sum_x = n * (n - 1) / 2
+        sum_x2 = (n - 1) * n * (2 * n - 1) / 6
+        sum_y = self.sum_first + self.sum_second
+
+        return (n * self.sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x ** 2)
+
+
+class DeviceTrendState:
+    """
+    Rolling window of one device's readings + per-metric accumulators.
+    """
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        self.window: deque = deque()
+        self.window_size = window_size
+        self.metrics = {m: MetricAccumulator() for m in TREND_METRICS}
+
+    @property
+    def latest_timestamp(self):
+        return self.window[-1]["timestamp"] if self.window else None
+
+    def push(self, doc: Dict):
+        if self.window and doc["timestamp"] < self.window[-1]["timestamp"]:
+            # Late reading: rare, rebuild in timestamp order (O(window))
+            docs = sorted([*self.window, doc], key=lambda d: d["timestamp"])
+            self.__init__(self.window_size)
+            for d in docs[-self.window_size:]:
+                self.push(d)
+            return
+
+        if len(self.window) == self.window_size:
+            oldest = self.window.popleft()
+            for metric, acc in self.metrics.items():
+                if oldest.get(metric) is not None:
+                    acc.pop_oldest()
+
+        self.window.append(doc)
+        for metric, acc in self.metrics.items():
+            if doc.get(metric) is not None:
+                acc.push(doc[metric])
+
+    def history(self) -> List[dict]:
+        return list(self.window)
+
+    def analyze(self) -> Dict:
+        """Same output shape as analyze_trends(history)."""
+        results = {}
+
+        for metric, acc in self.metrics.items():
+            trend = acc.trend()
+            severity = classify_severity(trend["direction"], trend["slope"])
+
+            results[metric] = {
+                "direction": trend["direction"],
+                "severity": severity,
+                "slope": trend["slope"],
+                "message": build_message(metric, trend["direction"], severity)
+            }
+
+        return results
+
+    def statistics(self) -> Dict:
+        """Smoothed level and least-squares rate for each metric."""
+        return {
+            metric: {
+                "ewma": round(acc.ewma, 2) if acc.ewma is not None else None,
+                "rate_per_reading": (
+                    round(acc.regression_slope(), 3)
+                    if acc.regression_slope() is not None
+                    else None
+                )
+            }
+            for metric, acc in self.metrics.items()
+        }
+
+
+class TrendRegistry:
+    """
+    Per-device DeviceTrendState, LRU-bounded.
+
+    Only devices that were seeded from the database are tracked, so a
+    state never pretends to know history it has not seen.
+    """
+
+    def __init__(self, max_devices: int = MAX_TRACKED_DEVICES, window_size: int = WINDOW_SIZE):
+        self.max_devices = max_devices
+        self.window_size = window_size
+        self._states: "OrderedDict[str | None, DeviceTrendState]" = OrderedDict()
+
+    def get(self, device_id: str | None) -> DeviceTrendState | None:
+        state = self._states.get(device_id)
+        if state is not None:
+            self._states.move_to_end(device_id)
+        return state
+
+    def seed(self, device_id: str | None, history: List[dict]) -> DeviceTrendState:
+        state = DeviceTrendState(self.window_size)
+        for doc in history[-self.window_size:]:
+            state.push(doc)
+
+        self._states[device_id] = state
+        self._states.move_to_end(device_id)
+        while len(self._states) > self.max_devices:
+            self._states.popitem(last=False)
+
+        return state
+
+    def update(self, docs: List[dict]):
+        """Feeds freshly stored readings to every tracked state they belong to."""
+        fleet = self._states.get(None)
+
+        for doc in sorted(docs, key=lambda d: d["timestamp"]):
+            state = self._states.get(doc.get("device_id"))
+            if state is not None:
+                state.push(doc)
+            if fleet is not None and doc.get("device_id") is not None:
+                fleet.push(doc)
+
+
+trend_registry = TrendRegistry()
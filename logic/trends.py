@@ -1,7 +1,31 @@
 # logic/trends.py
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from db import sensor_collection
+from logic.downsample import lttb_indices
+from logic.readings import device_filter
+from logic.rollups import METRICS, read_rollups
+
+# Max points returned per series, whatever the range
+MAX_POINTS = 500
+
+# Raw mode refuses ranges with more readings than this
+RAW_FETCH_LIMIT = 20000
+
+# Bucket name → (size, $dateTrunc unit, binSize), smallest first
+BUCKETS = {
+    "1m": (timedelta(minutes=1), "minute", 1),
+    "5m": (timedelta(minutes=5), "minute", 5),
+    "15m": (timedelta(minutes=15), "minute", 15),
+    "30m": (timedelta(minutes=30), "minute", 30),
+    "1h": (timedelta(hours=1), "hour", 1),
+    "3h": (timedelta(hours=3), "hour", 3),
+    "6h": (timedelta(hours=6), "hour", 6),
+    "12h": (timedelta(hours=12), "hour", 12),
+    "1d": (timedelta(days=1), "day", 1),
+    "7d": (timedelta(days=7), "day", 7),
+    "30d": (timedelta(days=30), "day", 30),
+}
 
 
 # -----------------------------------
@@ -12,84 +36,199 @@ def _round(value):
 
 
 # -----------------------------------
-# Last 24 hours (hourly averages)
+# Helper: rows -> chart payload
+# -----------------------------------
+def _chart(rows, label_format=None):
+    return {
+        "labels": [
+            r["bucket"].strftime(label_format) if label_format else r["bucket"].isoformat()
+            for r in rows
+        ],
+        "temperature": [_round(r["temperature"]) for r in rows],
+        "humidity": [_round(r["humidity"]) for r in rows],
+        "soilMoisture": [_round(r["soilMoisture"]) for r in rows],
+        "light": [_round(r["light"]) for r in rows],
+    }
+
+
+def _to_utc_naive(value: datetime) -> datetime:
+    # Mongo stores naive UTC datetimes
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# -----------------------------------
+# Bucket selection
 # -----------------------------------
-def get_last_24h_trends():
-    since = datetime.utcnow() - timedelta(hours=24)
+def pick_bucket(start: datetime, end: datetime, max_points: int = MAX_POINTS) -> str:
+    """
+    Smallest bucket that keeps the range under max_points.
+    """
+    span = end - start
+
+    for name, (size, _, _) in BUCKETS.items():
+        if span / size <= max_points:
+            return name
+
+    return "30d"
+
+
+def bucket_source(bucket: str) -> str:
+    """
+    Sub-hour buckets come from raw readings, the rest from rollups.
+    """
+    size = BUCKETS[bucket][0]
 
+    if size >= timedelta(days=1):
+        return "rollup_day"
+    if size >= timedelta(hours=1):
+        return "rollup_hour"
+    return "raw"
+
+
+# -----------------------------------
+# Sources
+# -----------------------------------
+async def _aggregate_raw(start, end, unit, bin_size, device_id):
     pipeline = [
         {
             "$match": {
-                "timestamp": {"$gte": since}
+                **device_filter(device_id),
+                "timestamp": {"$gte": start, "$lt": end}
             }
         },
         {
             "$group": {
                 "_id": {
-                    "hour": {
-                        "$dateToString": {
-                            "format": "%H:00",
-                            "date": "$timestamp"
-                        }
-                    }
+                    "$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size}
                 },
-                "temperature": {"$avg": "$temperature"},
-                "humidity": {"$avg": "$humidity"},
-                "soilMoisture": {"$avg": "$soilMoisture"},
-                "light": {"$avg": "$light"}
+                **{metric: {"$avg": f"${metric}"} for metric in METRICS}
             }
         },
-        {"$sort": {"_id.hour": 1}}
+        {"$sort": {"_id": 1}}
     ]
 
-    data = list(sensor_collection.aggregate(pipeline))
+    data = await sensor_collection.aggregate(pipeline).to_list(length=None)
+
+    return [{"bucket": d["_id"], **{m: d[m] for m in METRICS}} for d in data]
+
+
+async def _raw_downsampled(start, end, device_id, max_points):
+    cursor = sensor_collection.find(
+        {**device_filter(device_id), "timestamp": {"$gte": start, "$lt": end}},
+        projection={"_id": 0, "timestamp": 1, **{m: 1 for m in METRICS}}
+    ).sort("timestamp", 1).limit(RAW_FETCH_LIMIT + 1)
+
+    docs = await cursor.to_list(length=RAW_FETCH_LIMIT + 1)
+
+    if len(docs) > RAW_FETCH_LIMIT:
+        raise ValueError(
+            f"Range has more than {RAW_FETCH_LIMIT} readings — use a bucket instead of raw"
+        )
+
+    # Shape is driven by soil moisture (always present)
+    xs = [d["timestamp"].timestamp() for d in docs]
+    ys = [d["soilMoisture"] for d in docs]
+    keep = lttb_indices(xs, ys, max_points)
+
+    return [
+        {"bucket": docs[i]["timestamp"], **{m: docs[i].get(m) for m in METRICS}}
+        for i in keep
+    ]
+
+
+# -----------------------------------
+# Generic range query
+# -----------------------------------
+async def get_trends(
+    start: datetime,
+    end: datetime,
+    bucket: str = "auto",
+    device_id: str | None = None,
+    label_format: str | None = None,
+    max_points: int = MAX_POINTS
+):
+    """
+    bucket:
+        "auto" → smallest bucket giving <= max_points points
+        "raw"  → individual readings, LTTB-downsampled to max_points
+        one of BUCKETS (e.g. "15m", "1h", "1d")
+    """
+
+    start, end = _to_utc_naive(start), _to_utc_naive(end)
+
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+
+    if bucket == "auto":
+        bucket = pick_bucket(start, end, max_points)
+
+    if bucket == "raw":
+        source = "raw"
+        rows = await _raw_downsampled(start, end, device_id, max_points)
+
+    elif bucket in BUCKETS:
+        size, unit, bin_size = BUCKETS[bucket]
+
+        if (end - start) / size > max_points:
+            raise ValueError(
+                f"Bucket '{bucket}' gives more than {max_points} points for this range"
+            )
+
+        source = bucket_source(bucket)
+
+        if source == "raw":
+            rows = await _aggregate_raw(start, end, unit, bin_size, device_id)
+        else:
+            resolution = "day" if source == "rollup_day" else "hour"
+            native = (unit == resolution and bin_size == 1)
+            rows = await read_rollups(
+                resolution,
+                start,
+                end,
+                device_id=device_id,
+                unit=None if native else unit,
+                bin_size=bin_size
+            )
+
+    else:
+        raise ValueError(
+            f"Unknown bucket '{bucket}' (use auto, raw or one of {', '.join(BUCKETS)})"
+        )
 
     return {
-        "labels": [d["_id"]["hour"] for d in data],
-        "temperature": [_round(d["temperature"]) for d in data],
-        "humidity": [_round(d["humidity"]) for d in data],
-        "soilMoisture": [_round(d["soilMoisture"]) for d in data],
-        "light": [_round(d["light"]) for d in data],
+        "from": start,
+        "to": end,
+        "bucket": bucket,
+        "source": source,
+        **_chart(rows, label_format)
     }
 
 
 # -----------------------------------
-# Last 7 days (daily averages)
+# Last 24 hours (hourly averages)
 # -----------------------------------
-def get_last_7d_trends():
-    since = datetime.utcnow() - timedelta(days=7)
+async def get_last_24h_trends(device_id: str | None = None):
+    now = datetime.utcnow()
 
-    pipeline = [
-        {
-            "$match": {
-                "timestamp": {"$gte": since}
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "day": {
-                        "$dateToString": {
-                            "format": "%Y-%m-%d",
-                            "date": "$timestamp"
-                        }
-                    }
-                },
-                "temperature": {"$avg": "$temperature"},
-                "humidity": {"$avg": "$humidity"},
-                "soilMoisture": {"$avg": "$soilMoisture"},
-                "light": {"$avg": "$light"}
-            }
-        },
-        {"$sort": {"_id.day": 1}}
-    ]
+    # 25 hourly buckets span two days — the date keeps yesterday's hour
+    # distinct from today's
+    trends = await get_trends(
+        now - timedelta(hours=24), now, "1h", device_id, label_format="%m-%d %H:00"
+    )
 
-    data = list(sensor_collection.aggregate(pipeline))
+    return {key: trends[key] for key in ("labels", *METRICS)}
 
-    return {
-        "labels": [d["_id"]["day"] for d in data],
-        "temperature": [_round(d["temperature"]) for d in data],
-        "humidity": [_round(d["humidity"]) for d in data],
-        "soilMoisture": [_round(d["soilMoisture"]) for d in data],
-        "light": [_round(d["light"]) for d in data],
-    }
\ No newline at end of file
+
+# -----------------------------------
+# Last 7 days (daily averages)
+# -----------------------------------
+async def get_last_7d_trends(device_id: str | None = None):
+    now = datetime.utcnow()
+
+    trends = await get_trends(
+        now - timedelta(days=7), now, "1d", device_id, label_format="%Y-%m-%d"
+    )
+
+    return {key: trends[key] for key in ("labels", *METRICS)}
@@ -0,0 +1,132 @@
+# logic/uploads.py
+"""
+Size-capped image uploads read straight from the request stream.
+
+FastAPI's UploadFile only runs after Starlette has received the whole
+multipart body (parts over 1 MB are spooled to a temp file), so a cap
+checked there bounds neither memory nor disk. read_image_upload()
+consumes request.stream() itself and stops at the first chunk over the
+limit:
+
+- image/* body            → the body is the image
+- multipart/form-data     → python-multipart's streaming parser keeps
+                            only the `file` field, in memory
+
+Nothing touches the disk.
+"""
+
+from typing import Tuple
+
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+
+# Multipart boundaries, part headers and small extra fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as an upload passes the byte limit (caller should 413)."""
+
+
+class InvalidUpload(Exception):
+    """Raised for a body that is not an image or a multipart form with one (caller should 400)."""
+
+
+class _FieldCollector:
+    """
+    python-multipart callbacks that keep the data of one named field.
+    """
+
+    def __init__(self, field: str, max_bytes: int):
+        self.field = field.encode()
+        self.max_bytes = max_bytes
+        self.data: bytearray | None = None
+        self.content_type = ""
+
+        self._headers = {}
+        self._name = b""
+        self._value = b""
+        self._target = False
+
+        self.callbacks = {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field,
+            "on_header_value": self._header_value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data
+        }
+
+    def _part_begin(self):
+        self._headers = {}
+        self._target = False
+
+    def _header_field(self, data: bytes, start: int, end: int):
+        self._name += data[start:end]
+
+    def _header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._name.lower()] = self._value
+        self._name, self._value = b"", b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+
+        # First part with the right name wins
+        self._target = options.get(b"name") == self.field and self.data is None
+        if self._target:
+            self.data = bytearray()
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+
+    def _part_data(self, data: bytes, start: int, end: int):
+        if self._target:
+            self.data += data[start:end]
+            if len(self.data) > self.max_bytes:
+                raise UploadTooLarge()
+
+
+async def read_image_upload(request: Request, max_bytes: int, field: str = "file") -> Tuple[bytes, str]:
+    """
+    → (image bytes, declared content type). Raises UploadTooLarge / InvalidUpload.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    multipart = content_type == b"multipart/form-data"
+    limit = max_bytes + (MULTIPART_OVERHEAD_BYTES if multipart else 0)
+
+    # Cheap early reject; chunked bodies without a length are counted below
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise UploadTooLarge()
+
+    if content_type.startswith(b"image/"):
+        data = bytearray()
+        async for chunk in request.stream():
+            data += chunk
+            if len(data) > max_bytes:
+                raise UploadTooLarge()
+        return bytes(data), content_type.decode("latin-1")
+
+    if not multipart or b"boundary" not in params:
+        raise InvalidUpload("Send the image as an image/* body or as multipart form field 'file'")
+
+    collector = _FieldCollector(field, max_bytes)
+    parser = MultipartParser(params[b"boundary"], collector.callbacks)
+    received = 0
+
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > limit:
+                raise UploadTooLarge()
+            parser.write(chunk)
+        parser.finalize()
+    except MultipartParseError:
+        raise InvalidUpload("Malformed multipart body")
+
+    if collector.data is None:
+        raise InvalidUpload(f"Missing form field '{field}'")
+
+    return bytes(collector.data), collector.content_type
@@ -15,26 +15,60 @@ from datetime import datetime
 from typing import List, Dict
 
 
+from .profiles import DEFAULT_PROFILE, CompiledProfile
+from .thresholds import WATERING_RISK, WATERING_SOIL_PERCENT
+
+
 # ----------------------
-# Tunable constants
+# Tunable constants (defaults — see thresholds.py, overridable per profile)
 # ----------------------
 
 # Soil moisture bands (%)
-SOIL_BANDS = {
-    "well_hydrated": 60,
-    "healthy": 45,
-    "watch": 35,
-    "pre_dry": 25
-}
+SOIL_BANDS = WATERING_SOIL_PERCENT
 
 # Drying speed thresholds (% drop per 24h)
-FAST_DRY_DROP = 8     # aggressive drying
-SLOW_DRY_DROP = 3     # stable soil
+FAST_DRY_DROP = WATERING_RISK["fast_dry_drop"]
+SLOW_DRY_DROP = WATERING_RISK["slow_dry_drop"]
 
 # Environmental stress thresholds
-TEMP_HIGH = 32        # °C
-HUMIDITY_LOW = 40     # %
-LIGHT_HIGH = 800      # lux
+TEMP_HIGH = WATERING_RISK["temp_high"]
+HUMIDITY_LOW = WATERING_RISK["humidity_low"]
+LIGHT_HIGH = WATERING_RISK["light_high"]
+
+
+# Possible outcomes, most urgent first (see watering_decision)
+WATERING_DECISIONS = (
+    {
+        "needs_water": True,
+        "urgency": "high",
+        "next_check_in_hours": 2,
+        "message": "Soil is dry. Watering is recommended now."
+    },
+    {
+        "needs_water": True,
+        "urgency": "medium",
+        "next_check_in_hours": 6,
+        "message": "Soil moisture is dropping. Watering may be needed soon."
+    },
+    {
+        "needs_water": False,
+        "urgency": "low",
+        "next_check_in_hours": 12,
+        "message": "Soil moisture is slightly low. Monitor the plant."
+    },
+    {
+        "needs_water": False,
+        "urgency": "none",
+        "next_check_in_hours": 24,
+        "message": "Soil moisture is healthy. No watering needed today."
+    },
+    {
+        "needs_water": False,
+        "urgency": "none",
+        "next_check_in_hours": 18,
+        "message": "Plant is stable. Check again later."
+    },
+)
 
 
 # ----------------------
@@ -59,20 +93,21 @@ def calculate_moisture_drop(history: List[Dict]) -> float:
 # ----------------------
 # Helper: environmental risk score
 # ----------------------
-def environmental_risk(latest: Dict) -> int:
+def environmental_risk(latest: Dict, profile: CompiledProfile | None = None) -> int:
     """
     Returns a drying risk score (0–3)
     """
 
+    limits = (profile or DEFAULT_PROFILE).watering_risk
     risk = 0
 
-    if latest["temperature"] > TEMP_HIGH:
+    if latest["temperature"] > limits["temp_high"]:
         risk += 1
 
-    if latest["humidity"] < HUMIDITY_LOW:
+    if latest["humidity"] < limits["humidity_low"]:
         risk += 1
 
-    if latest.get("light") and latest["light"] > LIGHT_HIGH:
+    if latest.get("light") and latest["light"] > limits["light_high"]:
         risk += 1
 
     return risk
@@ -83,7 +118,8 @@ def environmental_risk(latest: Dict) -> int:
 # ----------------------
 def predict_watering_need(
     latest: Dict,
-    history: List[Dict]
+    history: List[Dict],
+    profile: CompiledProfile | None = None
 ) -> Dict:
     """
     Predicts watering requirement.
@@ -91,6 +127,7 @@ def predict_watering_need(
     Inputs:
         latest  → latest sensor reading
         history → recent readings (last 24h)
+        profile → plant profile (defaults to thresholds.py)
 
     Output:
         dict with calm, user-friendly decision
@@ -98,52 +135,40 @@ def predict_watering_need(
 
     soil = latest["soilMoisture"]
     drop_24h = calculate_moisture_drop(history)
-    risk = environmental_risk(latest)
+    risk = environmental_risk(latest, profile)
 
-    # ----------------------
-    # Decision logic
-    # ----------------------
+    return dict(WATERING_DECISIONS[watering_decision(soil, drop_24h, risk, profile)])
+
+
+def watering_decision(
+    soil: float,
+    drop_24h: float,
+    risk: int,
+    profile: CompiledProfile | None = None
+) -> int:
+    """
+    Index into WATERING_DECISIONS.
+    """
+
+    profile = profile or DEFAULT_PROFILE
+    bands = profile.watering_soil
+    limits = profile.watering_risk
 
     # 🚨 Dry now
-    if soil < SOIL_BANDS["pre_dry"]:
-        return {
-            "needs_water": True,
-            "urgency": "high",
-            "next_check_in_hours": 2,
-            "message": "Soil is dry. Watering is recommended now."
-        }
+    if soil < bands["pre_dry"]:
+        return 0
 
     # ⚠️ Pre-dry + risky environment
-    if soil < SOIL_BANDS["watch"] and (drop_24h >= FAST_DRY_DROP or risk >= 2):
-        return {
-            "needs_water": True,
-            "urgency": "medium",
-            "next_check_in_hours": 6,
-            "message": "Soil moisture is dropping. Watering may be needed soon."
-        }
+    if soil < bands["watch"] and (drop_24h >= limits["fast_dry_drop"] or risk >= 2):
+        return 1
 
     # 👀 Watch zone (calm warning)
-    if soil < SOIL_BANDS["healthy"]:
-        return {
-            "needs_water": False,
-            "urgency": "low",
-            "next_check_in_hours": 12,
-            "message": "Soil moisture is slightly low. Monitor the plant."
-        }
+    if soil < bands["healthy"]:
+        return 2
 
     # 🌱 Healthy & stable
-    if drop_24h <= SLOW_DRY_DROP and risk == 0:
-        return {
-            "needs_water": False,
-            "urgency": "none",
-            "next_check_in_hours": 24,
-            "message": "Soil moisture is healthy. No watering needed today."
-        }
+    if drop_24h <= limits["slow_dry_drop"] and risk == 0:
+        return 3
 
     # 🌤 Default safe state
-    return {
-        "needs_water": False,
-        "urgency": "none",
-        "next_check_in_hours": 18,
-        "message": "Plant is stable. Check again later."
-    }
+    return 4
@@ -1,53 +1,254 @@
+import math
 import os
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from logic.cache import TTLCache
+from logic.model.weather import WeatherContext
 
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
 
+# Look-ahead for rain / heat / dry-air decisions (forecast steps are 3h)
+WEATHER_FORECAST_HOURS = int(os.getenv("WEATHER_FORECAST_HOURS", "12"))
 
-def fetch_weather(lat: float, lon: float) -> dict:
+WEATHER_TIMEOUT_S = float(os.getenv("WEATHER_TIMEOUT_S", "5"))
+WEATHER_POOL_SIZE = int(os.getenv("WEATHER_POOL_SIZE", "10"))
+
+# Devices within one grid cell share a lookup (0.1° ≈ 11 km)
+WEATHER_GRID_DEG = float(os.getenv("WEATHER_GRID_DEG", "0.1"))
+WEATHER_CACHE_TTL_S = float(os.getenv("WEATHER_CACHE_TTL_S", "600"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1024"))
+
+# After the TTL, serve the old value for up to this long while one
+# background refresh runs (0 = disabled, expired entries block on upstream)
+WEATHER_STALE_TTL_S = float(os.getenv("WEATHER_STALE_TTL_S", "1800"))
+
+
+# ----------------------
+# Pooled, cached client
+# ----------------------
+class WeatherClient:
     """
-    Fetches current weather data from OpenWeather
+    Thread-safe (called from the threadpool):
+
+    - one requests.Session → keep-alive connections are reused
+    - results cached per rounded lat/lon grid cell
+    - concurrent misses for one cell wait for a single upstream call
+    - stale-while-revalidate: an expired entry is returned immediately
+      and refreshed in the background; it is also served if the refresh fails
     """
 
-    if not OPENWEATHER_API_KEY:
-        return {"error": "Weather API key not configured"}
+    def __init__(
+        self,
+        base_url: str = OPENWEATHER_BASE_URL,
+        api_key: str | None = OPENWEATHER_API_KEY,
+        timeout: float = WEATHER_TIMEOUT_S,
+        pool_size: int = WEATHER_POOL_SIZE,
+        grid_deg: float = WEATHER_GRID_DEG,
+        ttl: float = WEATHER_CACHE_TTL_S,
+        stale_ttl: float = WEATHER_STALE_TTL_S,
+        max_entries: int = WEATHER_CACHE_MAX_ENTRIES,
+        forecast_hours: int = WEATHER_FORECAST_HOURS
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.forecast_hours = forecast_hours
+        self.api_key = api_key
+        self.timeout = timeout
+        self.grid_deg = grid_deg
+        self.ttl = ttl
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Entries live for ttl + stale_ttl; freshness is checked on read
+        self._cache = TTLCache(max_entries, ttl + stale_ttl)
+        self._inflight: dict = {}   # cell → threading.Event
+        self._lock = threading.Lock()
+
+        self.stats = {"upstream_calls": 0, "coalesced": 0, "stale_served": 0, "errors": 0}
+
+    # ----------------------
+    # Keys
+    # ----------------------
+    def cell(self, lat: float, lon: float) -> tuple:
+        return (round(lat / self.grid_deg), round(lon / self.grid_deg))
+
+    def cell_center(self, cell: tuple) -> tuple:
+        return (round(cell[0] * self.grid_deg, 6), round(cell[1] * self.grid_deg, 6))
+
+    # ----------------------
+    # Public API
+    # ----------------------
+    def get(self, lat: float, lon: float) -> dict:
+        if not self.api_key:
+            return {"error": "Weather API key not configured"}
+
+        cell = self.cell(lat, lon)
+        entry = self._cache.get(cell)
+
+        if entry is not None:
+            fetched_at, weather = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                return weather
+
+            # Stale → answer now, refresh once in the background
+            self.stats["stale_served"] += 1
+            self._start_refresh(cell)
+            return weather
+
+        return self._load(cell)
+
+    def refresh(self, lat: float, lon: float) -> dict:
+        """
+        Always asks upstream and reports errors as-is (no stale fallback)
+        — used by the prefetcher, which tracks freshness itself.
+        """
+        if not self.api_key:
+            return {"error": "Weather API key not configured"}
+
+        cell = self.cell(lat, lon)
+        weather = self._request(*self.cell_center(cell))
+
+        if "error" in weather:
+            self.stats["errors"] += 1
+        else:
+            self._cache.set(cell, (time.monotonic(), weather))
+
+        return weather
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "cache": self._cache.snapshot()}
 
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "appid": OPENWEATHER_API_KEY,
-        "units": "metric"
-    }
+    # ----------------------
+    # Single-flight loading
+    # ----------------------
+    def _load(self, cell: tuple) -> dict:
+        with self._lock:
+            event = self._inflight.get(cell)
+            leader = event is None
+            if leader:
+                event = self._inflight[cell] = threading.Event()
 
-    try:
-        response = requests.get(BASE_URL, params=params, timeout=5)
+        if not leader:
+            self.stats["coalesced"] += 1
+            event.wait(self.timeout + 1)
+            entry = self._cache.get(cell)
+            return entry[1] if entry else {"error": "Weather lookup failed"}
+
+        try:
+            return self._refresh(cell)
+        finally:
+            with self._lock:
+                del self._inflight[cell]
+            event.set()
+
+    def _start_refresh(self, cell: tuple):
+        with self._lock:
+            if cell in self._inflight:
+                return
+            event = self._inflight[cell] = threading.Event()
+
+        def run():
+            try:
+                self._refresh(cell)
+            finally:
+                with self._lock:
+                    del self._inflight[cell]
+                event.set()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _refresh(self, cell: tuple) -> dict:
+        weather = self._request(*self.cell_center(cell))
+
+        if "error" in weather:
+            # Keep serving the last good value, if there is one
+            self.stats["errors"] += 1
+            entry = self._cache.get(cell)
+            return entry[1] if entry else weather
+
+        self._cache.set(cell, (time.monotonic(), weather))
+        return weather
+
+    def _get_json(self, endpoint: str, params: dict) -> dict:
+        response = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=self.timeout)
         response.raise_for_status()
-        data = response.json()
-
-        return {
-            "temperature": data["main"]["temp"],
-            "humidity": data["main"]["humidity"],
-            "weather": data["weather"][0]["description"],
-            "rain_probability": data.get("rain", {}).get("1h", 0),
-            "wind_speed": data["wind"]["speed"]
+        return response.json()
+
+    def _request(self, lat: float, lon: float) -> dict:
+        """
+        Current conditions + short forecast → WeatherContext dict
+        (or {"error": ...} when current conditions are unavailable).
+        """
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "appid": self.api_key,
+            "units": "metric"
         }
 
-    except Exception as e:
-        return {"error": str(e)}
+        self.stats["upstream_calls"] += 1
+
+        try:
+            current = self._get_json("weather", params)
+        except Exception as e:
+            return {"error": str(e)}
+
+        try:
+            steps = max(1, math.ceil(self.forecast_hours / 3))
+            forecast = self._get_json("forecast", {**params, "cnt": steps})
+        except Exception:
+            forecast = None  # still usable, rain probability unknown
+
+        try:
+            return build_weather_context(current, forecast, self.forecast_hours).model_dump()
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return {"error": f"Unexpected weather payload: {e}"}
 
-def get_weather_context(weather: dict | None) -> dict:
+
+# ----------------------
+# Raw OpenWeather → WeatherContext
+# ----------------------
+def build_weather_context(
+    current: dict,
+    forecast: dict | None = None,
+    hours: int = WEATHER_FORECAST_HOURS
+) -> WeatherContext:
     """
-    Extracts only plant-relevant signals from raw weather data
+    Extracts only plant-relevant signals from OpenWeather /weather and
+    /forecast responses. Forecast "pop" is a 0–1 probability; the old
+    rain_probability was the rain *volume* (mm/1h) of current conditions.
     """
 
-    if not weather or "error" in weather:
-        return {
-            "forecast_temp": None,
-            "humidity_forecast": None
-        }
+    steps = (forecast or {}).get("list", [])[: max(1, math.ceil(hours / 3))]
+
+    temperatures = [current["main"]["temp"]] + [s["main"]["temp"] for s in steps]
+    humidities = [current["main"]["humidity"]] + [s["main"]["humidity"] for s in steps]
+
+    return WeatherContext(
+        temperature=max(temperatures),
+        humidity=min(humidities),
+        rain_probability=round(max(s.get("pop", 0) for s in steps) * 100) if steps else None,
+        current_temperature=current["main"]["temp"],
+        current_humidity=current["main"]["humidity"],
+        description=current["weather"][0]["description"] if current.get("weather") else None,
+        wind_speed=current.get("wind", {}).get("speed"),
+        forecast_hours=hours if steps else 0
+    )
+
+
+weather_client = WeatherClient()
+
+
+def fetch_weather(lat: float, lon: float) -> dict:
+    """
+    WeatherContext dict for a location (cached per grid cell)
+    """
 
-    return {
-        "forecast_temp": weather.get("temperature"),
-        "humidity_forecast": weather.get("humidity")
-    }
+    return weather_client.get(lat, lon)
@@ -0,0 +1,314 @@
+# logic/weather/prefetch.py
+"""
+Background weather prefetcher.
+
+Every WEATHER_PREFETCH_INTERVAL_S the lifespan task:
+
+1. collects the distinct locations of devices that reported within
+   WEATHER_ACTIVE_WINDOW_H
+2. refreshes each weather grid cell once (weather_client.refresh)
+3. keeps the result in memory, and in Mongo with WEATHER_PERSIST=true
+   (so a restart has weather before the first cycle finishes)
+
+Request handlers only call weather_store.lookup() and never wait on the
+network. A location seen for the first time, or whose weather is older
+than WEATHER_STALE_AFTER_S (e.g. with the prefetcher disabled), is fetched
+in the background and shows up on the next request.
+
+The store keeps at most WEATHER_STORE_MAX_CELLS cells (least recently
+looked up go first); each prefetch cycle also drops cells that are no
+longer active and were not looked up since the previous cycle.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from pymongo.errors import PyMongoError
+
+from db import sensor_collection, weather_collection
+from logic.cache import response_cache
+from logic.readings import device_filter
+from logic.weather.client import weather_client
+
+WEATHER_PREFETCH_INTERVAL_S = int(os.getenv("WEATHER_PREFETCH_INTERVAL_S", "600"))  # 0 = disabled
+WEATHER_ACTIVE_WINDOW_H = int(os.getenv("WEATHER_ACTIVE_WINDOW_H", "24"))
+WEATHER_PREFETCH_CONCURRENCY = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", "8"))
+WEATHER_PERSIST = os.getenv("WEATHER_PERSIST", "false").lower() == "true"
+WEATHER_STORE_MAX_CELLS = int(os.getenv("WEATHER_STORE_MAX_CELLS", "4096"))
+WEATHER_RETRY_S = float(os.getenv("WEATHER_RETRY_S", "60"))   # per cell, after a failed fetch
+
+# Responses flag weather older than this as stale (e.g. upstream outage)
+WEATHER_STALE_AFTER_S = int(os.getenv("WEATHER_STALE_AFTER_S", str(2 * max(WEATHER_PREFETCH_INTERVAL_S, 600))))
+
+
+def weather_freshness(fetched_at: datetime) -> Dict:
+    age = (datetime.utcnow() - fetched_at).total_seconds()
+    return {
+        "fetched_at": fetched_at,
+        "age_s": int(age),
+        "stale": age > WEATHER_STALE_AFTER_S
+    }
+
+
+def with_weather_freshness(result: Dict) -> Dict:
+    """
+    Swaps the cached "weather_fetched_at" for freshness relative to now.
+    """
+    response = dict(result)
+    fetched_at = response.pop("weather_fetched_at", None)
+    response["weather_freshness"] = weather_freshness(fetched_at) if fetched_at else None
+    return response
+
+
+# ----------------------
+# In-memory store (event loop only)
+# ----------------------
+class WeatherStore:
+    def __init__(self, max_cells: int = WEATHER_STORE_MAX_CELLS):
+        self.max_cells = max_cells
+
+        # cell → {"weather", "fetched_at", "sweep"}, least recently looked up first
+        self._entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._pending: set = set()
+        self._tasks: set = set()
+        self._attempted: Dict[tuple, float] = {}   # cell → last failed fetch (monotonic)
+        self._sweep = 0
+
+        # Per cell, set from one counter on every stored refresh — part of the
+        # insights cache key / ETag of devices in that cell only. Never reused,
+        # even after a cell is evicted and fetched again.
+        self._versions: Dict[tuple, int] = {}
+        self._last_version = 0
+
+        self.stats = {"refreshes": 0, "errors": 0, "on_demand": 0, "evictions": 0}
+
+    def lookup(self, lat: float, lon: float) -> Dict | None:
+        """
+        Precomputed weather for a location, or None. Missing or stale
+        weather is (re)fetched in the background.
+        """
+        cell = weather_client.cell(lat, lon)
+        entry = self._entries.get(cell)
+
+        if entry is not None:
+            entry["sweep"] = self._sweep
+            self._entries.move_to_end(cell)
+
+        if self._needs_refresh(cell, entry):
+            self.stats["on_demand"] += 1
+            task = asyncio.create_task(self.refresh(cell, lat, lon))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return entry
+
+    def _needs_refresh(self, cell: tuple, entry: Dict | None) -> bool:
+        if not weather_client.api_key or cell in self._pending:
+            return False
+
+        if entry is not None:
+            age = (datetime.utcnow() - entry["fetched_at"]).total_seconds()
+            if age <= WEATHER_STALE_AFTER_S:
+                return False
+
+        # Upstream failing → at most one attempt per cell every WEATHER_RETRY_S
+        failed_at = self._attempted.get(cell)
+        return failed_at is None or time.monotonic() - failed_at >= WEATHER_RETRY_S
+
+    def put(self, cell: tuple, weather: Dict, fetched_at: datetime):
+        self._entries[cell] = {"weather": weather, "fetched_at": fetched_at, "sweep": self._sweep}
+        self._entries.move_to_end(cell)
+        self._attempted.pop(cell, None)
+
+        self._last_version += 1
+        self._versions[cell] = self._last_version
+
+        while len(self._entries) > self.max_cells:
+            self._drop(next(iter(self._entries)))
+
+    def cell_version(self, cell: tuple | None) -> int:
+        return self._versions.get(cell, 0) if cell is not None else 0
+
+    def retain(self, active: set) -> int:
+        """
+        Called after each prefetch sweep: drops cells that are not active
+        and were not looked up since the previous sweep.
+        """
+        idle = [
+            cell for cell, entry in self._entries.items()
+            if cell not in active and entry["sweep"] < self._sweep
+        ]
+        for cell in idle:
+            self._drop(cell)
+
+        self._sweep += 1
+        return len(idle)
+
+    def _drop(self, cell: tuple):
+        del self._entries[cell]
+        self._versions.pop(cell, None)
+        self.stats["evictions"] += 1
+
+    async def refresh(self, cell: tuple, lat: float, lon: float):
+        if cell in self._pending:
+            return
+
+        self._pending.add(cell)
+        try:
+            weather = await asyncio.to_thread(weather_client.refresh, lat, lon)
+
+            if "error" in weather:
+                # Keep the previous value; its age shows up in the response
+                self.stats["errors"] += 1
+                self._record_failure(cell)
+                return
+
+            fetched_at = datetime.utcnow()
+            self.put(cell, weather, fetched_at)
+            self.stats["refreshes"] += 1
+
+            if WEATHER_PERSIST:
+                await _persist(cell, weather, fetched_at)
+
+        finally:
+            self._pending.discard(cell)
+
+    def _record_failure(self, cell: tuple):
+        now = time.monotonic()
+        self._attempted[cell] = now
+
+        # Only failures still inside their retry window matter
+        if len(self._attempted) > self.max_cells:
+            self._attempted = {
+                c: t for c, t in self._attempted.items() if now - t < WEATHER_RETRY_S
+            }
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "cells": len(self._entries), "max_cells": self.max_cells}
+
+
+weather_store = WeatherStore()
+
+
+def weather_for_reading(reading: Dict) -> Tuple[Dict | None, datetime | None]:
+    """
+    (WeatherContext dict, fetched_at) for a reading's location — the one
+    weather path used by every insights endpoint. (None, None) without
+    a location or before the first fetch.
+    """
+    if reading.get("lat") is None or reading.get("lon") is None:
+        return None, None
+
+    entry = weather_store.lookup(reading["lat"], reading["lon"])
+    if entry is None:
+        return None, None
+
+    return entry["weather"], entry["fetched_at"]
+
+
+async def weather_version(device_id: str | None) -> int:
+    """
+    Version of the weather behind the device's (or fleet's) latest reading —
+    0 without a location. Its cell is looked up once per new reading.
+    """
+
+    async def load():
+        doc = await sensor_collection.find_one(
+            device_filter(device_id),
+            sort=[("timestamp", -1)],
+            projection={"_id": 0, "lat": 1, "lon": 1}
+        )
+        if not doc or doc.get("lat") is None or doc.get("lon") is None:
+            return None
+        return weather_client.cell(doc["lat"], doc["lon"])
+
+    cell = await response_cache.get_or_compute("weather-cell", device_id, load)
+    return weather_store.cell_version(cell)
+
+
+# ----------------------
+# Mongo persistence (optional)
+# ----------------------
+def _snapshot_id(cell: tuple) -> str:
+    # Grid size is part of the key so a WEATHER_GRID_DEG change never mixes cells
+    return f"{weather_client.grid_deg}:{cell[0]}:{cell[1]}"
+
+
+async def _persist(cell: tuple, weather: Dict, fetched_at: datetime):
+    try:
+        await weather_collection.update_one(
+            {"_id": _snapshot_id(cell)},
+            {"$set": {"weather": weather, "fetched_at": fetched_at}},
+            upsert=True
+        )
+    except PyMongoError as e:
+        print("❌ Weather snapshot write failed:", e)
+
+
+async def load_persisted_weather():
+    prefix = f"{weather_client.grid_deg}:"
+
+    async for doc in weather_collection.find({"_id": {"$regex": f"^{prefix.replace('.', '[.]')}"}}):
+        _, row, col = doc["_id"].rsplit(":", 2)
+        weather_store.put((int(row), int(col)), doc["weather"], doc["fetched_at"])
+
+
+# ----------------------
+# Prefetch loop
+# ----------------------
+async def active_locations(since: datetime) -> List[Tuple[float, float]]:
+    pipeline = [
+        {"$match": {
+            "timestamp": {"$gte": since},
+            "lat": {"$type": "number"},
+            "lon": {"$type": "number"}
+        }},
+        {"$group": {"_id": {"lat": "$lat", "lon": "$lon"}}}
+    ]
+
+    rows = await sensor_collection.aggregate(pipeline).to_list(length=None)
+    return [(row["_id"]["lat"], row["_id"]["lon"]) for row in rows]
+
+
+async def prefetch_weather():
+    since = datetime.utcnow() - timedelta(hours=WEATHER_ACTIVE_WINDOW_H)
+
+    # One upstream call per grid cell, however many devices share it
+    cells = {
+        weather_client.cell(lat, lon): (lat, lon)
+        for lat, lon in await active_locations(since)
+    }
+
+    semaphore = asyncio.Semaphore(WEATHER_PREFETCH_CONCURRENCY)
+
+    async def refresh(cell, location):
+        async with semaphore:
+            await weather_store.refresh(cell, *location)
+
+    await asyncio.gather(*(refresh(cell, location) for cell, location in cells.items()))
+
+    weather_store.retain(set(cells))
+
+
+async def run_weather_prefetcher():
+    """
+    Started from the app lifespan when WEATHER_PREFETCH_INTERVAL_S > 0.
+    """
+
+    if WEATHER_PERSIST:
+        try:
+            await load_persisted_weather()
+        except PyMongoError as e:
+            print("❌ Loading weather snapshots failed:", e)
+
+    while True:
+        try:
+            await prefetch_weather()
+        except PyMongoError as e:
+            print("❌ Weather prefetch failed:", e)
+
+        await asyncio.sleep(WEATHER_PREFETCH_INTERVAL_S)
@@ -1,29 +1,60 @@
 # main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Query, Response
+from fastapi.responses import JSONResponse
 from routes.insights import router as insights_router
 from routes.auth import router as auth_router
+from routes.stream import router as stream_router
 from dotenv import load_dotenv 
-from pydantic import BaseModel, Field
-from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from PIL import UnidentifiedImageError
+from pydantic import ValidationError
+from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
 from pymongo.errors import PyMongoError
-import shutil
+import asyncio
+import json
 import os
 # ----------------------
 # Database
 # ----------------------
-from db import sensor_collection
+from db import sensor_collection, profiles_collection, ensure_indexes
 # ----------------------
 # Core logic
 # ----------------------
 from logic import generate_plant_insights
-from logic.trends import get_last_24h_trends, get_last_7d_trends
-from logic.weather.client import get_weather_context  # ✅ WEATHER
+from logic.cache import response_cache
+from logic.etag import conditional_get, time_slot
+from logic.ingest import (
+    INGEST_BUFFER_ENABLED,
+    BufferFull,
+    build_reading_document,
+    ingest_buffer,
+    insert_reading,
+    insert_readings
+)
+from logic.model.sensor import SensorPayload
+from logic.profiles import PROFILE_REFRESH_S, profile_store, refresh_profiles, run_profile_refresher
+from logic.readings import get_history_and_trends, get_latest_reading
+from logic.rollups import ROLLUP_COMPACT_INTERVAL_S, run_compactor
+from logic.trends import get_last_24h_trends, get_last_7d_trends, get_trends
+from logic.uploads import InvalidUpload, UploadTooLarge, read_image_upload
+from logic.weather.client import OPENWEATHER_API_KEY, weather_client  # ✅ WEATHER
+from logic.weather.prefetch import (
+    WEATHER_PREFETCH_INTERVAL_S,
+    run_weather_prefetcher,
+    weather_for_reading,
+    weather_store,
+    weather_version,
+    with_weather_freshness
+)
 
 # ----------------------
 # AI
 # ----------------------
 import ai
+from inference import InferenceOverloaded, InferenceTimeout, disease_batcher, request_options
+from inference_jobs import INFERENCE_MODE, enqueue_job, get_job
+from prediction_cache import PREDICTION_CACHE_PHASH, content_key, perceptual_key, prediction_cache
 
 
 # ----------------------
@@ -32,14 +63,58 @@ import ai
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
-        sensor_collection.database.command("ping")
+        await sensor_collection.database.command("ping")
+        await ensure_indexes()
         print("✅ MongoDB connected")
     except Exception as e:
         print("❌ MongoDB connection failed:", e)
         raise RuntimeError("Database not available")
 
-    print("🚀 API started (AI loads lazily)")
+    if INGEST_BUFFER_ENABLED:
+        await ingest_buffer.start()
+        print("📥 Ingest buffer enabled (write-behind)")
+
+    compactor = None
+    if ROLLUP_COMPACT_INTERVAL_S > 0:
+        compactor = asyncio.create_task(run_compactor())
+        print("🧮 Rollup compactor running")
+
+    await refresh_profiles(profiles_collection)
+    profile_refresher = None
+    if PROFILE_REFRESH_S > 0:
+        profile_refresher = asyncio.create_task(run_profile_refresher(profiles_collection))
+
+    weather_prefetcher = None
+    if WEATHER_PREFETCH_INTERVAL_S > 0 and OPENWEATHER_API_KEY:
+        weather_prefetcher = asyncio.create_task(run_weather_prefetcher())
+        print("🌤 Weather prefetcher running")
+
+    if INFERENCE_MODE == "queue":
+        print("📨 Disease predictions queued for inference workers")
+        print("🚀 API started")
+    elif ai.AI_WARMUP:
+        await disease_batcher.warm_up()
+        print(f"🌿 Disease model warm ({ai.AI_BACKEND})")
+        print("🚀 API started")
+    else:
+        print("🚀 API started (AI loads lazily)")
     yield
+
+    if compactor:
+        compactor.cancel()
+
+    if profile_refresher:
+        profile_refresher.cancel()
+
+    if weather_prefetcher:
+        weather_prefetcher.cancel()
+
+    await disease_batcher.stop()
+
+    if INGEST_BUFFER_ENABLED:
+        await ingest_buffer.stop()
+        print("📥 Ingest buffer flushed")
+
     print("🛑 API shutting down")
 
 
@@ -48,6 +123,7 @@ app = FastAPI(
     lifespan=lifespan
 )
 app.include_router(insights_router, prefix="/api")
+app.include_router(stream_router, prefix="/api")
 app.include_router(auth_router)
 # ----------------------
 # Health check
@@ -58,47 +134,146 @@ def root():
 
 
 # ----------------------
-# Sensor schema
+# Store sensor data
 # ----------------------
-class SensorPayload(BaseModel):
-    temperature: float = Field(..., example=24.1)
-    humidity: float = Field(..., example=60.2)
-    soilMoisture: float = Field(..., example=72.0)
-    light: float | None = Field(None, example=800.0)
-    device_id: str | None = Field(None, example="esp32-01")
-    timestamp: float | None = None  # Unix epoch (optional)
+@app.post("/api/sensor-data", status_code=201)
+async def receive_sensor_data(payload: SensorPayload):
+    doc = build_reading_document(payload.model_dump())
+
+    # Write-behind: acknowledge now, group-commit later
+    if INGEST_BUFFER_ENABLED:
+        try:
+            ingest_buffer.submit(doc)
+        except BufferFull:
+            raise HTTPException(
+                status_code=429,
+                detail="Ingest buffer full, retry later",
+                headers={"Retry-After": "1"}
+            )
+
+        return JSONResponse(status_code=202, content={"status": "queued"})
+
+    try:
+        inserted_id = await insert_reading(doc)
+        return {"status": "ok", "id": inserted_id}
+
+    except PyMongoError:
+        raise HTTPException(status_code=500, detail="Database error")
 
 
 # ----------------------
-# Store sensor data
+# Store sensor data (batch — offline buffer flush)
 # ----------------------
-@app.post("/api/sensor-data", status_code=201)
-def receive_sensor_data(payload: SensorPayload):
+MAX_BATCH_SIZE = int(os.getenv("SENSOR_BATCH_MAX_SIZE", "1000"))
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def _parse_batch_body(body: bytes, content_type: str) -> list[tuple]:
+    """
+    Returns [(record, error)] — one entry per submitted record.
+    A JSON array is all-or-nothing; NDJSON rejects bad lines individually.
+    """
+    if content_type.split(";")[0].strip() in NDJSON_TYPES:
+        records = []
+        for line in body.decode("utf-8", errors="replace").splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append((json.loads(line), None))
+            except json.JSONDecodeError:
+                records.append((None, ["Invalid JSON line"]))
+        return records
+
     try:
-        doc = payload.model_dump()
+        data = json.loads(body)
+    except ValueError:  # JSONDecodeError, or UnicodeDecodeError on non-UTF-8 bytes
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of readings")
 
-        doc["timestamp"] = (
-            datetime.utcfromtimestamp(doc["timestamp"])
-            if doc.get("timestamp")
-            else datetime.utcnow()
+    return [(item, None) for item in data]
+
+
+def _validation_messages(e: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(p) for p in err['loc']) or 'record'}: {err['msg']}"
+        for err in e.errors()
+    ]
+
+
+@app.post("/api/sensor-data/batch")
+async def receive_sensor_data_batch(request: Request):
+    records = _parse_batch_body(
+        await request.body(),
+        request.headers.get("content-type", "")
+    )
+
+    if not records:
+        raise HTTPException(status_code=400, detail="No readings in request")
+
+    if len(records) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {MAX_BATCH_SIZE} readings)"
         )
 
-        result = sensor_collection.insert_one(doc)
-        return {"status": "ok", "id": str(result.inserted_id)}
+    results: list[dict | None] = [None] * len(records)
+    docs, doc_positions = [], []
+
+    # 1️⃣ Validate every record, keep going on failures
+    for i, (record, errors) in enumerate(records):
+        if errors is None:
+            try:
+                payload = SensorPayload.model_validate(record)
+            except ValidationError as e:
+                errors = _validation_messages(e)
+
+        if errors:
+            results[i] = {"index": i, "status": "rejected", "errors": errors}
+        else:
+            docs.append(build_reading_document(payload.model_dump()))
+            doc_positions.append(i)
 
+    # 2️⃣ One unordered insert_many for everything valid
+    try:
+        inserted, failed = await insert_readings(docs)
     except PyMongoError:
         raise HTTPException(status_code=500, detail="Database error")
 
+    for pos, i in enumerate(doc_positions):
+        if pos in inserted:
+            results[i] = {"index": i, "status": "accepted", "id": inserted[pos]}
+        else:
+            results[i] = {
+                "index": i,
+                "status": "rejected",
+                "errors": [failed.get(pos, "Write failed")]
+            }
+
+    accepted = sum(1 for r in results if r["status"] == "accepted")
+
+    return {
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results
+    }
+
 
 # ----------------------
 # Latest raw sensor data
 # ----------------------
 @app.get("/api/latest-data")
-def get_latest_sensor_data():
-    doc = sensor_collection.find_one(
-        sort=[("timestamp", -1)],
-        projection={"_id": 0}
-    )
+async def get_latest_sensor_data(
+    request: Request,
+    response: Response,
+    device_id: str | None = None
+):
+    not_modified = await conditional_get(request, response, "latest-data", device_id)
+    if not_modified:
+        return not_modified
+
+    doc = await get_latest_reading(device_id)
 
     if not doc:
         raise HTTPException(status_code=404, detail="No data found")
@@ -110,46 +285,54 @@ def get_latest_sensor_data():
 # 🌱 Plant insights (CORE FEATURE — Phase 3)
 # ----------------------
 @app.get("/api/plant-insights/latest")
-def get_latest_plant_insights():
-    # Latest reading
-    latest = sensor_collection.find_one(
-        sort=[("timestamp", -1)],
-        projection={"_id": 0}
+async def get_latest_plant_insights(
+    request: Request,
+    response: Response,
+    device_id: str | None = None
+):
+    weather_seen = await weather_version(device_id)
+
+    not_modified = await conditional_get(
+        request, response, "plant-insights", device_id, time_slot(10),
+        profile_store.for_device(device_id).tag, weather_seen
     )
+    if not_modified:
+        return not_modified
+
+    result = await response_cache.get_or_compute(
+        "plant-insights", device_id, lambda: _build_plant_insights(device_id),
+        request.state.data_marker, weather_seen
+    )
+
+    return with_weather_freshness(result)
+
+
+async def _build_plant_insights(device_id: str | None):
+    # Latest reading
+    latest = await get_latest_reading(device_id)
 
     if not latest:
         raise HTTPException(status_code=404, detail="No sensor data found")
 
     # History for trends & watering prediction
-    history_cursor = sensor_collection.find(
-        {},
-        projection={
-            "_id": 0,
-            "temperature": 1,
-            "humidity": 1,
-            "soilMoisture": 1,
-            "light": 1,
-            "timestamp": 1
-        }
-    ).sort("timestamp", 1).limit(24)
+    history, trends = await get_history_and_trends(device_id, latest)
 
-    history = list(history_cursor)
-
-    # 🌤 Weather context (SAFE, OPTIONAL)
-    try:
-        weather = get_weather_context()
-    except Exception:
-        weather = None  # weather must NEVER crash insights
+    # 🌤 Weather context (prefetched, never blocks)
+    weather, fetched_at = weather_for_reading(latest)
 
     insights = generate_plant_insights(
         sensor_data=latest,
         history=history,
-        weather=weather
+        weather=weather,
+        trends=trends,
+        profile=profile_store.for_device(device_id)
     )
 
     return {
         "timestamp": latest["timestamp"],
         "sensor_data": latest,
+        "weather": weather,
+        "weather_fetched_at": fetched_at,
         "insights": insights
     }
 
@@ -157,36 +340,226 @@ def get_latest_plant_insights():
 # ----------------------
 # 📊 Historical Trends (Graphs-ready)
 # ----------------------
+@app.get("/api/trends")
+async def trends_range(
+    request: Request,
+    response: Response,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    bucket: str = "auto",
+    device_id: str | None = None
+):
+    """
+    Any range, any bucket. Defaults to the last 24h with an automatic
+    bucket size; bucket=raw returns downsampled individual readings.
+    """
+    # Open-ended ranges slide with the clock
+    slot = time_slot(1) if end is None else None
+    not_modified = await conditional_get(
+        request, response, "trends", device_id, start, end, bucket, slot
+    )
+    if not_modified:
+        return not_modified
+    async def compute():
+        range_end = end or datetime.utcnow()
+        range_start = start or range_end - timedelta(hours=24)
+        return await get_trends(range_start, range_end, bucket, device_id)
+
+    try:
+        # Open-ended ranges are keyed without "now" so polls share an entry
+        return await response_cache.get_or_compute(
+            "trends", device_id, compute, request.state.data_marker, start, end, bucket
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/api/trends/24h")
-def trends_last_24h():
-    return get_last_24h_trends()
+async def trends_last_24h(
+    request: Request,
+    response: Response,
+    device_id: str | None = None
+):
+    not_modified = await conditional_get(
+        request, response, "trends-24h", device_id, time_slot(60)
+    )
+    if not_modified:
+        return not_modified
+
+    return await response_cache.get_or_compute(
+        "trends-24h", device_id, lambda: get_last_24h_trends(device_id),
+        request.state.data_marker
+    )
 
 
 @app.get("/api/trends/7d")
-def trends_last_7d():
-    return get_last_7d_trends()
+async def trends_last_7d(
+    request: Request,
+    response: Response,
+    device_id: str | None = None
+):
+    not_modified = await conditional_get(
+        request, response, "trends-7d", device_id, time_slot(60)
+    )
+    if not_modified:
+        return not_modified
+
+    return await response_cache.get_or_compute(
+        "trends-7d", device_id, lambda: get_last_7d_trends(device_id),
+        request.state.data_marker
+    )
 
 
 # ----------------------
-# 🌿 Disease prediction (AI)
+# Cache stats
 # ----------------------
-UPLOAD_DIR = "images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {
+        "responses": response_cache.snapshot(),
+        "inference": disease_batcher.snapshot(),
+        "predictions": prediction_cache.snapshot(),
+        "weather": weather_client.snapshot(),
+        "weather_prefetch": weather_store.snapshot()
+    }
 
 
-@app.post("/api/predict-disease")
-async def predict_plant_disease(file: UploadFile = File(...)):
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Invalid image file")
+# ----------------------
+# 🌿 Disease prediction (AI)
+# ----------------------
+# Uploads are read from the request stream into memory — never spooled to
+# disk, and cut off as soon as they pass the cap (see logic/uploads.py)
+PREDICT_MAX_UPLOAD_BYTES = int(os.getenv("PREDICT_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+INFERENCE_BUSY = HTTPException(
+    status_code=503,
+    detail="Disease inference is busy, retry later",
+    headers={"Retry-After": "2"}
+)
+UPLOAD_TOO_LARGE = HTTPException(
+    status_code=413,
+    detail=f"Image too large (max {PREDICT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"
+)
 
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
+# The body is parsed by hand, so describe it for /docs
+PREDICT_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            },
+            "image/*": {"schema": {"type": "string", "format": "binary"}}
+        }
+    }
+}
+
+
+@app.post("/api/predict-disease", openapi_extra=PREDICT_UPLOAD_OPENAPI)
+async def predict_plant_disease(
+    request: Request,
+    response: Response,
+    top_k: int = Query(1, ge=1, le=10),
+    tta: bool = Query(False),
+    budget_ms: float | None = Query(None, gt=0)
+):
+    """
+    Image as multipart form field `file`, or as a raw image/* body.
+
+    top_k > 1 → also returns the runner-up classes with probabilities.
+    tta=true  → averages flipped / cropped views in one forward pass, unless
+                the estimated latency exceeds budget_ms (then single pass,
+                reported as "tta": false).
+
+    INFERENCE_MODE=queue → 202 with a job id; poll /api/predict-disease/jobs/{job_id}.
+    """
+    # The rest of the API runs without a model; only this endpoint needs it
+    if INFERENCE_MODE == "local" and not ai.model_available():
+        raise HTTPException(status_code=503, detail="Disease model not available")
+
+    # Shed load before spending I/O and CPU on the upload
+    if disease_batcher.overloaded:
+        raise INFERENCE_BUSY
 
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        data, content_type = await read_image_upload(request, PREDICT_MAX_UPLOAD_BYTES)
+    except UploadTooLarge:
+        raise UPLOAD_TOO_LARGE
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        return ai.predict_disease(file_path)
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Invalid image file")
 
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    # Only the plain answer is cached
+    plain = top_k == 1 and not tta
+
+    # Same bytes under the same model → same answer, no decode, no inference
+    keys, cached = [], None
+    if plain:
+        keys.append(await run_in_threadpool(content_key, data))
+        cached = await prediction_cache.get(keys[0])
+    if cached is not None:
+        response.headers["X-Prediction-Cache"] = "hit"
+        return cached
+
+    # Hand off to inference_worker.py — this replica never decodes or predicts
+    if INFERENCE_MODE == "queue":
+        params = None if plain else {"top_k": top_k, "tta": tta, "budget_ms": budget_ms}
+        try:
+            job_id = await enqueue_job(data, params)
+        except InferenceOverloaded:
+            raise INFERENCE_BUSY
+
+        status_url = f"/api/predict-disease/jobs/{job_id}"
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job_id, "status": "queued", "status_url": status_url},
+            headers={"Location": status_url}
+        )
+
+    # Decode + resize + normalize once, from memory, in the threadpool
+    try:
+        image = await run_in_threadpool(ai.decode_image, data)
+    except (UnidentifiedImageError, OSError, ValueError):
+        raise HTTPException(status_code=400, detail="Could not decode image")
+
+    # Near-duplicate (re-encoded / resized copy of a known photo). A hit is
+    # not copied to the exact key: a dHash collision must not become the
+    # cached answer for these bytes
+    if plain and PREDICTION_CACHE_PHASH and prediction_cache.enabled:
+        keys.append(perceptual_key(image))
+        cached = await prediction_cache.get(keys[1])
+        if cached is not None:
+            response.headers["X-Prediction-Cache"] = "hit"
+            return cached
+
+    # Predict in the inference pool — the event loop (ingest, dashboards)
+    # never runs the model
+    options, views = request_options(disease_batcher, top_k, tta, budget_ms)
+    try:
+        result = await disease_batcher.submit(image, options, views)
+    except InferenceOverloaded:
+        raise INFERENCE_BUSY
+    except InferenceTimeout:
+        raise HTTPException(status_code=504, detail="Disease inference timed out")
+
+    if plain:
+        await prediction_cache.put(keys, result)
+        response.headers["X-Prediction-Cache"] = "miss"
+    return result
+
+
+@app.get("/api/predict-disease/jobs/{job_id}")
+async def predict_disease_job(job_id: str):
+    """
+    Status of a queued prediction: queued | running | done (with result) | failed (with error)
+    """
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Prediction job not found")
+    return job
@@ -0,0 +1,89 @@
+# migrate_timeseries.py
+"""
+Copies readings from the plain `sensor_data` collection into the
+time-series `sensor_readings` collection.
+
+Usage:
+    python migrate_timeseries.py [--batch-size 5000] [--drop-source]
+
+Then start the API with SENSOR_STORAGE=timeseries.
+
+The copy walks the source in timestamp order and resumes after the newest
+reading already in the target, so an interrupted run can simply be
+restarted. Readings that share the target's newest timestamp are
+re-checked by _id so they are not copied twice.
+"""
+
+import argparse
+import asyncio
+
+from db import (
+    STANDARD_COLLECTION,
+    TIMESERIES_COLLECTION,
+    db,
+    ensure_timeseries_collection
+)
+
+
+async def migrate(batch_size: int, drop_source: bool):
+    source = db[STANDARD_COLLECTION]
+    target = db[TIMESERIES_COLLECTION]
+
+    await ensure_timeseries_collection()
+    await target.create_index([("device_id", 1), ("timestamp", -1)])
+
+    # Resume point
+    query = {}
+    newest = await target.find_one(sort=[("timestamp", -1)], projection={"timestamp": 1})
+    if newest:
+        boundary = newest["timestamp"]
+        already = await target.distinct("_id", {"timestamp": boundary})
+        query = {
+            "$or": [
+                {"timestamp": {"$gt": boundary}},
+                {"timestamp": boundary, "_id": {"$nin": already}}
+            ]
+        }
+        print(f"↪️  Resuming after {boundary.isoformat()}")
+
+    total = await source.count_documents(query)
+    print(f"📦 {total} readings to migrate")
+
+    copied = 0
+    batch = []
+    cursor = source.find(query).sort("timestamp", 1).batch_size(batch_size)
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await target.insert_many(batch, ordered=True)
+            copied += len(batch)
+            batch = []
+            print(f"   {copied}/{total}")
+
+    if batch:
+        await target.insert_many(batch, ordered=True)
+        copied += len(batch)
+
+    print(f"✅ Migrated {copied} readings into '{TIMESERIES_COLLECTION}'")
+
+    if drop_source:
+        await source.drop()
+        print(f"🗑️  Dropped '{STANDARD_COLLECTION}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate sensor data to a time-series collection")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--drop-source",
+        action="store_true",
+        help="drop sensor_data after a successful copy"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args.batch_size, args.drop_source))
+
+
+if __name__ == "__main__":
+    main()
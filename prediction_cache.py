@@ -0,0 +1,153 @@
+# prediction_cache.py
+"""
+Cache of disease predictions keyed by image content.
+
+Resubmitted photos (retries, several devices syncing one gallery) are
+answered without running the model:
+
+1. sha256 of the uploaded bytes       → exact duplicates
+2. optional 64-bit dHash of the image → near duplicates (re-encoded or
+   resized copies), PREDICTION_CACHE_PHASH=true
+
+Every key includes ai.model_version(), so swapping the model invalidates
+all earlier answers. Entries live in a bounded in-memory LRU
+(logic.cache.TTLCache) and, with PREDICTION_CACHE_PERSIST=true, in the
+prediction_cache collection so they survive restarts and are shared
+between replicas.
+
+Without a resolvable model version (queue-mode API replica with no model
+file and no AI_MODEL_VERSION) the cache is bypassed — the inference
+worker checks it instead.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+from PIL import Image
+from pymongo.errors import PyMongoError
+
+import ai
+from db import predictions_collection
+from logic.cache import TTLCache
+
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000"))  # 0 = disabled
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", str(7 * 24 * 3600)))
+PREDICTION_CACHE_PHASH = os.getenv("PREDICTION_CACHE_PHASH", "false").lower() == "true"
+PREDICTION_CACHE_PERSIST = os.getenv("PREDICTION_CACHE_PERSIST", "false").lower() == "true"
+
+
+# ----------------------
+# Keys
+# ----------------------
+def content_key(data: bytes) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def perceptual_key(image: np.ndarray) -> str:
+    """
+    dHash of a preprocessed (224, 224, 3) image: 8x8 brightness gradients.
+    Survives re-encoding and resizing; a different leaf almost never collides.
+    """
+    gray = Image.fromarray((image * 255).astype(np.uint8)).convert("L").resize((9, 8), Image.BOX)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return "dhash:" + np.packbits(bits).tobytes().hex()
+
+
+# ----------------------
+# Cache
+# ----------------------
+class PredictionCache:
+    def __init__(
+        self,
+        model_version: Callable[[], str],
+        max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        ttl: float = PREDICTION_CACHE_TTL_S,
+        collection=None
+    ):
+        self.model_version = model_version
+        self.ttl = ttl
+        self.collection = collection
+        self._memory = TTLCache(max_entries, ttl)
+
+        self.stats = {"memory_hits": 0, "mongo_hits": 0, "misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._memory.enabled
+
+    def _version(self) -> str | None:
+        try:
+            return self.model_version()
+        except OSError:
+            return None   # no model file on this node
+
+    def _id(self, key: str) -> str:
+        return f"{self.model_version()}:{key}"
+
+    async def get(self, key: str) -> Dict | None:
+        if not self.enabled or self._version() is None:
+            return None
+
+        result = self._memory.get(self._id(key))
+        if result is not None:
+            self.stats["memory_hits"] += 1
+            return dict(result)
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one(
+                    {"_id": self._id(key)},
+                    {"_id": 0, "disease": 1, "confidence": 1}
+                )
+            except PyMongoError as e:
+                print("❌ Prediction cache read failed:", e)
+                doc = None
+
+            if doc:
+                self._memory.set(self._id(key), doc)
+                self.stats["mongo_hits"] += 1
+                return dict(doc)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, keys: Iterable[str], result: Dict):
+        if not self.enabled or self._version() is None:
+            return
+
+        entry = {"disease": result["disease"], "confidence": result["confidence"]}
+        keys = list(keys)
+
+        for key in keys:
+            self._memory.set(self._id(key), entry)
+
+        if self.collection is not None:
+            expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+            try:
+                for key in keys:
+                    await self.collection.replace_one(
+                        {"_id": self._id(key)},
+                        {**entry, "expires_at": expires_at},
+                        upsert=True
+                    )
+            except PyMongoError as e:
+                print("❌ Prediction cache write failed:", e)
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "model_version": self._version(),
+            "perceptual_hash": PREDICTION_CACHE_PHASH,
+            "persisted": self.collection is not None,
+            "memory": self._memory.snapshot()
+        }
+
+
+prediction_cache = PredictionCache(
+    ai.model_version,
+    collection=predictions_collection if PREDICTION_CACHE_PERSIST else None
+)
@@ -0,0 +1,42 @@
+# rebuild_rollups.py
+"""
+Backfills / repairs the hourly and daily trend rollups from raw readings.
+
+Usage:
+    python rebuild_rollups.py [--days 30]
+
+Run once after deploying rollups so existing history shows up in the
+trend charts. Safe to re-run: buckets are replaced, not incremented.
+The current hour and day are still open and are not rebuilt; re-run once
+they close to backfill readings stored before rollups were deployed.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from db import ensure_indexes
+from logic.rollups import rebuild_rollups
+
+
+async def rebuild(days: int):
+    await ensure_indexes()
+
+    since = datetime.utcnow() - timedelta(days=days)
+    print(f"🧮 Rebuilding rollups since {since.date().isoformat()}")
+
+    await rebuild_rollups(since)
+
+    print("✅ Rollups rebuilt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild trend rollups from raw readings")
+    parser.add_argument("--days", type=int, default=30, help="how far back to rebuild")
+    args = parser.parse_args()
+
+    asyncio.run(rebuild(args.days))
+
+
+if __name__ == "__main__":
+    main()
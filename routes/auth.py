@@ -1,6 +1,7 @@
 # routes/auth.py
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 
 from logic.crud.users import (
@@ -26,9 +27,9 @@ class LoginRequest(BaseModel):
 # Signup
 # ---------------------------
 @router.post("/signup", response_model=UserPublic)
-def signup(user: UserCreate):
+async def signup(user: UserCreate):
     try:
-        new_user = create_user(user)
+        new_user = await create_user(user)
 
         return UserPublic(
             id=new_user.id,
@@ -48,10 +49,13 @@ def signup(user: UserCreate):
 # Login
 # ---------------------------
 @router.post("/login")
-def login(data: LoginRequest):
-    user = get_user_by_email(data.email)
+async def login(data: LoginRequest):
+    user = await get_user_by_email(data.email)
 
-    if not user or not verify_password(data.password, user.hashed_password):
+    # bcrypt is CPU-bound — keep it off the event loop
+    if not user or not await run_in_threadpool(
+        verify_password, data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -1,11 +1,21 @@
 # routes/insights.py
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 
-from db import sensor_collection
+from logic.cache import response_cache
 from logic.core.deps import get_current_user
+from logic.etag import conditional_get, time_slot
+from logic.batch import columns_from_readings, generate_fleet_insights, insights_for
 from logic.insights import generate_plant_insights
-from logic.weather.client import fetch_weather
+from logic.profiles import profile_store
+from logic.readings import (
+    MAX_FLEET_DEVICES,
+    get_fleet_readings,
+    get_history_and_trends,
+    get_latest_reading,
+    list_device_ids
+)
+from logic.weather.prefetch import weather_for_reading, weather_version, with_weather_freshness
 
 router = APIRouter(
     prefix="/plant-insights",
@@ -14,64 +24,130 @@ router = APIRouter(
 
 
 @router.get("/latest")
-def get_latest_plant_insights(
+async def get_latest_plant_insights(
+    request: Request,
+    response: Response,
+    device_id: str | None = None,
     user: dict = Depends(get_current_user)  # 🔐 AUTH ENFORCED
 ):
     """
     Fully autonomous plant intelligence endpoint.
     Requires valid JWT access token.
+    Pass device_id to scope everything to one plant.
     """
 
-    # 1️⃣ Fetch latest sensor data
-    latest = sensor_collection.find_one(
-        sort=[("timestamp", -1)],
-        projection={"_id": 0}
+    # Weather changes without a new reading → its grid cell's version in the ETag,
+    # plus a 10-minute slot so the reported weather age stays honest
+    weather_seen = await weather_version(device_id)
+
+    not_modified = await conditional_get(
+        request, response, "plant-insights-weather", device_id, user["sub"], time_slot(10),
+        profile_store.for_device(device_id).tag, weather_seen
+    )
+    if not_modified:
+        return not_modified
+
+    # Everything except the caller is shared between users
+    result = await response_cache.get_or_compute(
+        "plant-insights-weather", device_id, lambda: _build_insights(device_id),
+        request.state.data_marker, weather_seen
     )
 
+    # 5️⃣ Final response (weather age is relative to now, not to the cache)
+    return {
+        "user": {
+            "id": user["sub"],
+            "email": user["email"]
+        },
+        **with_weather_freshness(result)
+    }
+
+
+async def _build_insights(device_id: str | None) -> dict:
+    # 1️⃣ Fetch latest sensor data
+    latest = await get_latest_reading(device_id)
+
     if not latest:
         raise HTTPException(
             status_code=404,
             detail="No sensor data found"
         )
 
-    # 2️⃣ Fetch history (last 24 records)
-    history_cursor = sensor_collection.find(
-        {},
-        projection={
-            "_id": 0,
-            "temperature": 1,
-            "humidity": 1,
-            "soilMoisture": 1,
-            "light": 1,
-            "timestamp": 1
-        }
-    ).sort("timestamp", 1).limit(24)
-
-    history = list(history_cursor)
-
-    # 3️⃣ Fetch weather (optional)
-    weather = None
-    if latest.get("lat") is not None and latest.get("lon") is not None:
-        weather = fetch_weather(
-            lat=latest["lat"],
-            lon=latest["lon"]
-        )
+    # 2️⃣ History (most recent 24 records) + trends — from memory when current
+    history, trends = await get_history_and_trends(device_id, latest)
+
+    # 3️⃣ Prefetched weather (optional, never blocks on the network)
+    weather, fetched_at = weather_for_reading(latest)
 
     # 4️⃣ Generate intelligence
     insights = generate_plant_insights(
         sensor_data=latest,
         history=history,
-        weather=weather
+        weather=weather,
+        trends=trends,
+        profile=profile_store.for_device(device_id)
     )
 
-    # 5️⃣ Final response
     return {
-        "user": {
-            "id": user["id"],
-            "email": user["email"]
-        },
         "timestamp": latest.get("timestamp"),
         "sensor_data": latest,
         "weather": weather,
+        "weather_fetched_at": fetched_at,
         "insights": insights
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/fleet")
+async def get_fleet_plant_insights(
+    device_ids: list[str] | None = Query(None),
+    user: dict = Depends(get_current_user)  # 🔐 AUTH ENFORCED
+):
+    """
+    Insights for many plants in one request.
+    Without device_ids, every known device is included (up to the cap).
+    Weather is not fetched here — use /latest for a single plant.
+    """
+
+    if device_ids is None:
+        device_ids = await list_device_ids()
+
+    device_ids = list(dict.fromkeys(device_ids))  # dedupe, keep order
+
+    if len(device_ids) > MAX_FLEET_DEVICES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many devices (max {MAX_FLEET_DEVICES})"
+        )
+
+    readings = await get_fleet_readings(device_ids)
+
+    # One vectorized pass per plant profile over every device that has data
+    devices = {d: None for d in device_ids}
+    groups = {}
+    for d in device_ids:
+        if readings[d]["latest"]:
+            groups.setdefault(profile_store.for_device(d), []).append(d)
+
+    for profile, present in groups.items():
+        result = generate_fleet_insights(
+            # Trends come from the incremental per-device state, not recomputed
+            **columns_from_readings(
+                [readings[d]["latest"] for d in present],
+                [readings[d]["history"] for d in present],
+                trends=[readings[d]["trends"] for d in present]
+            ),
+            profile=profile
+        )
+
+        for i, device_id in enumerate(present):
+            latest = readings[device_id]["latest"]
+            devices[device_id] = {
+                "timestamp": latest.get("timestamp"),
+                "sensor_data": latest,
+                "insights": insights_for(result, i)
+            }
+
+    return {
+        "count": len(devices),
+        "devices": devices
+    }
@@ -0,0 +1,130 @@
+# routes/stream.py
+
+import asyncio
+
+from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from logic.core.deps import WS_TOKEN_SUBPROTOCOL, get_current_user, get_websocket_user
+from logic.readings import get_history
+from logic.stream import DROPPED_EVENT, stream_hub
+from logic.trend_engine import trend_registry
+
+router = APIRouter(
+    prefix="/stream",
+    tags=["Live Stream"]
+)
+
+# Keeps proxies from closing idle SSE connections
+HEARTBEAT_S = 15
+
+
+async def _subscribe(device_id: str | None):
+    # One history read per device, only when its trend state is cold
+    if device_id and trend_registry.get(device_id) is None:
+        trend_registry.seed(device_id, await get_history(device_id))
+
+    return stream_hub.subscribe(device_id)
+
+
+# ----------------------
+# Server-sent events
+# ----------------------
+@router.get("/sse")
+async def stream_sse(
+    request: Request,
+    device_id: str | None = None,
+    user: dict = Depends(get_current_user)  # 🔐 AUTH ENFORCED
+):
+    """
+    text/event-stream of new readings + recomputed insights.
+    Omit device_id to follow the whole fleet.
+    Requires valid JWT access token (Authorization header).
+    """
+
+    sub = await _subscribe(device_id)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.next_event(), timeout=HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                yield f"data: {event}\n\n"
+
+                if event is DROPPED_EVENT:
+                    break
+        finally:
+            stream_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ----------------------
+# WebSocket
+# ----------------------
+async def _until_disconnect(websocket: WebSocket):
+    # Clients never send anything; reading is how a quiet client's
+    # disconnect is noticed without waiting for the next publish
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+async def _send_events(websocket: WebSocket, sub):
+    while True:
+        event = await sub.next_event()
+        await websocket.send_text(event)
+
+        if event is DROPPED_EVENT:
+            await websocket.close(code=1013)  # try again later
+            return
+
+
+@router.websocket("/ws")
+async def stream_ws(websocket: WebSocket, device_id: str | None = None):
+    """
+    Same events as /sse. Requires valid JWT access token as ?token= or
+    the subprotocols ["bearer", "<token>"].
+    """
+
+    # 🔐 AUTH ENFORCED — rejected during the handshake, before accept()
+    if get_websocket_user(websocket) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    # A client that offered the bearer subprotocol expects it echoed back
+    offered = websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=WS_TOKEN_SUBPROTOCOL if WS_TOKEN_SUBPROTOCOL in offered else None)
+    sub = await _subscribe(device_id)
+
+    receiver = asyncio.create_task(_until_disconnect(websocket))
+    sender = asyncio.create_task(_send_events(websocket, sub))
+
+    try:
+        # Whichever ends first (client left / stream dropped) ends both
+        await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+
+    finally:
+        stream_hub.unsubscribe(sub)
+        receiver.cancel()
+        sender.cancel()
+        # wait(), not gather(): if this handler is itself cancelled, gather
+        # would re-raise the children's cancellation instead of the server's
+        await asyncio.wait({receiver, sender})
+
+    for task in (receiver, sender):
+        error = None if task.cancelled() else task.exception()
+        if error is not None and not isinstance(error, (WebSocketDisconnect, RuntimeError)):
+            raise error
+
+
+@router.get("/stats")
+def stream_stats():
+    return stream_hub.snapshot()
@@ -0,0 +1,75 @@
+import random
+
+from logic.batch import columns_from_readings, generate_fleet_insights, insights_for
+from logic.insights import generate_plant_insights
+from logic.profiles import compile_profile
+from logic.trend_engine import analyze_trends
+
+
+def value(rng: random.Random, lo: float, hi: float) -> float:
+    return round(rng.uniform(lo, hi), rng.choice([0, 1, 1, 2]))
+
+
+def reading(rng: random.Random) -> dict:
+    return {
+        "soilMoisture": value(rng, 0, 100),
+        "temperature": value(rng, 5, 45),
+        "humidity": value(rng, 10, 100),
+        "light": rng.choice([None, value(rng, 0, 4000)])
+    }
+
+
+def random_fleet(seed: int, devices: int):
+    rng = random.Random(seed)
+    latest, histories, weathers = [], [], []
+
+    for _ in range(devices):
+        latest.append(reading(rng))
+
+        # Slow one-decimal drift → slopes close to the 0.5 tolerance and to rounding ties
+        base = reading(rng)
+        histories.append([
+            {k: None if v is None else round(v + rng.uniform(-1, 1) * j / 10, 1) for k, v in base.items()}
+            for j in range(rng.randint(0, 30))
+        ])
+
+        weathers.append(rng.choice([
+            None,
+            {},
+            {"rain_probability": value(rng, 0, 100), "temperature": value(rng, 10, 45), "humidity": value(rng, 10, 100)}
+        ]))
+
+    return latest, histories, weathers
+
+
+def assert_parity(latest, histories, weathers, profile=None, trends=None):
+    result = generate_fleet_insights(
+        **columns_from_readings(latest, histories, weathers, trends=trends),
+        profile=profile
+    )
+
+    for i, (l, h, w) in enumerate(zip(latest, histories, weathers)):
+        assert insights_for(result, i) == generate_plant_insights(l, h, w, profile=profile), i
+
+
+def test_fleet_matches_scalar_insights():
+    for seed in range(3):
+        assert_parity(*random_fleet(seed, 3000))
+
+
+def test_fleet_matches_scalar_insights_with_profile():
+    profile = compile_profile({
+        "profile_id": "fern",
+        "version": 1,
+        "humidity": {"optimal_min": 60, "optimal_max": 90, "warning_low": 45, "warning_high": 95}
+    })
+
+    assert_parity(*random_fleet(7, 3000), profile=profile)
+
+
+def test_fleet_with_precomputed_trends_matches_scalar_insights():
+    # Fleet endpoint: trends come from the per-device incremental state
+    latest, histories, weathers = random_fleet(11, 3000)
+    trends = [analyze_trends(h) for h in histories]
+
+    assert_parity(latest, histories, weathers, trends=trends)
@@ -0,0 +1,35 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("motor")
+
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")   # nothing connects
+
+from pymongo.errors import OperationFailure
+
+import db
+
+
+# Another worker creates the collection between our check and our create
+class RacedDatabase:
+    def __init__(self, code):
+        self.code = code
+
+    async def list_collection_names(self):
+        return []
+
+    async def create_collection(self, name, **options):
+        raise OperationFailure(f"Collection {name} already exists", code=self.code)
+
+
+def test_losing_the_create_race_is_fine(monkeypatch):
+    monkeypatch.setattr(db, "db", RacedDatabase(code=48))
+    asyncio.run(db.ensure_timeseries_collection())
+
+
+def test_other_create_failures_still_raise(monkeypatch):
+    monkeypatch.setattr(db, "db", RacedDatabase(code=13))   # Unauthorized
+    with pytest.raises(OperationFailure):
+        asyncio.run(db.ensure_timeseries_collection())
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from logic.history import HistoryWindow
+
+NOW = datetime(2026, 1, 10, 12, 0)
+
+
+# Minimal in-memory stand-in for a Motor collection (find/sort/limit/to_list)
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return [dict(d) for d in self.docs[:length]]
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        def matches(doc):
+            for key, cond in query.items():
+                if isinstance(cond, dict):
+                    if doc[key] < cond["$gte"]:
+                        return False
+                elif doc.get(key) != cond:
+                    return False
+            return True
+
+        return FakeCursor([d for d in self.docs if matches(d)])
+
+
+def make_readings(device_id, count):
+    # one reading per hour, oldest first, soilMoisture == index
+    return [
+        {
+            "device_id": device_id,
+            "timestamp": NOW - timedelta(hours=count - 1 - i),
+            "soilMoisture": float(i)
+        }
+        for i in range(count)
+    ]
+
+
+def test_count_window_returns_most_recent_readings_oldest_first():
+    collection = FakeCollection(make_readings("a", 100))
+
+    history = asyncio.run(HistoryWindow(points=24).fetch(collection))
+
+    assert len(history) == 24
+    assert [d["soilMoisture"] for d in history] == [float(i) for i in range(76, 100)]
+    assert history[-1]["timestamp"] == NOW
+
+
+def test_time_window_only_includes_recent_readings():
+    collection = FakeCollection(make_readings("a", 100))
+    window = HistoryWindow(duration=timedelta(hours=6))
+
+    history = asyncio.run(window.fetch(collection, now=NOW))
+
+    assert [d["soilMoisture"] for d in history] == [float(i) for i in range(93, 100)]
+
+
+def test_window_is_scoped_to_device():
+    collection = FakeCollection(make_readings("a", 30) + make_readings("b", 5))
+
+    history = asyncio.run(HistoryWindow(points=24).fetch(collection, device_id="b"))
+
+    assert len(history) == 5
+    assert all(d["device_id"] == "b" for d in history)
+
+
+def test_window_requires_points_or_duration():
+    try:
+        HistoryWindow()
+    except ValueError:
+        return
+    raise AssertionError("HistoryWindow() should reject an empty window")
@@ -0,0 +1,246 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import ai
+from inference import InferenceOverloaded, InferenceTimeout, MicroBatcher, request_options
+
+
+# Stand-in for ai.predict_batch: records batch sizes, can be held or made to fail
+class FakeModel:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, images, options=None):
+        self.release.wait(5)
+        self.batches.append([float(image[0, 0, 0]) for image in images])
+        if self.fail:
+            raise RuntimeError("model exploded")
+        return [{"disease": f"class-{image[0, 0, 0]:g}", "confidence": 1.0} for image in images]
+
+
+def image(tag: float) -> np.ndarray:
+    return np.full((2, 2, 3), tag, dtype=np.float32)
+
+
+async def wait_until(condition, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.005)
+
+
+def test_results_return_in_order_in_one_batch():
+    model = FakeModel()
+
+    async def run():
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=20)
+        try:
+            return await asyncio.gather(*(batcher.submit(image(i)) for i in range(5)))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert [r["disease"] for r in results] == [f"class-{i}" for i in range(5)]
+    assert model.batches == [[0, 1, 2, 3, 4]]
+
+
+def test_overload_counts_queued_images():
+    model = FakeModel()
+    model.release.clear()
+
+    async def run():
+        batcher = MicroBatcher(model, max_batch_size=1, max_wait_ms=0, max_queue=4)
+        try:
+            running = asyncio.ensure_future(batcher.submit(image(0)))   # held in the model
+            await wait_until(lambda: batcher.snapshot()["running_batches"] == 1)
+
+            # One TTA-sized request fills the queue on its own
+            queued = asyncio.ensure_future(batcher.submit(image(1), {"tta": True}, images=4))
+            await asyncio.sleep(0)
+            assert batcher.overloaded
+
+            with pytest.raises(InferenceOverloaded):
+                await batcher.submit(image(2))
+
+            model.release.set()
+            await asyncio.gather(running, queued)
+            assert not batcher.overloaded
+            return batcher.stats["rejected_overload"]
+        finally:
+            model.release.set()
+            await batcher.stop()
+
+    assert asyncio.run(run()) == 1
+
+
+def test_timed_out_request_is_skipped():
+    model = FakeModel()
+    model.release.clear()
+
+    async def run():
+        batcher = MicroBatcher(model, max_batch_size=1, max_wait_ms=0, timeout=5)
+        try:
+            first = asyncio.ensure_future(batcher.submit(image(0)))
+            await wait_until(lambda: batcher.snapshot()["running_batches"] == 1)
+
+            # Waits behind the held batch and gives up
+            batcher.timeout = 0.05
+            with pytest.raises(InferenceTimeout):
+                await batcher.submit(image(1))
+
+            batcher.timeout = 5
+            model.release.set()
+            await first
+            assert (await batcher.submit(image(2)))["disease"] == "class-2"
+        finally:
+            model.release.set()
+            await batcher.stop()
+
+    asyncio.run(run())
+
+    # image 1 never reached the model
+    assert model.batches == [[0], [2]]
+
+
+def test_batch_exception_reaches_every_waiter():
+    model = FakeModel(fail=True)
+
+    async def run():
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=20)
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(image(i)) for i in range(3)),
+                return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert len(model.batches) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_request_that_would_overflow_starts_the_next_batch():
+    model = FakeModel()
+    model.release.clear()
+
+    async def run():
+        batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=20)
+        try:
+            held = asyncio.ensure_future(batcher.submit(image(0)))
+            await wait_until(lambda: batcher.snapshot()["running_batches"] == 1)
+
+            # Queued behind the held batch: 1 + 4 + 1 rows
+            queued = [
+                asyncio.ensure_future(batcher.submit(image(1))),
+                asyncio.ensure_future(batcher.submit(image(2), {"tta": True}, images=4)),
+                asyncio.ensure_future(batcher.submit(image(3)))
+            ]
+            await asyncio.sleep(0)
+
+            model.release.set()
+            await asyncio.gather(held, *queued)
+            return batcher.stats["max_batch"]
+        finally:
+            model.release.set()
+            await batcher.stop()
+
+    assert asyncio.run(run()) == 4
+    assert model.batches == [[0], [1], [2], [3]]
+
+
+# ----------------------
+# Per-request options through ai.predict_batch
+# ----------------------
+CLASS_NAMES = {"0": "healthy", "1": "blight", "2": "rust"}
+
+
+def leaf(tag: int) -> np.ndarray:
+    # Channel 0 carries the class, a corner marker tells the original view apart
+    array = np.full((*ai.IMAGE_SIZE, 3), tag, dtype=np.float32)
+    array[..., 1] = 0
+    array[0, 0, 1] = 1
+    return array
+
+
+class FakeProbabilities:
+    # Original view → certain of its class; flipped / cropped views → 0.6 / 0.4
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, images):
+        self.rows.append(len(images))
+        probabilities = np.zeros((len(images), len(CLASS_NAMES)), dtype=np.float32)
+
+        for row, view in zip(probabilities, images):
+            tag = int(view[112, 112, 0])
+            if view[0, 0, 1] == 1:
+                row[tag] = 1.0
+            else:
+                row[tag], row[(tag + 1) % len(CLASS_NAMES)] = 0.6, 0.4
+
+        return probabilities
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeProbabilities()
+    monkeypatch.setattr(ai, "predict_probabilities", fake)
+    monkeypatch.setattr(ai, "_class_names", CLASS_NAMES)
+    return fake
+
+
+def test_mixed_batch_keeps_per_image_results(model):
+    async def run():
+        batcher = MicroBatcher(ai.predict_batch, max_batch_size=16, max_wait_ms=50)
+        try:
+            return await asyncio.gather(
+                batcher.submit(leaf(0)),
+                batcher.submit(leaf(1), {"top_k": 2, "tta": True}, images=len(ai.TTA_VIEWS)),
+                batcher.submit(leaf(2), {"top_k": 2}),
+                batcher.submit(leaf(0), {"top_k": 1, "tta": False})
+            )
+        finally:
+            await batcher.stop()
+
+    plain, tta, top2, degraded = asyncio.run(run())
+
+    # One forward pass: 1 + 4 TTA views + 1 + 1 rows
+    assert model.rows == [7]
+
+    assert plain == {"disease": "healthy", "confidence": 1.0}
+
+    # Views averaged: (1.0 + 3 × 0.6) / 4 for the class, 3 × 0.4 / 4 for the runner-up
+    assert tta["disease"] == "blight" and tta["confidence"] == 0.7 and tta["tta"] is True
+    assert [(r["disease"], r["confidence"]) for r in tta["top_k"]] == [("blight", 0.7), ("rust", 0.3)]
+
+    assert top2["disease"] == "rust" and len(top2["top_k"]) == 2
+    assert top2["top_k"][0] == {"disease": "rust", "confidence": 1.0}
+    assert "tta" not in top2
+
+    assert degraded == {"disease": "healthy", "confidence": 1.0, "tta": False}
+
+
+def test_tta_kept_within_budget_and_dropped_beyond_it(monkeypatch):
+    batcher = MicroBatcher(FakeModel())
+    views = len(ai.TTA_VIEWS)
+
+    # No measured speed yet → TTA kept
+    assert request_options(batcher, tta=True) == ({"top_k": 1, "tta": True}, views)
+
+    monkeypatch.setattr(batcher, "estimate_latency", lambda images: 0.2 * images)
+    assert request_options(batcher, top_k=3, tta=True, budget_ms=1000) == ({"top_k": 3, "tta": True}, views)
+    assert request_options(batcher, top_k=3, tta=True, budget_ms=500) == ({"top_k": 3, "tta": False}, 1)
+
+    # Plain and top-k-only requests never look at the budget
+    assert request_options(batcher) == (None, 1)
+    assert request_options(batcher, top_k=3, budget_ms=1) == ({"top_k": 3}, 1)
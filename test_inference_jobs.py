@@ -0,0 +1,286 @@
+import asyncio
+import copy
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("motor")
+
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")   # nothing connects
+
+from bson import ObjectId
+
+import inference_jobs
+import inference_worker
+from inference import InferenceOverloaded, InferenceTimeout
+from inference_jobs import (
+    claim_job,
+    enqueue_job,
+    fail_abandoned_jobs,
+    finish_job,
+    get_job,
+    renew_lease,
+    requeue_job
+)
+
+RESULT = {"disease": "Tomato___healthy", "confidence": 0.97}
+
+
+# Minimal in-memory stand-in for a Motor collection (the operators the job queue uses)
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            for op, operand in condition.items():
+                if value is None:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+def apply(doc, update):
+    doc.update(update.get("$set", {}))
+    for key, step in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + step
+    for key in update.get("$unset", {}):
+        doc.pop(key, None)
+
+
+class FakeJobs:
+    def __init__(self):
+        self.docs = []
+
+    async def count_documents(self, query, limit=0):
+        count = sum(matches(d, query) for d in self.docs)
+        return min(count, limit) if limit else count
+
+    async def insert_one(self, doc):
+        doc = {"_id": ObjectId(), **doc}
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return {k: v for k, v in doc.items() if k not in (projection or {})}
+        return None
+
+    async def find_one_and_update(self, query, update, sort, return_document):
+        key, direction = sort[0]
+        for doc in sorted(self.docs, key=lambda d: d[key], reverse=direction < 0):
+            if matches(doc, query):
+                apply(doc, update)
+                return copy.deepcopy(doc)
+        return None
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if matches(doc, query):
+                apply(doc, update)
+                return SimpleNamespace(modified_count=1)
+        return SimpleNamespace(modified_count=0)
+
+    async def update_many(self, query, update):
+        hits = [d for d in self.docs if matches(d, query)]
+        for doc in hits:
+            apply(doc, update)
+        return SimpleNamespace(modified_count=len(hits))
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    collection = FakeJobs()
+    monkeypatch.setattr(inference_jobs, "inference_jobs_collection", collection)
+    return collection
+
+
+def expire_leases(monkeypatch):
+    # Every claim from now on is already past its lease
+    monkeypatch.setattr(inference_jobs, "INFERENCE_JOB_LEASE_S", -1)
+
+
+def test_claim_and_finish(jobs):
+    async def run():
+        job_id = await enqueue_job(b"leaf")
+        job = await claim_job("worker-a")
+        assert await claim_job("worker-b") is None   # leased to a
+        assert await finish_job(job, result=RESULT)
+        return await get_job(job_id)
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "done"
+    assert job["result"] == RESULT
+    assert "image" not in jobs.docs[0]
+
+
+def test_expired_lease_is_reclaimed_and_old_worker_ignored(jobs, monkeypatch):
+    expire_leases(monkeypatch)
+
+    async def run():
+        job_id = await enqueue_job(b"leaf")
+        stale = await claim_job("worker-a")
+        fresh = await claim_job("worker-b")
+
+        assert fresh["attempts"] == 2
+        assert not await finish_job(stale, error="late")   # a lost its claim
+        assert await finish_job(fresh, result=RESULT)
+        assert not await finish_job(stale, result={"disease": "x", "confidence": 0.1})
+        return await get_job(job_id)
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "done"
+    assert job["result"] == RESULT
+
+
+def test_same_worker_reclaim_does_not_confuse_attempts(jobs, monkeypatch):
+    expire_leases(monkeypatch)
+
+    async def run():
+        await enqueue_job(b"leaf")
+        first = await claim_job("worker-a")
+        second = await claim_job("worker-a")
+        return await finish_job(first, error="late"), await finish_job(second, result=RESULT)
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_max_attempts_then_failed(jobs, monkeypatch):
+    expire_leases(monkeypatch)
+    monkeypatch.setattr(inference_jobs, "INFERENCE_JOB_MAX_ATTEMPTS", 2)
+
+    async def run():
+        job_id = await enqueue_job(b"leaf")
+        await claim_job("worker-a")
+        last = await claim_job("worker-b")
+
+        assert await claim_job("worker-c") is None   # out of attempts
+        assert await fail_abandoned_jobs() == 1
+        assert not await finish_job(last, result=RESULT)   # too late
+        return await get_job(job_id)
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Inference worker did not finish the job"
+
+
+def test_pending_limit(jobs, monkeypatch):
+    monkeypatch.setattr(inference_jobs, "INFERENCE_JOB_MAX_PENDING", 1)
+
+    async def run():
+        await enqueue_job(b"one")
+        with pytest.raises(InferenceOverloaded):
+            await enqueue_job(b"two")
+
+    asyncio.run(run())
+
+
+def test_renewed_lease_is_not_reclaimed_and_stale_claim_cannot_renew(jobs, monkeypatch):
+    async def run():
+        await enqueue_job(b"leaf")
+        expire_leases(monkeypatch)
+        job = await claim_job("worker-a")
+
+        monkeypatch.setattr(inference_jobs, "INFERENCE_JOB_LEASE_S", 60)
+        assert await renew_lease(job)
+        assert await claim_job("worker-b") is None   # lease pushed out
+
+        expire_leases(monkeypatch)
+        assert await renew_lease(job)                # lease now already past
+        taken = await claim_job("worker-b")
+        assert not await renew_lease(job)            # a lost its claim
+        return taken
+
+    assert asyncio.run(run())["worker"] == "worker-b"
+
+
+def test_requeued_job_is_claimed_again(jobs):
+    async def run():
+        job_id = await enqueue_job(b"leaf")
+        job = await claim_job("worker-a")
+        assert await requeue_job(job)
+        assert not await finish_job(job, result=RESULT)   # no longer a's
+
+        again = await claim_job("worker-b")
+        assert again["attempts"] == 2
+        assert await finish_job(again, result=RESULT)
+        return await get_job(job_id)
+
+    assert asyncio.run(run())["status"] == "done"
+
+
+# ----------------------
+# Worker
+# ----------------------
+def fail_with(monkeypatch, error):
+    async def predict(job):
+        raise error
+
+    monkeypatch.setattr(inference_worker, "_predict_job", predict)
+
+
+def test_transient_error_requeues_until_last_attempt(jobs, monkeypatch):
+    monkeypatch.setattr(inference_worker, "INFERENCE_JOB_MAX_ATTEMPTS", 2)
+    fail_with(monkeypatch, InferenceTimeout())
+
+    async def run():
+        job_id = await enqueue_job(b"leaf")
+
+        await inference_worker.process_job(await claim_job("worker-a"))
+        first = await get_job(job_id)
+
+        await inference_worker.process_job(await claim_job("worker-a"))
+        return first, await get_job(job_id)
+
+    first, last = asyncio.run(run())
+
+    assert first["status"] == "queued"
+    assert last["status"] == "failed"
+    assert last["error"] == "Disease inference timed out"
+
+
+def test_other_errors_fail_at_once(jobs, monkeypatch):
+    fail_with(monkeypatch, RuntimeError("model exploded"))
+
+    async def run():
+        job_id = await enqueue_job(b"leaf")
+        await inference_worker.process_job(await claim_job("worker-a"))
+        return await get_job(job_id)
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Disease inference failed"
+
+
+def test_lease_renewed_while_job_runs(jobs, monkeypatch):
+    monkeypatch.setattr(inference_jobs, "INFERENCE_JOB_LEASE_S", 0.15)
+    monkeypatch.setattr(inference_worker, "INFERENCE_JOB_LEASE_S", 0.15)
+
+    async def slow_predict(job):
+        await asyncio.sleep(0.4)   # well past the original lease
+        assert await claim_job("worker-b") is None
+        return RESULT, None
+
+    monkeypatch.setattr(inference_worker, "_predict_job", slow_predict)
+
+    async def run():
+        job_id = await enqueue_job(b"leaf")
+        await inference_worker.process_job(await claim_job("worker-a"))
+        return await get_job(job_id)
+
+    job = asyncio.run(run())
+
+    assert job["status"] == "done"
+    assert job["result"] == RESULT
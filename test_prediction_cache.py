@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("motor")
+
+from prediction_cache import PredictionCache, content_key
+
+RESULT = {"disease": "Tomato___Late_blight", "confidence": 0.93}
+
+
+def test_hit_for_same_bytes_and_model():
+    cache = PredictionCache(lambda: "keras-1", max_entries=10, ttl=60)
+    key = content_key(b"leaf")
+
+    async def run():
+        await cache.put([key], RESULT)
+        return await cache.get(key), await cache.get(content_key(b"other leaf"))
+
+    assert asyncio.run(run()) == (RESULT, None)
+
+
+def test_model_version_change_misses():
+    version = {"current": "keras-1"}
+    cache = PredictionCache(lambda: version["current"], max_entries=10, ttl=60)
+    key = content_key(b"leaf")
+
+    async def run():
+        await cache.put([key], RESULT)
+        version["current"] = "tflite-2"   # model swapped
+        miss = await cache.get(key)
+        version["current"] = "keras-1"
+        return miss, await cache.get(key)
+
+    assert asyncio.run(run()) == (None, RESULT)
+
+
+def test_bypassed_without_model_version():
+    def missing():
+        raise FileNotFoundError("no model on this node")
+
+    cache = PredictionCache(missing, max_entries=10, ttl=60)
+    key = content_key(b"leaf")
+
+    async def run():
+        await cache.put([key], RESULT)
+        return await cache.get(key)
+
+    assert asyncio.run(run()) is None
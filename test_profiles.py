@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+from logic import profiles
+from logic.profiles import ProfileStore, read_profile_files
+
+
+class EmptyCollection:
+    def find(self, *args):
+        async def docs():
+            return
+            yield
+        return docs()
+
+
+def write(path, content):
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+
+
+def test_bad_file_keeps_its_last_good_version(tmp_path):
+    write(tmp_path / "tomato.json", {"version": 1, "temperature": {"optimal_min": 20}})
+    write(tmp_path / "basil.json", {"version": 1})
+    assert [p["profile_id"] for p in read_profile_files(str(tmp_path))] == ["basil", "tomato"]
+
+    write(tmp_path / "tomato.json", '{"version": 2, "temperature": ')   # half-saved edit
+    write(tmp_path / "fern.json", "[]")
+    loaded = {p["profile_id"]: p for p in read_profile_files(str(tmp_path))}
+
+    assert sorted(loaded) == ["basil", "tomato"]
+    assert loaded["tomato"]["version"] == 1
+
+
+def test_refresh_survives_unreadable_profiles(tmp_path, monkeypatch):
+    write(tmp_path / "broken.json", "{not json")
+    (tmp_path / "folder.json").mkdir()   # open() raises IsADirectoryError
+    write(tmp_path / "mint.json", {"version": 1, "device_ids": ["esp32-09"]})
+
+    store = ProfileStore()
+    monkeypatch.setattr(profiles, "PROFILES_DIR", str(tmp_path))
+    monkeypatch.setattr(profiles, "profile_store", store)
+
+    asyncio.run(profiles.refresh_profiles(EmptyCollection()))
+
+    assert store.for_device("esp32-09").profile_id == "mint"
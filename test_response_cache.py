@@ -0,0 +1,77 @@
+import asyncio
+
+from logic.cache import ResponseCache
+
+
+def test_invalidation_during_compute_is_not_cached():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    calls = []
+
+    async def run():
+        started, ingested = asyncio.Event(), asyncio.Event()
+
+        async def slow_compute():
+            calls.append("slow")
+            started.set()
+            await ingested.wait()
+            return "before ingest"
+
+        async def fresh_compute():
+            calls.append("fresh")
+            return "after ingest"
+
+        pending = asyncio.ensure_future(cache.get_or_compute("insights", "dev-1", slow_compute))
+        await started.wait()
+
+        cache.invalidate_devices({"dev-1"})   # ingest lands mid-compute
+        ingested.set()
+
+        first = await pending
+        second = await cache.get_or_compute("insights", "dev-1", fresh_compute)
+        third = await cache.get_or_compute("insights", "dev-1", fresh_compute)
+        return first, second, third
+
+    assert asyncio.run(run()) == ("before ingest", "after ingest", "after ingest")
+    assert calls == ["slow", "fresh"]
+
+
+def test_other_device_ingest_keeps_value():
+    cache = ResponseCache(max_entries=10, ttl=60)
+
+    async def run():
+        async def compute():
+            cache.invalidate_devices({"dev-2"})
+            return "dev-1 insights"
+
+        await cache.get_or_compute("insights", "dev-1", compute)
+        return cache.get(("insights", "dev-1"))
+
+    assert asyncio.run(run()) == "dev-1 insights"
+
+
+def test_fleet_entry_skipped_on_any_ingest():
+    cache = ResponseCache(max_entries=10, ttl=60)
+
+    async def run():
+        async def compute():
+            cache.invalidate_devices({"dev-7"})
+            return "fleet"
+
+        await cache.get_or_compute("fleet-insights", None, compute)
+        return cache.get(("fleet-insights", None))
+
+    assert asyncio.run(run()) is None
+
+
+def test_clear_during_compute_is_not_cached():
+    cache = ResponseCache(max_entries=10, ttl=60)
+
+    async def run():
+        async def compute():
+            cache.clear()   # e.g. profiles reloaded
+            return "old profiles"
+
+        await cache.get_or_compute("insights", "dev-1", compute)
+        return cache.get(("insights", "dev-1"))
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The API's own dependencies must be installed; the model and Mongo must not be needed
+for module in ("fastapi", "motor", "dotenv", "passlib", "requests"):
+    pytest.importorskip(module)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative `import main` time allowed on a cold worker
+IMPORT_BUDGET_S = float(os.getenv("STARTUP_IMPORT_BUDGET_S", "2.0"))
+
+ML_RUNTIMES = ("tensorflow", "tflite_runtime", "onnxruntime", "keras")
+
+
+def import_main() -> dict:
+    """
+    `python -X importtime -c "import main"` in a clean process → {module: cumulative µs}
+    """
+    env = {
+        **os.environ,
+        "MONGO_URL": "mongodb://127.0.0.1:1",             # nothing listens here
+        "AI_MODEL_PATH": os.path.join(ROOT, "missing.h5")  # no model on disk
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_main_imports_without_model_or_database():
+    modules = import_main()
+
+    assert "main" in modules
+    assert not [m for m in modules if m.split(".")[0] in ML_RUNTIMES]
+
+
+def test_main_import_within_budget():
+    # Best of three — the first run also pays for cold .pyc / disk caches
+    seconds = min(import_main()["main"] for _ in range(3)) / 1e6
+
+    assert seconds <= IMPORT_BUDGET_S, f"import main took {seconds:.2f}s (budget {IMPORT_BUDGET_S}s)"
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("motor")
+pytest.importorskip("jose")
+
+# Nothing connects: only the auth handshake and an idle subscription run
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")
+os.environ.setdefault("JWT_SECRET", "stream-test-secret")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from logic.core.jwt import create_access_token
+from routes import stream
+
+app = FastAPI()
+app.include_router(stream.router)
+client = TestClient(app)
+
+TOKEN = create_access_token({"sub": "user-1", "email": "grower@example.com"})
+
+
+def test_sse_requires_token():
+    assert client.get("/stream/sse").status_code in (401, 403)
+    assert client.get("/stream/sse", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+@pytest.mark.parametrize("url, subprotocols", [
+    ("/stream/ws", None),
+    ("/stream/ws?token=nope", None),
+    ("/stream/ws", ["bearer", "nope"])
+])
+def test_ws_rejected_before_accept(url, subprotocols):
+    with pytest.raises(WebSocketDisconnect) as e:
+        with client.websocket_connect(url, subprotocols=subprotocols):
+            pass
+    assert e.value.code == 1008
+
+
+@pytest.mark.parametrize("url, subprotocols", [
+    (f"/stream/ws?token={TOKEN}", None),
+    ("/stream/ws", ["bearer", TOKEN])
+])
+def test_ws_accepts_valid_token(url, subprotocols):
+    with client.websocket_connect(url, subprotocols=subprotocols) as ws:
+        assert ws.accepted_subprotocol == (subprotocols[0] if subprotocols else None)
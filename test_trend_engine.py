@@ -0,0 +1,61 @@
+import random
+from datetime import datetime, timedelta
+
+from logic.trend_engine import TREND_METRICS, WINDOW_SIZE, DeviceTrendState, TrendRegistry, analyze_trends
+
+START = datetime(2026, 1, 10, 12, 0)
+
+# Typical sensor levels; readings carry one decimal like the devices send
+LEVELS = {"soilMoisture": 40.0, "temperature": 24.0, "humidity": 60.0, "light": 500.0}
+
+
+def random_stream(rng: random.Random, n: int) -> list:
+    docs = []
+    levels = dict(LEVELS)
+
+    for i in range(n):
+        doc = {"device_id": "d1", "timestamp": START + timedelta(minutes=5 * i)}
+        for metric in TREND_METRICS:
+            levels[metric] += rng.uniform(-1.5, 1.5)
+            # Some readings miss a sensor value
+            doc[metric] = None if rng.random() < 0.1 else round(levels[metric], 1)
+        docs.append(doc)
+
+    return docs
+
+
+def test_streaming_state_matches_analyze_trends():
+    rng = random.Random(12)
+
+    for _ in range(150):
+        docs = random_stream(rng, rng.randint(1, 120))
+        state = DeviceTrendState()
+
+        for i, doc in enumerate(docs):
+            state.push(doc)
+            window = docs[max(0, i + 1 - WINDOW_SIZE): i + 1]
+            assert state.analyze() == analyze_trends(window)
+
+
+def test_late_reading_rebuilds_in_order():
+    rng = random.Random(3)
+    docs = random_stream(rng, 40)
+    late = docs.pop(30)
+
+    state = DeviceTrendState()
+    for doc in docs + [late]:
+        state.push(doc)
+
+    expected = sorted(docs + [late], key=lambda d: d["timestamp"])[-WINDOW_SIZE:]
+    assert state.analyze() == analyze_trends(expected)
+
+
+def test_registry_seed_then_update_matches_history():
+    rng = random.Random(7)
+    docs = random_stream(rng, 80)
+
+    registry = TrendRegistry()
+    registry.seed("d1", docs[:30])
+    registry.update(docs[30:])
+
+    assert registry.get("d1").analyze() == analyze_trends(docs[-WINDOW_SIZE:])
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("python_multipart")
+
+from logic.uploads import InvalidUpload, UploadTooLarge, read_image_upload
+
+BOUNDARY = "leafboundary"
+CHUNK = 4096
+
+
+# Minimal stand-in for a Starlette Request: headers + chunked body stream
+class FakeRequest:
+    def __init__(self, body: bytes, content_type: str, content_length: bool = True):
+        self.headers = {"content-type": content_type}
+        if content_length:
+            self.headers["content-length"] = str(len(body))
+        self.body = body
+        self.chunks_read = 0
+
+    async def stream(self):
+        for i in range(0, len(self.body), CHUNK):
+            self.chunks_read += 1
+            yield self.body[i:i + CHUNK]
+
+
+def multipart(image: bytes, field: str = "file", content_type: str = "image/jpeg") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="note"\r\n\r\n'
+        f"hello\r\n"
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="leaf.jpg"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + image + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def read(request, max_bytes=50_000):
+    return asyncio.run(read_image_upload(request, max_bytes))
+
+
+def test_multipart_file_field():
+    image = bytes(range(256)) * 100
+    request = FakeRequest(multipart(image), f"multipart/form-data; boundary={BOUNDARY}")
+
+    assert read(request) == (image, "image/jpeg")
+
+
+def test_raw_image_body():
+    image = b"\x89PNG" + b"\x00" * 1000
+
+    assert read(FakeRequest(image, "image/png")) == (image, "image/png")
+
+
+def test_oversized_chunked_upload_stops_early():
+    body = multipart(b"x" * 1_000_000)
+    request = FakeRequest(body, f"multipart/form-data; boundary={BOUNDARY}", content_length=False)
+
+    with pytest.raises(UploadTooLarge):
+        read(request)
+
+    # Gave up right after the limit, not after the whole megabyte
+    assert request.chunks_read * CHUNK < 50_000 + 2 * CHUNK
+
+
+def test_declared_length_over_limit_rejected_before_reading():
+    request = FakeRequest(b"x" * 200_000, "image/jpeg")
+
+    with pytest.raises(UploadTooLarge):
+        read(request)
+    assert request.chunks_read == 0
+
+
+def test_missing_field_and_wrong_type():
+    with pytest.raises(InvalidUpload):
+        read(FakeRequest(multipart(b"abc", field="photo"), f"multipart/form-data; boundary={BOUNDARY}"))
+
+    with pytest.raises(InvalidUpload):
+        read(FakeRequest(b"{}", "application/json"))
@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("requests")
+
+from logic.batch import columns_from_readings, generate_fleet_insights, insights_for
+from logic.insights import RAIN_DELAY_NOTE, HEAT_STRESS_NOTE, generate_plant_insights
+from logic.model.weather import WeatherContext
+from logic.weather.client import WeatherClient
+
+
+# Local stand-in for OpenWeather /weather + /forecast — counts requests, optional delay
+class StubWeather(BaseHTTPRequestHandler):
+    calls = []
+    delay = 0.0
+    temperature = 24.0
+    fail = False
+    forecast = None   # list of 3h steps; None → /forecast answers 404
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path.endswith("/forecast"):
+            if StubWeather.forecast is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            steps = StubWeather.forecast[: int(query["cnt"][0])]
+            return self._json({"cnt": len(steps), "list": steps})
+
+        StubWeather.calls.append((float(query["lat"][0]), float(query["lon"][0])))
+        time.sleep(StubWeather.delay)
+
+        if StubWeather.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        self._json({
+            "main": {"temp": StubWeather.temperature, "humidity": 55},
+            "weather": [{"description": "clear sky"}],
+            "wind": {"speed": 2.5}
+        })
+
+    def _json(self, payload):
+        body = json.dumps(payload).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    StubWeather.calls = []
+    StubWeather.delay = 0.0
+    StubWeather.temperature = 24.0
+    StubWeather.fail = False
+    StubWeather.forecast = None
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWeather)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/data/2.5"
+    server.shutdown()
+
+
+def make_client(url, **kwargs):
+    return WeatherClient(base_url=url, api_key="test", timeout=2, **kwargs)
+
+
+def test_nearby_devices_share_one_cached_lookup(stub_url):
+    client = make_client(stub_url, grid_deg=0.1)
+
+    first = client.get(52.5201, 13.4049)
+    second = client.get(52.5249, 13.3951)   # same 0.1° cell
+
+    assert first == second
+    assert first["temperature"] == 24.0
+    assert StubWeather.calls == [(52.5, 13.4)]   # requested at the cell center
+
+
+def test_concurrent_misses_are_coalesced(stub_url):
+    StubWeather.delay = 0.3
+    client = make_client(stub_url)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(client.get(10.0, 20.0)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(StubWeather.calls) == 1
+    assert all(r["temperature"] == 24.0 for r in results)
+
+
+def test_stale_while_revalidate(stub_url):
+    client = make_client(stub_url, ttl=0.05, stale_ttl=60)
+    assert client.get(1.0, 1.0)["temperature"] == 24.0
+
+    time.sleep(0.1)
+    StubWeather.temperature = 30.0
+
+    # Expired → old value immediately, refresh in the background
+    assert client.get(1.0, 1.0)["temperature"] == 24.0
+
+    deadline = time.monotonic() + 2
+    while len(StubWeather.calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+    assert client.get(1.0, 1.0)["temperature"] == 30.0
+
+
+def test_upstream_failure_keeps_last_good_value(stub_url):
+    client = make_client(stub_url, ttl=0.05, stale_ttl=0)
+    client.get(1.0, 1.0)
+
+    time.sleep(0.1)
+    StubWeather.fail = True
+
+    assert "error" in client.get(1.0, 1.0)   # no stale window → nothing to fall back on
+
+    client = make_client(stub_url, ttl=0.05, stale_ttl=60)
+    StubWeather.fail = False
+    client.get(2.0, 2.0)
+    time.sleep(0.1)
+    StubWeather.fail = True
+
+    assert client.get(2.0, 2.0)["temperature"] == 24.0
+
+
+# ----------------------
+# Contract: client output → insights input
+# ----------------------
+def step(temp, humidity, pop):
+    return {"main": {"temp": temp, "humidity": humidity}, "pop": pop}
+
+
+# Dry soil that keeps drying → "water now" unless rain is coming
+DRY_READING = {"soilMoisture": 20.0, "temperature": 26.0, "humidity": 60.0, "light": 900.0}
+DRY_HISTORY = [dict(DRY_READING, soilMoisture=30.0 - i) for i in range(10)]
+
+
+def test_forecast_rain_probability_drives_rain_delay(stub_url):
+    StubWeather.forecast = [step(25, 60, 0.1), step(24, 65, 0.85), step(23, 70, 0.4), step(22, 70, 0.2)]
+    weather = make_client(stub_url, forecast_hours=12).get(1.0, 1.0)
+
+    # Exactly the typed context, percent scale, worst case over the window
+    assert set(weather) == set(WeatherContext.model_fields)
+    assert weather["rain_probability"] == 85
+    assert weather["forecast_hours"] == 12
+
+    insights = generate_plant_insights(DRY_READING, DRY_HISTORY, weather=weather)
+
+    assert RAIN_DELAY_NOTE in insights["weather_notes"]
+    assert insights["watering"]["urgency"] == "medium"   # softened from "high"
+
+
+def test_forecast_heat_and_dry_air_are_reported(stub_url):
+    StubWeather.forecast = [step(36.5, 35, 0.0)]
+    weather = make_client(stub_url, forecast_hours=3).get(1.0, 1.0)
+
+    assert weather["temperature"] == 36.5
+    assert weather["humidity"] == 35
+    assert weather["current_temperature"] == 24.0
+
+    insights = generate_plant_insights(DRY_READING, DRY_HISTORY, weather=weather)
+    assert HEAT_STRESS_NOTE in insights["weather_notes"]
+    assert insights["watering"]["urgency"] == "high"
+
+
+def test_missing_forecast_means_unknown_rain(stub_url):
+    weather = make_client(stub_url).get(1.0, 1.0)
+
+    assert weather["rain_probability"] is None
+    assert weather["forecast_hours"] == 0
+
+    insights = generate_plant_insights(DRY_READING, DRY_HISTORY, weather=weather)
+    assert RAIN_DELAY_NOTE not in insights.get("weather_notes", [])
+
+
+def test_batch_engine_reads_the_same_context(stub_url):
+    StubWeather.forecast = [step(37, 30, 0.9)]
+    weather = make_client(stub_url, forecast_hours=3).get(1.0, 1.0)
+
+    result = generate_fleet_insights(**columns_from_readings([DRY_READING], [DRY_HISTORY], [weather]))
+
+    assert insights_for(result, 0) == generate_plant_insights(DRY_READING, DRY_HISTORY, weather=weather)
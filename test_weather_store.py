@@ -0,0 +1,97 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("motor")
+
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")   # nothing connects
+
+from logic.weather import prefetch
+from logic.weather.prefetch import WeatherStore
+
+WEATHER = {"temperature": 21.0, "humidity": 60}
+
+
+# Stand-in for weather_client: 1° cells, counts refreshes, can fail
+class FakeClient:
+    api_key = "test"
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def cell(self, lat, lon):
+        return (round(lat), round(lon))
+
+    def refresh(self, lat, lon):
+        self.calls += 1
+        return {"error": "upstream down"} if self.fail else dict(WEATHER)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(prefetch, "weather_client", fake)
+    return fake
+
+
+def lookup_and_settle(store, lat, lon):
+    async def run():
+        entry = store.lookup(lat, lon)
+        await asyncio.gather(*store._tasks)
+        return entry
+
+    return asyncio.run(run())
+
+
+def test_stale_weather_is_refetched(client, monkeypatch):
+    monkeypatch.setattr(prefetch, "WEATHER_STALE_AFTER_S", 600)
+    store = WeatherStore()
+    store.put((10, 20), WEATHER, datetime.utcnow() - timedelta(minutes=5))
+    version = store.cell_version((10, 20))
+
+    lookup_and_settle(store, 10.2, 20.1)
+    assert client.calls == 0   # still fresh
+
+    store.put((10, 20), WEATHER, datetime.utcnow() - timedelta(hours=2))
+    stale = lookup_and_settle(store, 10.2, 20.1)
+
+    assert client.calls == 1
+    assert stale["fetched_at"] < lookup_and_settle(store, 10.2, 20.1)["fetched_at"]
+    assert store.cell_version((10, 20)) > version + 1
+
+
+def test_failing_upstream_is_retried_at_most_every_retry_interval(client, monkeypatch):
+    monkeypatch.setattr(prefetch, "WEATHER_RETRY_S", 3600)
+    client.fail = True
+    store = WeatherStore()
+
+    for _ in range(5):
+        assert lookup_and_settle(store, 1, 1) is None
+    assert client.calls == 1
+
+    monkeypatch.setattr(prefetch, "WEATHER_RETRY_S", 0)
+    client.fail = False
+    lookup_and_settle(store, 1, 1)
+    assert lookup_and_settle(store, 1, 1)["weather"] == WEATHER
+
+
+def test_store_is_bounded_and_sweeps_idle_cells(client):
+    store = WeatherStore(max_cells=2)
+    now = datetime.utcnow()
+
+    store.put((1, 1), WEATHER, now)
+    store.put((2, 2), WEATHER, now)
+    lookup_and_settle(store, 1, 1)      # (2, 2) is now least recently used
+    store.put((3, 3), WEATHER, now)
+    assert store.snapshot()["cells"] == 2
+    assert store.cell_version((2, 2)) == 0
+
+    store.retain({(3, 3)})              # everything is from this sweep → kept
+    lookup_and_settle(store, 1, 1)      # looked up since → kept
+    assert store.retain({(3, 3)}) == 0
+
+    assert store.retain(set()) == 2     # neither active nor looked up
+    assert store.snapshot()["cells"] == 0